@@ -0,0 +1,191 @@
+from itertools import groupby
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AdjudicationItem, Annotation, GoldAnnotation
+
+ADJUDICATION_BATCH_SIZE = 500
+
+
+def variant_key(variant):
+    return f"{variant['s']}:{variant['e']}:{variant['l']}"
+
+
+def cluster_spans(rows):
+    """Group one text's annotations into clusters of overlapping spans.
+
+    ``rows`` are (id, user_id, label_id, start, end, suggestions) tuples sorted
+    by start and end, so a single merge pass finds every cluster: a span joins
+    the open cluster while it starts before the furthest end seen so far.
+    Within a cluster, identical (start, end, label) spans from different users
+    collapse into one variant listing its supporters.
+    """
+    clusters = []
+    cluster = None
+    for ann_id, user_id, label_id, start, end, suggestions in rows:
+        if cluster is None or start >= cluster['e']:
+            cluster = {'s': start, 'e': end, 'v': {}}
+            clusters.append(cluster)
+        cluster['e'] = max(cluster['e'], end)
+        variant = cluster['v'].setdefault((start, end, label_id), {'s': start, 'e': end, 'l': label_id, 'u': [], 'a': [], 'g': []})
+        if user_id not in variant['u']:
+            variant['u'].append(user_id)
+        variant['a'].append(ann_id)
+        for suggestion in suggestions or []:
+            if suggestion not in variant['g']:
+                variant['g'].append(suggestion)
+    for cluster in clusters:
+        cluster['v'] = sorted(cluster['v'].values(), key=lambda v: (-len(v['u']), v['s'], v['e'], v['l']))
+    return clusters
+
+
+def build_item(project, text_id, rows, built_at):
+    annotators = len({row[1] for row in rows})
+    clusters = cluster_spans(rows)
+    for cluster in clusters:
+        # Everyone marked exactly the same span with the same label
+        cluster['agreed'] = len(cluster['v']) == 1 and len(cluster['v'][0]['u']) == annotators
+    conflicts = sum(1 for cluster in clusters if not cluster['agreed'])
+    return AdjudicationItem(
+        project=project,
+        text_id=text_id,
+        annotators=annotators,
+        clusters=clusters,
+        conflicts=conflicts,
+        disagreement=conflicts / len(clusters) if clusters else 0,
+        built_at=built_at,
+    )
+
+
+def build_adjudication(project, stale_only=False, text_ids=None, batch_size=ADJUDICATION_BATCH_SIZE):
+    """(Re)build the adjudication items of a project and return how many were written.
+
+    Annotations are streamed in (text, start, end) order, one text at a time,
+    and written back in batches. Texts annotated by fewer than two people get
+    no item. A resolution survives a rebuild as long as the clusters are
+    unchanged. With ``stale_only`` only texts whose annotations changed since
+    the last build, or that have no item yet, are processed; ``text_ids``
+    limits the build to the given texts.
+    """
+    built_at = timezone.now()
+    annotations = Annotation.objects.filter(text__project=project)
+    if text_ids is not None:
+        annotations = annotations.filter(text_id__in=text_ids)
+    elif stale_only:
+        annotations = annotations.exclude(text__adjudication__is_stale=False)
+    rows = annotations.order_by('text_id', 'start_index', 'end_index', 'id').values_list(
+        'text_id', 'id', 'user_id', 'label_id', 'start_index', 'end_index', 'suggestions'
+    )
+
+    written = 0
+    batch = []
+    for text_id, text_rows in groupby(rows.iterator(chunk_size=2000), key=lambda row: row[0]):
+        text_rows = [row[1:] for row in text_rows]
+        if len({row[1] for row in text_rows}) < 2:
+            continue
+        batch.append(build_item(project, text_id, text_rows, built_at))
+        if len(batch) >= batch_size:
+            written += _save_items(batch)
+            batch = []
+    if batch:
+        written += _save_items(batch)
+
+    # Items not rebuilt in this pass belong to texts that no longer have two annotators
+    obsolete = AdjudicationItem.objects.filter(project=project, built_at__lt=built_at)
+    if text_ids is not None:
+        obsolete = obsolete.filter(text_id__in=text_ids)
+    elif stale_only:
+        obsolete = obsolete.filter(is_stale=True)
+    obsolete.delete()
+    return written
+
+
+def _save_items(items):
+    existing = dict(
+        AdjudicationItem.objects.filter(text_id__in=[item.text_id for item in items])
+        .values_list('text_id', 'clusters')
+    )
+    with transaction.atomic():
+        unchanged = [item for item in items if existing.get(item.text_id) == item.clusters]
+        changed = [item for item in items if existing.get(item.text_id) != item.clusters]
+        AdjudicationItem.objects.filter(text_id__in=[item.text_id for item in unchanged]).update(
+            is_stale=False, built_at=items[0].built_at
+        )
+        AdjudicationItem.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['text'],
+            update_fields=['annotators', 'clusters', 'conflicts', 'disagreement', 'is_stale', 'built_at',
+                           'resolved_at', 'resolved_by'],
+        )
+    return len(items)
+
+
+def conflict_queue(project):
+    """Unresolved texts with conflicting spans, most disputed first."""
+    return (
+        AdjudicationItem.objects.filter(project=project, resolved_at__isnull=True, conflicts__gt=0)
+        .order_by('-disagreement', '-conflicts', 'text_id')
+    )
+
+
+def accept_variants(item, keys, user):
+    """Replace the text's gold spans with the chosen variants and resolve the item."""
+    keys = set(keys)
+    gold = [
+        GoldAnnotation(
+            text_id=item.text_id,
+            label_id=variant['l'],
+            start_index=variant['s'],
+            end_index=variant['e'],
+            suggestions=variant['g'],
+            accepted_by=user,
+        )
+        for cluster in item.clusters for variant in cluster['v'] if variant_key(variant) in keys
+    ]
+    with transaction.atomic():
+        GoldAnnotation.objects.filter(text_id=item.text_id).delete()
+        GoldAnnotation.objects.bulk_create(gold)
+        item.resolved_at = timezone.now()
+        item.resolved_by = user
+        item.save(update_fields=['resolved_at', 'resolved_by'])
+    return len(gold)
+
+
+def accept_agreed(items, user, batch_size=ADJUDICATION_BATCH_SIZE):
+    """Accept every span all annotators agreed on, for many texts at once.
+
+    Items with no conflicts are resolved as well; the others stay in the
+    queue for their disputed spans.
+    """
+    accepted = 0
+    batch = []
+    for item in items.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            accepted += _accept_agreed_batch(batch, user)
+            batch = []
+    if batch:
+        accepted += _accept_agreed_batch(batch, user)
+    return accepted
+
+
+def _accept_agreed_batch(items, user):
+    gold = [
+        GoldAnnotation(
+            text_id=item.text_id,
+            label_id=cluster['v'][0]['l'],
+            start_index=cluster['v'][0]['s'],
+            end_index=cluster['v'][0]['e'],
+            suggestions=cluster['v'][0]['g'],
+            accepted_by=user,
+        )
+        for item in items for cluster in item.clusters if cluster['agreed']
+    ]
+    with transaction.atomic():
+        GoldAnnotation.objects.bulk_create(gold, ignore_conflicts=True)
+        AdjudicationItem.objects.filter(id__in=[item.id for item in items if not item.conflicts]).update(
+            resolved_at=timezone.now(), resolved_by=user
+        )
+    return len(gold)
@@ -0,0 +1,305 @@
+from itertools import combinations
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Annotation, Label, Text
+from .tokenization import token_offsets
+
+AGREEMENT_CHUNK_SIZE = 500  # texts per database round trip
+AGREEMENT_CACHE_KEY = 'agreement:{project_id}:{fingerprint}'
+AGREEMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class _PairStats:
+    """Running totals for one annotator pair; every array is sized by label count."""
+
+    def __init__(self, n_categories):
+        self.texts = 0
+        self.confusion = np.zeros((n_categories, n_categories), dtype=np.int64)
+        # Index 0 is unused for spans (it is the "no label" token category)
+        self.spans_a = np.zeros(n_categories, dtype=np.int64)
+        self.spans_b = np.zeros(n_categories, dtype=np.int64)
+        self.exact = np.zeros(n_categories, dtype=np.int64)
+        self.overlap_a = np.zeros(n_categories, dtype=np.int64)
+        self.overlap_b = np.zeros(n_categories, dtype=np.int64)
+
+
+class AgreementEngine:
+    """Inter-annotator agreement for a project, computed one chunk of texts at a time.
+
+    A text is compared for an annotator pair when both annotators have at
+    least one span on it. Token-level agreement labels every token with the
+    label of the span covering it (0 when uncovered) and reports Cohen's kappa
+    per pair and Fleiss' kappa (with a varying number of raters per text)
+    across everyone. Span-level agreement reports exact and overlap F1 per
+    pair and label. Only the texts of the current chunk and fixed-size
+    per-pair totals are held in memory.
+    """
+
+    def __init__(self, project, chunk_size=AGREEMENT_CHUNK_SIZE):
+        self.project = project
+        self.chunk_size = chunk_size
+        self.label_ids = np.array(
+            sorted(Label.objects.filter(project=project).values_list('id', flat=True)), dtype=np.int64
+        )
+        self.n_categories = len(self.label_ids) + 1
+        self.pairs = {}
+        self.texts = 0
+        self.tokens = 0
+        # Fleiss' kappa totals
+        self.category_totals = np.zeros(self.n_categories, dtype=np.int64)
+        self.category_disagreement = np.zeros(self.n_categories, dtype=np.int64)
+        self.rating_pairs = 0
+        self.agreeing_pairs = 0
+
+    def run(self):
+        for texts, rows in self._chunks():
+            self._process_chunk(texts, rows)
+        return self.report()
+
+    def _chunks(self):
+        last_id = 0
+        while True:
+            texts = list(
+                Text.objects.filter(project=self.project, id__gt=last_id)
+                .order_by('id').values_list('id', 'text')[:self.chunk_size]
+            )
+            if not texts:
+                return
+            first_id, last_id = texts[0][0], texts[-1][0]
+            rows = np.array(
+                Annotation.objects.filter(text__project=self.project, text_id__gte=first_id, text_id__lte=last_id)
+                .order_by('text_id', 'user_id').values_list('text_id', 'user_id', 'label_id', 'start_index', 'end_index'),
+                dtype=np.int64,
+            ).reshape(-1, 5)
+            yield dict(texts), rows
+
+    def _process_chunk(self, texts, rows):
+        if not len(rows):
+            return
+        # Map label ids to categories 1..K; labels created mid-run fall back to 0
+        positions = np.searchsorted(self.label_ids, rows[:, 2])
+        known = positions < len(self.label_ids)
+        known[known] = self.label_ids[positions[known]] == rows[known, 2]
+        categories = np.where(known, positions + 1, 0)
+
+        # Only texts with two or more annotators carry agreement information
+        text_ids, text_index = np.unique(rows[:, 0], return_inverse=True)
+        user_ids, user_index = np.unique(rows[:, 1], return_inverse=True)
+        present = np.zeros((len(text_ids), len(user_ids)), dtype=bool)
+        present[text_index, user_index] = True
+        shared = (present.sum(axis=1) >= 2) & np.isin(text_ids, list(texts))
+        if not shared.any():
+            return
+        keep = shared[text_index]
+        text_ids, present = text_ids[shared], present[shared]
+        text_index = np.cumsum(shared)[text_index[keep]] - 1
+        user_index, categories = user_index[keep], categories[keep]
+        starts, ends = rows[keep, 3], rows[keep, 4]
+
+        # Lay the chunk's texts end to end (one apart) so spans and tokens of
+        # all texts can be compared with a single sorted search
+        contents = [texts[text_id] for text_id in text_ids.tolist()]
+        lengths = np.array([len(content) for content in contents], dtype=np.int64)
+        bases = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+        span_limit = int(bases[-1] + lengths[-1] + 1)
+        starts = bases[text_index] + np.clip(starts, 0, lengths[text_index])
+        ends = bases[text_index] + np.clip(ends, 0, lengths[text_index])
+
+        token_starts, token_ends, token_text = [], [], []
+        for index, content in enumerate(contents):
+            offsets_start, offsets_end = token_offsets(content)
+            token_starts.append(offsets_start + bases[index])
+            token_ends.append(offsets_end + bases[index])
+            token_text.append(np.full(len(offsets_start), index, dtype=np.int64))
+        token_starts, token_ends, token_text = (np.concatenate(a) for a in (token_starts, token_ends, token_text))
+        self.texts += len(text_ids)
+        self.tokens += len(token_starts)
+
+        labels = self._token_labels(token_starts, token_ends, token_text, present, starts, ends, user_index, categories)
+        self._add_fleiss(labels)
+
+        users = user_ids.tolist()
+        for a, b in combinations(range(len(users)), 2):
+            both = present[:, a] & present[:, b]
+            if not both.any():
+                continue
+            pair = self.pairs.get((users[a], users[b]))
+            if pair is None:
+                pair = self.pairs[(users[a], users[b])] = _PairStats(self.n_categories)
+            pair.texts += int(both.sum())
+            rated = both[token_text]
+            pair.confusion += np.bincount(
+                labels[rated, a] * self.n_categories + labels[rated, b],
+                minlength=self.n_categories ** 2,
+            ).reshape(self.n_categories, self.n_categories)
+
+            in_a = (user_index == a) & both[text_index]
+            in_b = (user_index == b) & both[text_index]
+            _compare_spans(
+                pair, self.n_categories, span_limit,
+                (categories[in_a], starts[in_a], ends[in_a]),
+                (categories[in_b], starts[in_b], ends[in_b]),
+            )
+
+    def _token_labels(self, token_starts, token_ends, token_text, present, starts, ends, user_index, categories):
+        """Token x annotator matrix of categories: 0 uncovered, -1 where the annotator skipped the text."""
+        labels = np.where(present[token_text], 0, -1)
+        # Tokens are sorted and disjoint, so each span covers a contiguous run
+        first = np.searchsorted(token_ends, starts, side='right')
+        last = np.searchsorted(token_starts, ends, side='left')
+        counts = np.maximum(last - first, 0)
+        if not counts.sum():
+            return labels
+        covered = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = covered * present.shape[1] + np.repeat(user_index, counts)
+        # Where one annotator's spans overlap, the earliest-starting span wins
+        # (then the shortest, then the lowest label, so reruns agree)
+        order = np.lexsort((np.repeat(categories, counts), np.repeat(ends, counts), np.repeat(starts, counts), cells))
+        cells = cells[order]
+        winners = np.concatenate([[True], cells[1:] != cells[:-1]])
+        labels.flat[cells[winners]] = np.repeat(categories, counts)[order][winners]
+        return labels
+
+    def _add_fleiss(self, labels):
+        rated = labels >= 0
+        n_raters = rated.sum(axis=1)
+        counts = np.bincount(
+            (np.nonzero(rated)[0] * self.n_categories + labels[rated]),
+            minlength=len(labels) * self.n_categories,
+        ).reshape(len(labels), self.n_categories)
+        self.category_totals += counts.sum(axis=0)
+        self.category_disagreement += (counts * (n_raters[:, None] - counts)).sum(axis=0)
+        self.rating_pairs += int((n_raters * (n_raters - 1)).sum())
+        self.agreeing_pairs += int((counts * (counts - 1)).sum())
+
+    def report(self):
+        label_names = dict(Label.objects.filter(id__in=self.label_ids.tolist()).values_list('id', 'name'))
+        user_ids = {user for pair in self.pairs for user in pair}
+        usernames = dict(User.objects.filter(id__in=user_ids).values_list('id', 'username'))
+        labels = [(category, int(label_id), label_names.get(int(label_id), str(label_id)))
+                  for category, label_id in enumerate(self.label_ids, start=1)]
+
+        pairs = []
+        for (user_a, user_b), pair in sorted(self.pairs.items()):
+            pairs.append({
+                'annotators': [usernames.get(user_a, str(user_a)), usernames.get(user_b, str(user_b))],
+                'texts': pair.texts,
+                'tokens': int(pair.confusion.sum()),
+                'cohen_kappa': _cohen_kappa(pair.confusion),
+                'exact_f1': _f1(pair.exact[1:].sum() * 2, pair.spans_a[1:].sum() + pair.spans_b[1:].sum()),
+                'overlap_f1': _f1(pair.overlap_a[1:].sum() + pair.overlap_b[1:].sum(), pair.spans_a[1:].sum() + pair.spans_b[1:].sum()),
+                'labels': [{
+                    'label': name,
+                    'spans': [int(pair.spans_a[category]), int(pair.spans_b[category])],
+                    'cohen_kappa': _cohen_kappa(_binary_confusion(pair.confusion, category)),
+                    'exact_f1': _f1(pair.exact[category] * 2, pair.spans_a[category] + pair.spans_b[category]),
+                    'overlap_f1': _f1(pair.overlap_a[category] + pair.overlap_b[category], pair.spans_a[category] + pair.spans_b[category]),
+                } for category, _, name in labels],
+            })
+
+        return {
+            'texts': self.texts,
+            'tokens': self.tokens,
+            'fleiss_kappa': self._fleiss_kappa(),
+            'labels': [{'label': name, 'fleiss_kappa': self._fleiss_kappa(category)} for category, _, name in labels],
+            'pairs': pairs,
+        }
+
+    def _fleiss_kappa(self, category=None):
+        ratings = self.category_totals.sum()
+        if not self.rating_pairs or not ratings:
+            return None
+        proportions = self.category_totals / ratings
+        if category is None:
+            expected = float((proportions ** 2).sum())
+            observed = self.agreeing_pairs / self.rating_pairs
+            return _kappa(observed, expected)
+        # Category k against the rest: 1 - sum_i n_ik (n_i - n_ik) / (sum_i n_i (n_i - 1) p_k (1 - p_k))
+        p = proportions[category]
+        denominator = self.rating_pairs * p * (1 - p)
+        if not denominator:
+            return None
+        return round(float(1 - self.category_disagreement[category] / denominator), 4)
+
+
+def _compare_spans(pair, n_categories, span_limit, spans_a, spans_b):
+    """Add per-label span counts and exact / overlap matches of two annotators.
+
+    Spans are (categories, starts, ends) on the chunk's shared offset line;
+    shifting each label onto its own stretch of that line means a sorted
+    search never matches across labels or texts.
+    """
+    categories_a, starts_a, ends_a = spans_a
+    categories_b, starts_b, ends_b = spans_b
+    pair.spans_a += np.bincount(categories_a, minlength=n_categories)
+    pair.spans_b += np.bincount(categories_b, minlength=n_categories)
+    starts_a, ends_a = starts_a + categories_a * span_limit, ends_a + categories_a * span_limit
+    starts_b, ends_b = starts_b + categories_b * span_limit, ends_b + categories_b * span_limit
+
+    key_a = starts_a * (span_limit + 1) + (ends_a - starts_a)
+    key_b = starts_b * (span_limit + 1) + (ends_b - starts_b)
+    pair.exact += np.bincount(categories_a[np.isin(key_a, key_b)], minlength=n_categories)
+    pair.overlap_a += np.bincount(categories_a[_overlaps(starts_a, ends_a, starts_b, ends_b)], minlength=n_categories)
+    pair.overlap_b += np.bincount(categories_b[_overlaps(starts_b, ends_b, starts_a, ends_a)], minlength=n_categories)
+
+
+def _overlaps(starts, ends, other_starts, other_ends):
+    """Whether each interval intersects any of the other intervals."""
+    if not len(other_starts):
+        return np.zeros(len(starts), dtype=bool)
+    order = np.argsort(other_starts, kind='stable')
+    reach = np.maximum.accumulate(other_ends[order])
+    # Among the others starting before this interval ends, the furthest end
+    candidates = np.searchsorted(other_starts[order], ends, side='left')
+    return (candidates > 0) & (reach[np.maximum(candidates - 1, 0)] > starts)
+
+
+def _binary_confusion(confusion, category):
+    """Collapse a confusion matrix to category-vs-rest."""
+    both = confusion[category, category]
+    only_a = confusion[category].sum() - both
+    only_b = confusion[:, category].sum() - both
+    neither = confusion.sum() - both - only_a - only_b
+    return np.array([[both, only_a], [only_b, neither]])
+
+
+def _cohen_kappa(confusion):
+    total = confusion.sum()
+    if not total:
+        return None
+    observed = np.trace(confusion) / total
+    expected = float((confusion.sum(axis=1) * confusion.sum(axis=0)).sum()) / total ** 2
+    return _kappa(observed, expected)
+
+
+def _kappa(observed, expected):
+    if expected >= 1:
+        # Everyone always used the same category: agreement is perfect but kappa is undefined
+        return None
+    return round(float((observed - expected) / (1 - expected)), 4)
+
+
+def _f1(matches, total):
+    return round(float(matches) / float(total), 4) if total else None
+
+
+def _fingerprint(project):
+    annotations = Annotation.objects.filter(text__project=project).aggregate(count=Count('id'), updated=Max('updated_at'))
+    texts = Text.objects.filter(project=project).aggregate(count=Count('id'), updated=Max('updated_at'))
+    return '-'.join(str(value.timestamp() if hasattr(value, 'timestamp') else value) for value in (
+        project.label_version, annotations['count'], annotations['updated'], texts['count'], texts['updated'],
+    ))
+
+
+def get_agreement_report(project, refresh=False):
+    """Agreement report for a project, cached until its annotations or labels change."""
+    key = AGREEMENT_CACHE_KEY.format(project_id=project.id, fingerprint=_fingerprint(project))
+    report = None if refresh else cache.get(key)
+    if report is None:
+        report = AgreementEngine(project).run()
+        cache.set(key, report, AGREEMENT_CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,125 @@
+import threading
+
+from django.db import connection, connections, transaction
+
+from .dashboard import invalidate_home_projects
+from .models import CloneJob, Label, Project, ProjectCollaborator, Text
+from .project_templates import LABEL_FIELDS
+
+CLONE_CHUNK_SIZE = 5000
+
+# Both statements run inside the database, one chunk of source text ids at a
+# time. Copies remember their source in cloned_from, which is how the
+# annotations find their new text; labels are matched by name, which is
+# unique per project.
+COPY_TEXTS_SQL = """
+    INSERT INTO annotation_text (project_id, text_id, text, meta, content_hash, cloned_from, created_at, updated_at)
+    SELECT %s, text_id, text, meta, content_hash, id, created_at, updated_at
+    FROM annotation_text
+    WHERE project_id = %s AND id > %s AND id <= %s
+    ORDER BY id
+"""
+
+COPY_ANNOTATIONS_SQL = """
+    INSERT INTO annotation_annotation
+        (text_id, user_id, label_id, start_index, end_index, suggestions, is_reannotation, created_at, updated_at)
+    SELECT nt.id, a.user_id, nl.id, a.start_index, a.end_index, a.suggestions, a.is_reannotation,
+           a.created_at, a.updated_at
+    FROM annotation_annotation a
+    JOIN annotation_text nt ON nt.cloned_from = a.text_id AND nt.project_id = %s
+    JOIN annotation_label ol ON ol.id = a.label_id
+    JOIN annotation_label nl ON nl.project_id = %s AND nl.name = ol.name
+    WHERE a.text_id > %s AND a.text_id <= %s
+"""
+
+
+def start_clone(source, owner, name, include_annotations=True, include_collaborators=True):
+    """Create the new project with the source's labels and collaborators, and its CloneJob.
+
+    The texts are copied by ``run_clone_job``, usually in the background.
+    """
+    with transaction.atomic():
+        project = Project.objects.create(name=name, description=source.description, owner=owner)
+        Label.objects.bulk_create([
+            Label(project=project, created_by=owner, **row)
+            for row in source.labels.order_by('id').values(*LABEL_FIELDS)
+        ])
+        collaborator_ids = []
+        if include_collaborators:
+            # The source owner keeps access to the copy of their corpus
+            collaborator_ids = [
+                pk for pk in [source.owner_id, *source.collaborators.values_list('user_id', flat=True)]
+                if pk != owner.id
+            ]
+            ProjectCollaborator.objects.bulk_create(
+                [ProjectCollaborator(project=project, user_id=pk) for pk in collaborator_ids],
+                ignore_conflicts=True,
+            )
+        job = CloneJob.objects.create(
+            source=source,
+            project=project,
+            created_by=owner,
+            include_annotations=include_annotations,
+            total_texts=Text.objects.filter(project=source).count(),
+        )
+    if collaborator_ids:
+        invalidate_home_projects(*collaborator_ids)
+    return job
+
+
+def run_clone_job(job, chunk_size=CLONE_CHUNK_SIZE, progress=None):
+    """Copy the remaining texts (and annotations) of a clone job, chunk by chunk.
+
+    Each chunk is two INSERT ... SELECT statements and the checkpoint, in one
+    transaction. ``progress`` is called with the job after every chunk.
+    """
+    if job.source_id is None:
+        raise ValueError('The source project no longer exists.')
+    source_texts = Text.objects.filter(project_id=job.source_id).order_by('id').values_list('id', flat=True)
+    job.status = CloneJob.STATUS_RUNNING
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+    try:
+        while True:
+            # The chunk ends at the chunk_size-th remaining id; one index probe
+            last = list(source_texts.filter(id__gt=job.last_text_id)[chunk_size - 1:chunk_size])
+            if not last:
+                last = list(source_texts.filter(id__gt=job.last_text_id).reverse()[:1])
+                if not last:
+                    break
+            bounds = (job.last_text_id, last[0])
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(COPY_TEXTS_SQL, [job.project_id, job.source_id, *bounds])
+                    job.texts += cursor.rowcount
+                    if job.include_annotations:
+                        cursor.execute(COPY_ANNOTATIONS_SQL, [job.project_id, job.project_id, *bounds])
+                        job.annotations += cursor.rowcount
+                job.last_text_id = bounds[1]
+                job.save(update_fields=['last_text_id', 'texts', 'annotations', 'updated_at'])
+            if progress:
+                progress(job)
+    except Exception as e:
+        job.status = CloneJob.STATUS_FAILED
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    job.status = CloneJob.STATUS_DONE
+    job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _run_in_thread(job_id):
+    try:
+        run_clone_job(CloneJob.objects.get(pk=job_id))
+    except Exception:
+        pass  # Recorded on the job; it can be resumed with manage.py clone_project --resume
+    finally:
+        connections.close_all()
+
+
+def run_clone_job_in_background(job):
+    """Run the job on a daemon thread of this process, after the current transaction commits."""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(job.pk,), name=f'clone-{job.pk}', daemon=True).start()
+    )
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db.models import Exists, F, Func, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Annotation, Project, ProjectCollaborator, Text
+
+# The home page lists every project a user owns or collaborates on. The list
+# is dropped from the cache whenever the user's memberships change (see
+# signals.py); the counts in it may lag behind new annotations by up to the
+# timeout.
+HOME_PROJECTS_KEY = 'home:projects:{user_id}'
+HOME_PROJECTS_TIMEOUT = 60
+
+
+class _SubqueryCount(Func):
+    # A plain function rather than Count, so the subquery gets no GROUP BY
+    function = 'COUNT'
+    output_field = IntegerField()
+
+    def __init__(self, expression, distinct=False):
+        if distinct:
+            self.template = '%(function)s(DISTINCT %(expressions)s)'
+        super().__init__(expression)
+
+
+def _count(queryset, field='id', distinct=False):
+    """Correlated COUNT over ``queryset`` as an integer subquery."""
+    counted = queryset.order_by().annotate(count=_SubqueryCount(F(field), distinct)).values('count')
+    return Coalesce(Subquery(counted), 0)
+
+
+def home_projects_queryset(user):
+    """Projects visible to ``user`` with their summary counts, in one query.
+
+    Membership is an EXISTS subquery rather than a join, so no DISTINCT is
+    needed, and each count is a correlated subquery over a single project.
+    """
+    texts = Text.objects.filter(project=OuterRef('pk'))
+    annotations = Annotation.objects.filter(text__project=OuterRef('pk'))
+    mine = annotations.filter(user=user)
+    return (
+        Project.objects
+        .filter(Q(owner=user) | Exists(ProjectCollaborator.objects.filter(project=OuterRef('pk'), user=user)))
+        .annotate(
+            text_count=_count(texts),
+            annotation_count=_count(annotations),
+            my_annotation_count=_count(mine),
+            my_text_count=_count(mine, 'text_id', distinct=True),
+        )
+        .order_by('-created_at')
+    )
+
+
+def get_home_projects(user):
+    """Plain rows for the home page, cached per user."""
+    key = HOME_PROJECTS_KEY.format(user_id=user.id)
+    projects = cache.get(key)
+    if projects is None:
+        projects = list(home_projects_queryset(user).values(
+            'id', 'name', 'description', 'user_project_id', 'owner_id', 'owner__username', 'created_at',
+            'text_count', 'annotation_count', 'my_annotation_count', 'my_text_count',
+        ))
+        for project in projects:
+            project['progress'] = (
+                round(100 * project['my_text_count'] / project['text_count']) if project['text_count'] else 0
+            )
+        cache.set(key, projects, HOME_PROJECTS_TIMEOUT)
+    return projects
+
+
+def invalidate_home_projects(*user_ids):
+    cache.delete_many([HOME_PROJECTS_KEY.format(user_id=user_id) for user_id in user_ids])
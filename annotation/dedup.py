@@ -0,0 +1,125 @@
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import AdjudicationItem, Annotation, GoldAnnotation, Text, content_hash
+
+DEDUP_BATCH_SIZE = 500
+
+# Rows moved from a duplicate onto the surviving text, with the fields that
+# make them unique per text
+MERGED_MODELS = (
+    (Annotation, ('user_id', 'label_id', 'start_index', 'end_index')),
+    (GoldAnnotation, ('label_id', 'start_index', 'end_index')),
+)
+
+
+def backfill_content_hashes(project, batch_size=2000):
+    """Hash the project's texts that were written without one (bulk inserts)."""
+    filled = 0
+    while True:
+        batch = list(Text.objects.filter(project=project, content_hash__isnull=True).only('id', 'text')[:batch_size])
+        if not batch:
+            return filled
+        for text in batch:
+            text.content_hash = content_hash(text.text)
+        Text.objects.bulk_update(batch, ['content_hash'])
+        filled += len(batch)
+
+
+def duplicate_hashes(project):
+    return (
+        Text.objects.filter(project=project, content_hash__isnull=False)
+        .values('content_hash')
+        .annotate(copies=Count('id'))
+        .filter(copies__gt=1)
+        .order_by('content_hash')
+    )
+
+
+def _shift(survivor, duplicate):
+    """Offset to add to a duplicate's spans so they point at the same characters of the survivor.
+
+    None when the two differ by more than surrounding whitespace (e.g. only in
+    Unicode composition), where spans cannot be carried over safely.
+    """
+    if duplicate == survivor:
+        return 0
+    if duplicate.strip() != survivor.strip():
+        return None
+    return (len(survivor) - len(survivor.lstrip())) - (len(duplicate) - len(duplicate.lstrip()))
+
+
+def merge_duplicate_texts(project, dry_run=False, batch_size=DEDUP_BATCH_SIZE):
+    """Merge texts with the same content into the oldest copy.
+
+    Annotations and gold spans of the copies move onto the surviving text
+    unless the survivor already has the same span; the copies are then
+    deleted. Copies whose spans cannot be mapped are left alone and counted
+    as ``kept``. Hashes are processed ``batch_size`` groups at a time, each
+    batch in its own transaction.
+    """
+    stats = {'hashed': backfill_content_hashes(project), 'groups': 0, 'merged': 0, 'moved': 0, 'dropped': 0, 'kept': 0}
+    hashes = list(duplicate_hashes(project).values_list('content_hash', flat=True))
+    stats['groups'] = len(hashes)
+    if dry_run:
+        stats['merged'] = sum(duplicate_hashes(project).values_list('copies', flat=True)) - len(hashes)
+        return stats
+    for i in range(0, len(hashes), batch_size):
+        with transaction.atomic():
+            _merge_batch(project, hashes[i:i + batch_size], stats)
+    return stats
+
+
+def _merge_batch(project, hashes, stats):
+    rows = (
+        Text.objects.filter(project=project, content_hash__in=hashes)
+        .order_by('content_hash', 'id')
+        .values_list('id', 'content_hash', 'text')
+    )
+    targets = {}  # duplicate id -> (survivor id, offset shift)
+    for _, group in groupby(rows, key=lambda row: row[1]):
+        (survivor_id, _, survivor_text), *copies = group
+        for copy_id, _, copy_text in copies:
+            shift = _shift(survivor_text, copy_text)
+            if shift is None:
+                stats['kept'] += 1
+            else:
+                targets[copy_id] = (survivor_id, shift)
+    if not targets:
+        return
+    survivors = {survivor_id for survivor_id, _ in targets.values()}
+
+    for model, key_fields in MERGED_MODELS:
+        taken = set(model.objects.filter(text_id__in=survivors).values_list('text_id', *key_fields))
+        plain = defaultdict(list)  # survivor id -> row ids, from copies identical to the survivor
+        shifted = []
+        for row_id, text_id, *key in model.objects.filter(text_id__in=targets).order_by('id').values_list(
+                'id', 'text_id', *key_fields):
+            survivor_id, shift = targets[text_id]
+            key = dict(zip(key_fields, key))
+            key['start_index'] += shift
+            key['end_index'] += shift
+            if (survivor_id, *key.values()) in taken:
+                stats['dropped'] += 1  # deleted with the copy below
+                continue
+            taken.add((survivor_id, *key.values()))
+            if shift:
+                shifted.append((row_id, survivor_id, shift))
+            else:
+                plain[survivor_id].append(row_id)
+        for survivor_id, row_ids in plain.items():
+            model.objects.filter(id__in=row_ids).update(text_id=survivor_id)
+        for row_id, survivor_id, shift in shifted:
+            model.objects.filter(id=row_id).update(
+                text_id=survivor_id, start_index=F('start_index') + shift, end_index=F('end_index') + shift
+            )
+        if model is Annotation:
+            stats['moved'] += sum(map(len, plain.values())) + len(shifted)
+
+    Text.objects.filter(id__in=targets).delete()
+    # update() skips the signal that flags the survivors for re-adjudication
+    AdjudicationItem.objects.filter(text_id__in=survivors, is_stale=False).update(is_stale=True)
+    stats['merged'] += len(targets)
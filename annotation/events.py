@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class AnnotationEventBroker:
+    """In-process fan-out of annotation deltas to the event streams open on a text.
+
+    Subscribers are asyncio queues owned by the event loop serving the stream;
+    publishers may be async views on that loop or sync code on another thread,
+    so delivery always goes through ``call_soon_threadsafe``. Only subscribers
+    in the same process are reached.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._subscribers = defaultdict(set)  # text_id -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    def subscribe(self, text_id):
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers[text_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, text_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(text_id)
+            if not subscribers:
+                return
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                del self._subscribers[text_id]
+
+    def publish(self, text_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(text_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # Loop already closed; the stream's cleanup will unsubscribe it
+                continue
+
+    @staticmethod
+    def _deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client must not block the others; it reloads on reconnect
+            pass
+
+    def subscriber_count(self, text_id):
+        with self._lock:
+            return len(self._subscribers.get(text_id, ()))
+
+
+broker = AnnotationEventBroker()
@@ -1,11 +1,24 @@
 from django import forms
-from .models import Project, Label, Text, Annotation
+from .models import Project, Label, Text, Annotation, ProjectTemplate
+from .project_templates import templates_for
 
 class ProjectForm(forms.ModelForm):
+    template = forms.ModelChoiceField(
+        queryset=ProjectTemplate.objects.none(),
+        required=False,
+        empty_label='Bangla error labels (default)',
+        help_text='Labels, collaborators and defaults the project starts with'
+    )
+
     class Meta:
         model = Project
         fields = ['name', 'description']
 
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            self.fields['template'].queryset = templates_for(user)
+
 class LabelForm(forms.ModelForm):
     color = forms.CharField(
         max_length=7,
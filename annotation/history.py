@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from .models import Annotation, AnnotationEvent
+
+# Annotation fields kept in the log, under the short keys of the annotation API
+EVENT_FIELDS = {
+    's': 'start_index',
+    'e': 'end_index',
+    'l': 'label_id',
+    'u': 'user_id',
+    'g': 'suggestions',
+    'r': 'is_reannotation',
+}
+
+
+def annotation_state(annotation):
+    return {key: getattr(annotation, field) for key, field in EVENT_FIELDS.items()}
+
+
+def create_annotation(user, **fields):
+    """Create an annotation and log it, in one transaction."""
+    with transaction.atomic():
+        annotation = Annotation.objects.create(user=user, **fields)
+        AnnotationEvent.objects.create(
+            text_id=annotation.text_id,
+            annotation_id=annotation.id,
+            user=user,
+            action=AnnotationEvent.ACTION_CREATED,
+            data=annotation_state(annotation),
+            created_at=annotation.created_at,
+        )
+    return annotation
+
+
+def update_annotation(annotation, user, **changes):
+    """Apply field changes to an annotation and log the fields that differ.
+
+    The before values come from the instance as loaded, so nothing is read
+    again. Returns the logged {key: [before, after]} delta, empty when the
+    annotation was left unchanged.
+    """
+    before = annotation_state(annotation)
+    for field, value in changes.items():
+        setattr(annotation, field, value)
+    after = annotation_state(annotation)
+    delta = {key: [before[key], after[key]] for key in EVENT_FIELDS if before[key] != after[key]}
+    with transaction.atomic():
+        annotation.save()
+        if delta:
+            AnnotationEvent.objects.create(
+                text_id=annotation.text_id,
+                annotation_id=annotation.id,
+                user=user,
+                action=AnnotationEvent.ACTION_UPDATED,
+                data=delta,
+            )
+    return delta
+
+
+def delete_annotation(annotation, user):
+    """Delete an annotation, logging its last state (and when it was created)."""
+    state = annotation_state(annotation)
+    state['c'] = annotation.created_at.isoformat()
+    with transaction.atomic():
+        AnnotationEvent.objects.create(
+            text_id=annotation.text_id,
+            annotation_id=annotation.id,
+            user=user,
+            action=AnnotationEvent.ACTION_DELETED,
+            data=state,
+        )
+        annotation.delete()
+
+
+acreate_annotation = sync_to_async(create_annotation)
+aupdate_annotation = sync_to_async(update_annotation)
+adelete_annotation = sync_to_async(delete_annotation)
+
+
+def text_history(text_id, since=None):
+    """The logged events of a text, oldest first."""
+    events = AnnotationEvent.objects.filter(text_id=text_id)
+    if since is not None:
+        events = events.filter(created_at__gt=since)
+    return events.select_related('user').order_by('created_at', 'id')
+
+
+def text_state_at(text_id, when):
+    """The annotations of a text as they were at ``when``, as {annotation id: state}.
+
+    Starts from the current annotations and undoes the text's events after
+    ``when``, newest first, so only that tail of the log is read (through
+    the (text, created_at) index). Annotations written in bulk without
+    events, such as imports, count from their created_at.
+    """
+    state = {
+        annotation['id']: {key: annotation[field] for key, field in EVENT_FIELDS.items()}
+        for annotation in Annotation.objects.filter(text_id=text_id, created_at__lte=when)
+        .values('id', *EVENT_FIELDS.values())
+    }
+    events = (AnnotationEvent.objects.filter(text_id=text_id, created_at__gt=when)
+              .order_by('-created_at', '-id').values_list('annotation_id', 'action', 'data'))
+    for annotation_id, action, data in events.iterator():
+        if action == AnnotationEvent.ACTION_CREATED:
+            state.pop(annotation_id, None)
+        elif action == AnnotationEvent.ACTION_UPDATED:
+            if annotation_id in state:
+                state[annotation_id].update({key: before for key, (before, after) in data.items()})
+        elif action == AnnotationEvent.ACTION_DELETED:
+            created = data.get('c')
+            if created is None or datetime.fromisoformat(created) <= when:
+                state[annotation_id] = {key: value for key, value in data.items() if key != 'c'}
+    return state
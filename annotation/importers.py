@@ -0,0 +1,250 @@
+import codecs
+import hashlib
+import itertools
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ImportJob, Text, content_hash
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+SNIFF_SIZE = 64 * 1024
+# Tried in order once UTF-8 fails; iso-8859-1 maps every byte, so decoding never fails outright
+FALLBACK_ENCODINGS = ('windows-1252', 'iso-8859-1')
+IMPORT_BATCH_SIZE = 1000
+
+# What to do with an imported text whose content is already in the project
+DUPLICATE_SKIP = 'skip'  # keep the existing text, drop the row
+DUPLICATE_UPDATE = 'update'  # keep the existing text, take the row's ID and metadata
+DUPLICATE_ALLOW = 'allow'  # always insert
+DUPLICATE_MODES = (DUPLICATE_SKIP, DUPLICATE_UPDATE, DUPLICATE_ALLOW)
+
+
+class UploadDecoder:
+    """Decode an uploaded file in a single pass, yielding text lines.
+
+    The encoding is picked from a BOM or a bounded prefix of the file. If a
+    later part of the file turns out not to be valid in that encoding, the
+    decoder switches to the next fallback from that byte on instead of
+    starting over, so the upload is read exactly once. ``offset`` is the number
+    of raw bytes behind the lines yielded so far; passing a saved offset as
+    ``start`` (with the encoding in use there) carries on from that line.
+    """
+
+    def __init__(self, upload, chunk_size=UPLOAD_CHUNK_SIZE, start=0, encoding=None):
+        self.upload = upload
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.offset = start
+        self._decoder = None
+
+    def _chunks(self):
+        self.upload.seek(self.offset)
+        while True:
+            chunk = self.upload.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _raw_lines(self):
+        chunks = self._chunks()
+        first = next(chunks, b'')
+        if self.encoding is None:
+            if first.startswith(codecs.BOM_UTF8):
+                self.encoding = 'utf-8'
+                self.offset = len(codecs.BOM_UTF8)
+                first = first[len(codecs.BOM_UTF8):]
+            else:
+                self.encoding = self._sniff(first[:SNIFF_SIZE])
+        self._decoder = codecs.getincrementaldecoder(self.encoding)()
+
+        pending = b''
+        for chunk in itertools.chain([first], chunks):
+            data = pending + chunk
+            start = 0
+            while True:
+                end = data.find(b'\n', start)
+                if end == -1:
+                    break
+                yield data[start:end + 1]
+                start = end + 1
+            pending = data[start:]
+        if pending:
+            yield pending
+
+    @staticmethod
+    def _sniff(prefix):
+        try:
+            # final=False: a multi-byte character cut off at the end of the prefix is fine
+            codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        for encoding in FALLBACK_ENCODINGS:
+            try:
+                prefix.decode(encoding)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return FALLBACK_ENCODINGS[-1]
+
+    def _decode(self, raw, final=False):
+        try:
+            return self._decoder.decode(raw, final=final)
+        except UnicodeDecodeError as e:
+            chain = ('utf-8',) + FALLBACK_ENCODINGS
+            remaining = chain[chain.index(self.encoding) + 1:]
+            if not remaining:
+                raise
+            # e.object includes bytes the decoder was still holding back; keep
+            # what decoded cleanly and continue from the bad byte with the fallback
+            head = e.object[:e.start].decode(self.encoding)
+            self.encoding = remaining[0]
+            self._decoder = codecs.getincrementaldecoder(self.encoding)()
+            return head + self._decode(e.object[e.start:], final=final)
+
+    def __iter__(self):
+        for raw in self._raw_lines():
+            text = self._decode(raw)
+            self.offset += len(raw)
+            if text:
+                yield text
+        tail = self._decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+
+class TextWriter:
+    """Collect imported texts and write them in chunks.
+
+    Each chunk costs one lookup of its content hashes (and of its text IDs
+    with ``match_text_id``), one ``bulk_create`` and at most one
+    ``bulk_update``, however many rows it holds. ``duplicates`` decides what
+    happens to a row whose content is already in the project or earlier in
+    the file. With ``match_text_id`` a row whose ID already exists updates
+    that text's content instead, as the dual-file import always has. With
+    ``keep_texts`` the Text each row ended up in is kept in ``texts`` by ID.
+    ``checkpoint`` is called with the number of rows after each chunk is
+    written, inside the chunk's transaction.
+    """
+
+    def __init__(self, project, duplicates=DUPLICATE_SKIP, match_text_id=False, keep_texts=False,
+                 batch_size=IMPORT_BATCH_SIZE, checkpoint=None):
+        if duplicates not in DUPLICATE_MODES:
+            raise ValueError(f'Unknown duplicate mode: {duplicates}')
+        self.project = project
+        self.duplicates = duplicates
+        self.match_text_id = match_text_id
+        self.keep_texts = keep_texts
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.texts = {}
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self._pending = []
+
+    def add(self, text_id, text, meta=None):
+        self._pending.append((text_id or '', text, meta or {}, content_hash(text)))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        texts = Text.objects.filter(project=self.project)
+        by_id = {}
+        if self.match_text_id:
+            by_id = {text.text_id: text for text in texts.filter(text_id__in={row[0] for row in rows if row[0]})}
+        by_hash = {}
+        if self.duplicates != DUPLICATE_ALLOW:
+            for text in texts.filter(content_hash__in={row[3] for row in rows}).order_by('-id'):
+                by_hash[text.content_hash] = text  # the oldest copy wins
+
+        now = timezone.now()
+        to_create = []
+        to_update = {}
+        for text_id, content, meta, digest in rows:
+            if text_id and text_id in by_id:
+                text = by_id[text_id]
+                if text.text != content:
+                    text.text = content
+                    text.content_hash = digest
+                    text.updated_at = now
+                    self._changed(to_update, text)
+                    self.updated += 1
+                else:
+                    self.skipped += 1
+            elif digest in by_hash:
+                text = by_hash[digest]
+                if self.duplicates == DUPLICATE_UPDATE:
+                    text.text_id = text_id or text.text_id
+                    text.meta = {**text.meta, **meta}
+                    text.updated_at = now
+                    self._changed(to_update, text)
+                    self.updated += 1
+                else:
+                    self.skipped += 1
+            else:
+                text = Text(project=self.project, text_id=text_id, text=content, meta=meta, content_hash=digest)
+                to_create.append(text)
+                if self.duplicates != DUPLICATE_ALLOW:
+                    by_hash[digest] = text
+                if self.match_text_id and text_id:
+                    by_id[text_id] = text
+            if self.keep_texts:
+                self.texts[text_id] = text
+
+        with transaction.atomic():
+            Text.objects.bulk_create(to_create)
+            if to_update:
+                Text.objects.bulk_update(to_update.values(), ['text_id', 'text', 'meta', 'content_hash', 'updated_at'])
+            self.created += len(to_create)
+            if self.checkpoint:
+                self.checkpoint(len(rows))
+
+    @staticmethod
+    def _changed(to_update, text):
+        # A text added earlier in the same chunk is not saved yet; the change
+        # simply goes into its insert
+        if text.pk is not None:
+            to_update[text.pk] = text
+
+
+def file_fingerprint(upload):
+    """BLAKE2b hex digest of an upload's bytes, to recognise the same file uploaded again."""
+    digest = hashlib.blake2b(digest_size=32)
+    upload.seek(0)
+    for chunk in upload.chunks(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def find_resumable_job(project, file_hash):
+    """The latest unfinished import of the same file into the project, if any."""
+    return (
+        ImportJob.objects.filter(project=project, file_hash=file_hash)
+        .exclude(status=ImportJob.STATUS_DONE)
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def job_checkpoint(job, reader, writer):
+    """TextWriter checkpoint that records the job's progress after each chunk."""
+    base = {'rows': job.rows, 'created': job.created, 'updated': job.updated, 'skipped': job.skipped}
+
+    def checkpoint(rows):
+        base['rows'] += rows
+        job.offset = reader.position
+        job.encoding = reader.encoding
+        job.rows = base['rows']
+        job.created = base['created'] + writer.created
+        job.updated = base['updated'] + writer.updated
+        job.skipped = base['skipped'] + writer.skipped
+        job.save(update_fields=['offset', 'encoding', 'rows', 'created', 'updated', 'skipped', 'updated_at'])
+
+    return checkpoint
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Label, Project
+
+# Labels per project are few and rarely change, so hot paths resolve
+# annotation.label_id through this table instead of joining Label. The key
+# includes Project.label_version, which lives in the database and is bumped on
+# every Label save/delete, so every process sees the change immediately.
+LABEL_TABLE_KEY = 'labels:table:{project_id}:{version}'
+LABEL_TABLE_TIMEOUT = 60 * 60 * 24
+
+
+def bump_label_version(project_id):
+    Project.objects.filter(pk=project_id).update(label_version=F('label_version') + 1)
+
+
+def _label_rows(project_id):
+    return Label.objects.filter(project_id=project_id).values_list('id', 'name', 'color', 'error_code')
+
+
+def get_label_table(project):
+    """Map of label id -> {'name', 'color', 'error_code'} for a project."""
+    key = LABEL_TABLE_KEY.format(project_id=project.id, version=project.label_version)
+    table = cache.get(key)
+    if table is None:
+        table = {
+            label_id: {'name': name, 'color': color, 'error_code': error_code}
+            for label_id, name, color, error_code in _label_rows(project.id)
+        }
+        cache.set(key, table, LABEL_TABLE_TIMEOUT)
+    return table
+
+
+async def aget_label_table(project):
+    key = LABEL_TABLE_KEY.format(project_id=project.id, version=project.label_version)
+    table = await cache.aget(key)
+    if table is None:
+        table = {
+            label_id: {'name': name, 'color': color, 'error_code': error_code}
+            async for label_id, name, color, error_code in _label_rows(project.id)
+        }
+        await cache.aset(key, table, LABEL_TABLE_TIMEOUT)
+    return table
+
+
+def compact_label_table(table, label_ids=None):
+    """{id: [name, color]} as sent to the browser, optionally limited to some ids."""
+    if label_ids is None:
+        label_ids = table.keys()
+    return {label_id: [table[label_id]['name'], table[label_id]['color']]
+            for label_id in label_ids if label_id in table}
@@ -0,0 +1,45 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.agreement import AGREEMENT_CHUNK_SIZE, AgreementEngine
+from annotation.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Compute inter-annotator agreement (kappa, span F1) for a project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--chunk-size', type=int, default=AGREEMENT_CHUNK_SIZE, help='Texts per database round trip')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+
+        started = time.perf_counter()
+        report = AgreementEngine(project, chunk_size=options['chunk_size']).run()
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{report['texts']} texts with 2+ annotators, {report['tokens']} tokens ({elapsed:.1f}s)")
+        self.stdout.write(f"Fleiss' kappa: {_fmt(report['fleiss_kappa'])}")
+        for label in report['labels']:
+            self.stdout.write(f"  {label['label']:<24} {_fmt(label['fleiss_kappa'])}")
+        for pair in report['pairs']:
+            self.stdout.write(
+                f"{' / '.join(pair['annotators'])}: {pair['texts']} texts, "
+                f"kappa {_fmt(pair['cohen_kappa'])}, exact F1 {_fmt(pair['exact_f1'])}, overlap F1 {_fmt(pair['overlap_f1'])}"
+            )
+
+
+def _fmt(value):
+    return '-' if value is None else f'{value:.3f}'
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.adjudication import build_adjudication
+from annotation.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Precompute the adjudication queue (span clusters per text) for a project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--full', action='store_true', help='Rebuild every text, not only changed ones')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+
+        started = time.perf_counter()
+        built = build_adjudication(project, stale_only=not options['full'])
+        items = project.adjudication_items.all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Compared {built} texts in {time.perf_counter() - started:.1f}s; "
+            f"{items.filter(resolved_at__isnull=True, conflicts__gt=0).count()} in the conflict queue, "
+            f"{items.filter(resolved_at__isnull=True, conflicts=0).count()} without conflicts"
+        ))
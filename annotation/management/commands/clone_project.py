@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.cloning import CLONE_CHUNK_SIZE, run_clone_job, start_clone
+from annotation.models import CloneJob, Project
+
+
+class Command(BaseCommand):
+    help = 'Copy a project into a new one, or resume an interrupted clone'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Username of the project owner')
+        parser.add_argument('--project', type=int, help='user_project_id of the project')
+        parser.add_argument('--name', help='Name of the new project (default: "<name> (copy)")')
+        parser.add_argument('--to', help='Username owning the new project (default: the source owner)')
+        parser.add_argument('--annotations', action='store_true', help='Copy the annotations too')
+        parser.add_argument('--no-collaborators', action='store_true', help='Do not add the source collaborators')
+        parser.add_argument('--resume', type=int, help='Id of a CloneJob to carry on with')
+        parser.add_argument('--chunk-size', type=int, default=CLONE_CHUNK_SIZE, help='Texts per transaction')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                job = CloneJob.objects.get(pk=options['resume'])
+            except CloneJob.DoesNotExist:
+                raise CommandError('Clone job not found.')
+        else:
+            if not options['owner'] or not options['project']:
+                raise CommandError('Give --owner and --project, or --resume.')
+            try:
+                source = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+            except Project.DoesNotExist:
+                raise CommandError('Project not found.')
+            owner = source.owner
+            if options['to']:
+                try:
+                    owner = User.objects.get(username=options['to'])
+                except User.DoesNotExist:
+                    raise CommandError(f"User '{options['to']}' not found.")
+            job = start_clone(
+                source,
+                owner,
+                options['name'] or f'{source.name} (copy)',
+                include_annotations=options['annotations'],
+                include_collaborators=not options['no_collaborators'],
+            )
+
+        started = time.perf_counter()
+
+        def progress(job):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{job.texts} of {job.total_texts} texts, {job.annotations} annotations '
+                              f'({job.texts / elapsed:.0f} texts/s)')
+
+        try:
+            run_clone_job(job, chunk_size=options['chunk_size'], progress=progress if options['verbosity'] > 1 else None)
+        except Exception as e:
+            raise CommandError(f'Clone stopped after {job.texts} texts: {e}. Resume with --resume {job.pk}.')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Cloned {job.texts} texts and {job.annotations} annotations into "{job.project.name}" '
+            f'({job.project.owner.username}, project {job.project.user_project_id}) in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.dedup import merge_duplicate_texts
+from annotation.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Merge texts with the same content into one, moving their annotations onto the surviving text'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the duplicates')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+
+        started = time.perf_counter()
+        stats = merge_duplicate_texts(project, dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(f"{stats['groups']} texts have duplicates; merging would remove {stats['merged']} texts")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Merged {stats['merged']} duplicate texts into {stats['groups']} in {elapsed:.1f}s; "
+            f"moved {stats['moved']} annotations, dropped {stats['dropped']} already on the surviving text"
+            + (f"; kept {stats['kept']} copies whose spans could not be mapped" if stats['kept'] else '')
+        ))
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.models import Project, Text
+from annotation.preannotate import PREANNOTATE_BATCH_SIZE, get_machine_user, preannotate
+from annotation.rules import RULES_USERNAME, SCAN_BATCH_SIZE, RuleSet, ensure_rule_labels
+
+
+class Command(BaseCommand):
+    help = 'Mark spacing, repetition and punctuation errors with the rule engine, as candidate annotations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--workers', type=int, default=None, help='Processes (default: one per core, 0 to run inline)')
+        parser.add_argument('--batch-size', type=int, default=PREANNOTATE_BATCH_SIZE, help='Texts per batch')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many texts')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Only time the rules on the project texts (sentences/s); nothing is written')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+
+        if options['benchmark']:
+            self.benchmark(project, options['limit'] or 100000)
+            return
+
+        user = get_machine_user(RULES_USERNAME)
+        created = ensure_rule_labels(project, user)
+        started = time.perf_counter()
+        writer = preannotate(
+            project,
+            predictor='annotation.rules.RulePredictor',
+            user=user,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {writer.texts} texts in {elapsed:.1f}s ({writer.texts / max(elapsed, 1e-9):.0f} sentences/s), '
+            f'saved {writer.written} candidate annotations as {user.username}'
+            + (f'; created {created} labels' if created else '')
+        ))
+
+    def benchmark(self, project, limit):
+        texts = list(Text.objects.filter(project=project).order_by('id').values_list('text', flat=True)[:limit])
+        if not texts:
+            raise CommandError('The project has no texts.')
+        rule_set = RuleSet()
+
+        started = time.perf_counter()
+        found = 0
+        for i in range(0, len(texts), SCAN_BATCH_SIZE):
+            found += sum(map(len, rule_set.scan(texts[i:i + SCAN_BATCH_SIZE])))
+        batched = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for text in texts:
+            rule_set.scan([text])
+        single = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{len(texts)} sentences, {found} candidate spans\n'
+            f'batched ({SCAN_BATCH_SIZE} per scan): {len(texts) / batched:.0f} sentences/s\n'
+            f'one text per scan: {len(texts) / single:.0f} sentences/s'
+        )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.models import Project
+from annotation.token_export import TOKEN_EXPORT_FORMATS, TokenExporter
+
+
+class Command(BaseCommand):
+    help = 'Export a project as token-tagged data (CoNLL/BIO or spaCy-style JSON Lines)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--format', choices=TOKEN_EXPORT_FORMATS, default='conll')
+        parser.add_argument('--annotator', help='Only this user\'s annotations')
+        parser.add_argument('--gold', action='store_true', help='Export the adjudicated gold annotations')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+
+        exporter = TokenExporter(project, options['format'], annotator=options['annotator'], gold=options['gold'])
+        started = time.perf_counter()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                out.writelines(exporter)
+        else:
+            for part in exporter:
+                self.stdout.write(part, ending='')
+        elapsed = time.perf_counter() - started
+        # The summary goes to stderr so it does not end up in piped output
+        self.stderr.write(
+            f'Exported {exporter.texts} texts, {exporter.tokens} tokens and {exporter.spans} spans in {elapsed:.1f}s '
+            f'({exporter.spans / max(elapsed, 1e-9):.0f} spans/s); '
+            f'{exporter.empty} spans covered no token, {exporter.overlapping} overlapped another'
+        )
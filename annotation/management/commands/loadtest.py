@@ -0,0 +1,463 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, Client
+from django.http.request import validate_host
+from django.urls import reverse
+from annotation.models import Project, Text, Label, ProjectCollaborator, content_hash
+from collections import defaultdict
+from http.cookiejar import Cookie, CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+LOADTEST_USER_PREFIX = 'loadtest_'
+LOCK_MARKERS = ('database is locked', 'database table is locked')
+SAVE_ENDPOINTS = ('add_annotation', 'update_annotation', 'delete_annotation')
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _is_lock_error(message):
+    message = (message or '').lower()
+    return any(marker in message for marker in LOCK_MARKERS)
+
+
+def _is_lock_error_response(status, body):
+    # Save views catch OperationalError and answer 500 with the message in the body
+    return status >= 500 and _is_lock_error((body or b'').decode('utf-8', 'replace'))
+
+
+def _client_host():
+    """A Host for the in-process clients that ALLOWED_HOSTS already accepts."""
+    candidates = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'] + ['localhost']
+    for host in candidates:
+        # With DEBUG on and ALLOWED_HOSTS empty, Django accepts localhost
+        allowed = settings.ALLOWED_HOSTS or (['.localhost', '127.0.0.1', '[::1]'] if settings.DEBUG else [])
+        if validate_host(host, allowed):
+            return host
+    raise CommandError('ALLOWED_HOSTS accepts no host the test client can use; run with --base-url.')
+
+
+class Stats:
+    """Thread-safe latency / error collector keyed by endpoint name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = defaultdict(int)
+        self.saves_in_flight = 0
+        self.peak_saves_in_flight = 0
+
+    def enter(self, endpoint):
+        if endpoint in SAVE_ENDPOINTS:
+            with self.lock:
+                self.saves_in_flight += 1
+                self.peak_saves_in_flight = max(self.peak_saves_in_flight, self.saves_in_flight)
+
+    def leave(self, endpoint):
+        if endpoint in SAVE_ENDPOINTS:
+            with self.lock:
+                self.saves_in_flight -= 1
+
+    def record(self, endpoint, elapsed, ok, lock_error=False):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+            if lock_error:
+                self.lock_errors[endpoint] += 1
+
+
+class TestClientTransport:
+    """Drives the views in-process through Django's test client."""
+
+    def __init__(self, user, host):
+        self.client = Client(headers={'Host': host})
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None, files=None):
+        try:
+            if method == 'POST':
+                payload = dict(data or {})
+                for field, (filename, content) in (files or {}).items():
+                    payload[field] = SimpleUploadedFile(filename, content)
+                response = self.client.post(path, payload)
+            else:
+                response = self.client.get(path)
+        except Exception as e:
+            # The test client re-raises view exceptions (e.g. OperationalError)
+            return 500, None, _is_lock_error(str(e))
+        body = response.content if not response.streaming else b''
+        return response.status_code, body, _is_lock_error_response(response.status_code, body)
+
+    def close(self):
+        connection.close()
+
+
+class AsyncTestClientTransport:
+    """Drives the views in-process through the ASGI handler, many requests per thread."""
+
+    def __init__(self, host):
+        self.client = AsyncClient(headers={'Host': host})
+
+    async def login(self, user):
+        await self.client.aforce_login(user)
+
+    async def request(self, method, path, data=None, files=None):
+        try:
+            if method == 'POST':
+                response = await self.client.post(path, data or {})
+            else:
+                response = await self.client.get(path)
+        except Exception as e:
+            return 500, None, _is_lock_error(str(e))
+        body = response.content if not response.streaming else b''
+        return response.status_code, body, _is_lock_error_response(response.status_code, body)
+
+
+class HttpTransport:
+    """Drives a running dev/ASGI server over HTTP using a pre-created session."""
+
+    def __init__(self, user, base_url):
+        self.base_url = base_url.rstrip('/')
+        # force_login writes a real session row, so the server sharing this database accepts it
+        session_client = Client()
+        session_client.force_login(user)
+        self.cookies = CookieJar()
+        self._set_cookie('sessionid', session_client.cookies['sessionid'].value)
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def _set_cookie(self, name, value):
+        self.cookies.set_cookie(Cookie(
+            0, name, value, None, False, '', False, False, '/', True,
+            False, None, False, None, None, {}
+        ))
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    @staticmethod
+    def _multipart(data, files):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in data.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+        for name, (filename, content) in files.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + content + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    def request(self, method, path, data=None, files=None):
+        headers = {}
+        body = None
+        if method == 'POST':
+            if files:
+                body, headers['Content-Type'] = self._multipart(data or {}, files)
+            else:
+                body = urlencode(data or {}).encode('utf-8')
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self._csrf_token()
+            headers['Referer'] = self.base_url + path
+        req = Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.read(), False
+        except HTTPError as e:
+            content = e.read()
+            return e.code, content, _is_lock_error_response(e.code, content)
+        except URLError:
+            return 599, None, False
+
+    def close(self):
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent annotators (and an importing owner) and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help='Username of the project owner (omit to seed a scratch project)')
+        parser.add_argument('--project', type=int, help='user_project_id of the target project')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent annotator threads')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+        parser.add_argument('--rate', type=float, default=0.0,
+                            help='Operations per second per worker (0 = as fast as possible)')
+        parser.add_argument('--base-url', help='Run against a live server (e.g. http://127.0.0.1:8000) '
+                                               'instead of the in-process test client')
+        parser.add_argument('--seed-texts', type=int, default=200, help='Texts to create when seeding')
+        parser.add_argument('--import-every', type=float, default=0.0,
+                            help='Have the owner import a CSV every N seconds while annotators work')
+        parser.add_argument('--import-rows', type=int, default=500, help='Rows per imported CSV')
+        parser.add_argument('--async', dest='use_async', action='store_true',
+                            help='Run the annotator workers as asyncio tasks in one thread through the ASGI handler')
+        parser.add_argument('--cleanup', action='store_true', help='Delete seeded users and project afterwards')
+
+    def handle(self, *args, **options):
+        if options['owner']:
+            project, annotators = self._existing_project(options)
+            seeded = False
+        else:
+            project, annotators = self._seed_project(options)
+            seeded = True
+
+        texts = list(Text.objects.filter(project=project).values_list('id', 'text'))
+        label_ids = list(Label.objects.filter(project=project).values_list('id', flat=True))
+        if not texts or not label_ids:
+            raise CommandError('The target project needs at least one text and one label.')
+
+        if not options['base_url']:
+            self.client_host = _client_host()
+        if options['use_async'] and options['base_url']:
+            raise CommandError('--async drives the in-process ASGI handler and cannot be combined with --base-url.')
+        if options['use_async']:
+            mode = 'asyncio tasks via ASGI handler'
+        elif options['base_url']:
+            mode = 'HTTP ' + options['base_url']
+        else:
+            mode = 'test client threads'
+        self.stdout.write(
+            f"Load testing project '{project.name}' with {options['workers']} workers "
+            f"for {options['duration']:.0f}s ({mode})"
+        )
+
+        stats = Stats()
+        deadline = time.monotonic() + options['duration']
+        threads = []
+        if not options['use_async']:
+            for i in range(options['workers']):
+                user = annotators[i % len(annotators)]
+                threads.append(threading.Thread(
+                    target=self._annotator_worker,
+                    args=(user, project, texts, label_ids, stats, deadline, options),
+                    daemon=True,
+                ))
+        if options['import_every'] > 0:
+            threads.append(threading.Thread(
+                target=self._import_worker,
+                args=(project, stats, deadline, options),
+                daemon=True,
+            ))
+
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        if options['use_async']:
+            asyncio.run(self._run_async_workers(annotators, project, texts, label_ids, stats, deadline, options))
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        self._report(stats, elapsed)
+        os_threads = 1 if options['use_async'] else options['workers']
+        self.stdout.write(
+            f"Peak saves in flight: {stats.peak_saves_in_flight} "
+            f"({stats.peak_saves_in_flight / os_threads:.1f} per worker thread)"
+        )
+
+        if seeded and options['cleanup']:
+            User.objects.filter(username__startswith=LOADTEST_USER_PREFIX).delete()
+            self.stdout.write('Seeded load test data removed.')
+
+    def _existing_project(self, options):
+        if not options['project']:
+            raise CommandError('--project is required together with --owner.')
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+        annotators = [project.owner] + [c.user for c in project.collaborators.select_related('user')]
+        return project, annotators
+
+    def _seed_project(self, options):
+        User.objects.filter(username__startswith=LOADTEST_USER_PREFIX).delete()
+        owner = User.objects.create_user(username=f'{LOADTEST_USER_PREFIX}owner', password='loadtest')
+        project = Project.objects.create(name='Load test', description='Seeded by loadtest', owner=owner)
+        annotators = [owner]
+        for i in range(max(1, options['workers'] - 1)):
+            user = User.objects.create_user(username=f'{LOADTEST_USER_PREFIX}{i}', password='loadtest')
+            ProjectCollaborator.objects.create(project=project, user=user)
+            annotators.append(user)
+        for name, color in (('PUNCTUATION_ERROR', '#8383E2'), ('NON_WORD_ERROR', '#F1F14A'),
+                            ('REPETITION_ERROR', '#985298')):
+            Label.objects.create(name=name, color=color, project=project, created_by=owner, is_static=True)
+        sentence = 'আমি বাংলায় গান গাই, আমি বাংলার গান গাই। '
+        seeds = [sentence * random.randint(1, 6) for _ in range(options['seed_texts'])]
+        Text.objects.bulk_create([
+            Text(project=project, text_id=f'seed-{i}', text=text, content_hash=content_hash(text))
+            for i, text in enumerate(seeds)
+        ])
+        return project, annotators
+
+    def _transport(self, user, options):
+        if options['base_url']:
+            return HttpTransport(user, options['base_url'])
+        return TestClientTransport(user, self.client_host)
+
+    def _timed(self, transport, stats, endpoint, method, path, data=None, files=None):
+        stats.enter(endpoint)
+        started = time.perf_counter()
+        try:
+            status, body, lock_error = transport.request(method, path, data, files)
+        finally:
+            stats.leave(endpoint)
+        elapsed = time.perf_counter() - started
+        stats.record(endpoint, elapsed, status < 400, lock_error)
+        return status, body
+
+    async def _atimed(self, transport, stats, endpoint, method, path, data=None):
+        stats.enter(endpoint)
+        started = time.perf_counter()
+        try:
+            status, body, lock_error = await transport.request(method, path, data)
+        finally:
+            stats.leave(endpoint)
+        elapsed = time.perf_counter() - started
+        stats.record(endpoint, elapsed, status < 400, lock_error)
+        return status, body
+
+    @staticmethod
+    def _scenario(project, texts, label_ids):
+        """One annotator session: yields (endpoint, method, path, data) and receives (status, body)."""
+        url_kwargs = {'user_id': project.owner_id, 'user_project_id': project.user_project_id}
+        own_annotations = []  # (annotation_id, text_id)
+        while True:
+            text_id, content = random.choice(texts)
+            text_kwargs = dict(url_kwargs, text_id=text_id)
+
+            yield 'text_annotate', 'GET', reverse('text_annotate', kwargs=text_kwargs), None
+
+            if len(content) > 1:
+                start = random.randrange(0, len(content) - 1)
+                end = random.randint(start + 1, min(len(content), start + 12))
+                status, body = yield 'add_annotation', 'POST', reverse('add_annotation', kwargs=text_kwargs), {
+                    'start_index': start, 'end_index': end, 'label_id': random.choice(label_ids),
+                    'suggestions': '["loadtest"]',
+                }
+                annotation_id = Command._annotation_id(body) if status == 200 else None
+                if annotation_id:
+                    own_annotations.append((annotation_id, text_id))
+
+            roll = random.random()
+            if own_annotations and roll < 0.3:
+                annotation_id, ann_text_id = random.choice(own_annotations)
+                yield 'update_annotation', 'POST', reverse('update_annotation', kwargs=dict(
+                    url_kwargs, text_id=ann_text_id, annotation_id=annotation_id
+                )), {'suggestions': '["loadtest", "updated"]'}
+            elif own_annotations and roll < 0.5:
+                annotation_id, _ = own_annotations.pop(random.randrange(len(own_annotations)))
+                yield 'delete_annotation', 'POST', reverse('delete_annotation', kwargs={'annotation_id': annotation_id}), None
+
+    def _annotator_worker(self, user, project, texts, label_ids, stats, deadline, options):
+        transport = self._transport(user, options)
+        interval = 1.0 / options['rate'] if options['rate'] > 0 else 0.0
+        scenario = self._scenario(project, texts, label_ids)
+        try:
+            step = next(scenario)
+            while time.monotonic() < deadline:
+                tick = time.monotonic()
+                endpoint, method, path, data = step
+                result = self._timed(transport, stats, endpoint, method, path, data)
+                step = scenario.send(result)
+                if interval:
+                    time.sleep(max(0.0, interval - (time.monotonic() - tick)))
+        finally:
+            transport.close()
+
+    async def _async_annotator_worker(self, user, project, texts, label_ids, stats, deadline, options):
+        transport = AsyncTestClientTransport(self.client_host)
+        await transport.login(user)
+        interval = 1.0 / options['rate'] if options['rate'] > 0 else 0.0
+        scenario = self._scenario(project, texts, label_ids)
+        step = next(scenario)
+        while time.monotonic() < deadline:
+            tick = time.monotonic()
+            endpoint, method, path, data = step
+            result = await self._atimed(transport, stats, endpoint, method, path, data)
+            step = scenario.send(result)
+            if interval:
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - tick)))
+
+    async def _run_async_workers(self, annotators, project, texts, label_ids, stats, deadline, options):
+        await asyncio.gather(*(
+            self._async_annotator_worker(annotators[i % len(annotators)], project, texts, label_ids,
+                                         stats, deadline, options)
+            for i in range(options['workers'])
+        ))
+
+    def _import_worker(self, project, stats, deadline, options):
+        transport = self._transport(project.owner, options)
+        path = reverse('texts_import', kwargs={'user_id': project.owner_id,
+                                               'user_project_id': project.user_project_id})
+        batch = 0
+        try:
+            transport.request('GET', path)  # primes the CSRF cookie for live servers
+            while time.monotonic() < deadline:
+                batch += 1
+                rows = ['ID,Content'] + [
+                    f'lt-{batch}-{i},আমি বাংলায় গান গাই {batch}-{i}' for i in range(options['import_rows'])
+                ]
+                self._timed(transport, stats, 'texts_import', 'POST', path, {'import_type': 'single'},
+                            {'csv_file': ('loadtest.csv', '\n'.join(rows).encode('utf-8'))})
+                time.sleep(options['import_every'])
+        finally:
+            transport.close()
+
+    @staticmethod
+    def _annotation_id(body):
+        try:
+            return json.loads(body).get('id')
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def _report(self, stats, elapsed):
+        self.stdout.write('')
+        header = f"{'endpoint':<20}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" \
+                 f"{'errors':>9}{'err %':>8}{'locked':>8}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total_requests = 0
+        total_errors = 0
+        for endpoint in sorted(stats.latencies):
+            latencies = sorted(stats.latencies[endpoint])
+            count = len(latencies)
+            errors = stats.errors[endpoint]
+            total_requests += count
+            total_errors += errors
+            self.stdout.write(
+                f"{endpoint:<20}{count:>10}{count / elapsed:>10.1f}"
+                f"{_percentile(latencies, 50) * 1000:>10.1f}{_percentile(latencies, 95) * 1000:>10.1f}"
+                f"{_percentile(latencies, 99) * 1000:>10.1f}{errors:>9}{100.0 * errors / count:>8.2f}"
+                f"{stats.lock_errors[endpoint]:>8}"
+            )
+        self.stdout.write('-' * len(header))
+        if total_requests:
+            summary = (f"{total_requests} requests in {elapsed:.1f}s "
+                       f"({total_requests / elapsed:.1f} req/s), error rate {100.0 * total_errors / total_requests:.2f}%")
+            if total_errors:
+                self.stdout.write(self.style.WARNING(summary))
+            else:
+                self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.ERROR('No requests completed.'))
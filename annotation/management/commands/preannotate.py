@@ -0,0 +1,65 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.models import Project
+from annotation.preannotate import DEFAULT_PREDICTOR, MACHINE_USERNAME, PREANNOTATE_BATCH_SIZE, get_machine_user, preannotate
+
+
+class Command(BaseCommand):
+    help = 'Pre-annotate a project with a local predictor, saved as a machine user for humans to correct'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--predictor', default=DEFAULT_PREDICTOR, help='Dotted path of a Predictor class')
+        parser.add_argument('--predictor-args', default='{}', help='JSON object of keyword arguments for the predictor')
+        parser.add_argument('--user', default=MACHINE_USERNAME, help='Account the annotations are saved as')
+        parser.add_argument('--workers', type=int, default=None, help='Predictor processes (default: one per core, 0 to run inline)')
+        parser.add_argument('--batch-size', type=int, default=PREANNOTATE_BATCH_SIZE, help='Texts per batch')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many texts')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+        try:
+            predictor_kwargs = json.loads(options['predictor_args'])
+        except ValueError:
+            raise CommandError('--predictor-args must be a JSON object.')
+
+        if options['user'] == MACHINE_USERNAME:
+            user = get_machine_user()
+        else:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' not found.")
+
+        started = time.perf_counter()
+
+        def progress(texts, annotations):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{texts} texts, {annotations} annotations ({texts / elapsed:.0f} texts/s)')
+
+        writer = preannotate(
+            project,
+            predictor=options['predictor'],
+            predictor_kwargs=predictor_kwargs,
+            user=user,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Pre-annotated {writer.texts} texts in {elapsed:.1f}s ({writer.texts / max(elapsed, 1e-9):.0f} texts/s), '
+            f'saved {writer.written} annotations as {user.username}'
+            + (f'; created {writer.labels_created} labels' if writer.labels_created else '')
+            + (f'; skipped {writer.skipped} out-of-range predictions' if writer.skipped else '')
+            + (f'; {writer.duplicates} duplicate predictions were not saved' if writer.duplicates else '')
+        ))
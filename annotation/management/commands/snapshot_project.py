@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotation.models import Project, ProjectSnapshot
+from annotation.snapshots import (
+    create_snapshot, diff_snapshots, diff_summary, encode_change, snapshot_path, snapshot_timestamp, verify_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = 'Take, verify or compare snapshots of a project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', required=True, help='Username of the project owner')
+        parser.add_argument('--project', type=int, required=True, help='user_project_id of the project')
+        parser.add_argument('--name', help='Name of the new snapshot (default: the current time)')
+        parser.add_argument('--verify', metavar='NAME', help='Check a snapshot against its checksums')
+        parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'), help='Compare two snapshots')
+        parser.add_argument('--changes', action='store_true', help='With --diff, print every change as JSON Lines')
+
+    def _snapshot(self, project, name):
+        try:
+            snapshot = project.snapshots.get(name=name)
+        except ProjectSnapshot.DoesNotExist:
+            raise CommandError(f"Snapshot '{name}' not found.")
+        if snapshot.status != ProjectSnapshot.STATUS_DONE:
+            raise CommandError(f"Snapshot '{name}' is {snapshot.get_status_display().lower()}.")
+        return snapshot
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(owner__username=options['owner'], user_project_id=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError('Project not found.')
+
+        if options['verify']:
+            problems = verify_snapshot(self._snapshot(project, options['verify']))
+            if problems:
+                raise CommandError('; '.join(problems))
+            self.stdout.write(self.style.SUCCESS('Snapshot is intact.'))
+            return
+
+        if options['diff']:
+            old, new = (self._snapshot(project, name) for name in options['diff'])
+            if options['changes']:
+                for change in diff_snapshots(old, new):
+                    self.stdout.write(encode_change(change), ending='')
+                return
+            for kind, counts in diff_summary(diff_snapshots(old, new)).items():
+                self.stdout.write(f"{kind}s: {counts['+']} added, {counts['-']} removed, {counts['~']} changed")
+            return
+
+        name = options['name'] or snapshot_timestamp()
+        if project.snapshots.filter(name=name).exists():
+            raise CommandError(f"Snapshot '{name}' already exists.")
+        started = time.perf_counter()
+        try:
+            snapshot = create_snapshot(project, name)
+        except Exception as e:
+            project.snapshots.filter(name=name).delete()
+            raise CommandError(f'Snapshot failed: {e}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved snapshot "{snapshot.name}" with {snapshot.texts} texts and {snapshot.annotations} annotations '
+            f'({snapshot.size} bytes) to {snapshot_path(snapshot)} in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,18 @@
+from django.middleware.gzip import GZipMiddleware
+
+# Responses that are compressed already or must reach the client unbuffered
+UNCOMPRESSED_TYPES = ('application/gzip', 'application/zip', 'text/event-stream', 'image/')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware for the dynamic pages and exports.
+
+    Static files are compressed ahead of time by collectstatic and served by
+    WhiteNoise, which sits above this middleware; snapshot downloads (gzip
+    already) and the live event stream are passed through untouched.
+    """
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith(UNCOMPRESSED_TYPES):
+            return response
+        return super().process_response(request, response)
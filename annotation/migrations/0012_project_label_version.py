@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0011_alter_label_error_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='label_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
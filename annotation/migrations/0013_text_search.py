@@ -0,0 +1,95 @@
+from django.db import migrations
+
+# unicode61 by default only keeps letters and digits inside tokens, which cuts
+# Bangla words apart at every vowel sign, virama and nukta (Mn/Mc). Keeping
+# combining marks, plus ZWNJ/ZWJ used in conjuncts, makes whole words tokens.
+# The project id is an indexed column too, so the project filter is resolved
+# from the index rather than by reading every matching row.
+SQLITE_TOKENIZER = "unicode61 remove_diacritics 2 categories 'L* N* Co M*' tokenchars '\u200c\u200d'"
+
+SUGGESTIONS_OF = """(
+    SELECT group_concat(j.value, ' ')
+    FROM annotation_annotation a, json_each(a.suggestions) j
+    WHERE a.text_id = {text_id}
+)"""
+
+SQLITE_FORWARDS = [
+    f"""CREATE VIRTUAL TABLE annotation_text_fts USING fts5(
+        text_id, text, suggestions, project,
+        tokenize = "{SQLITE_TOKENIZER}"
+    )""",
+    f"""INSERT INTO annotation_text_fts(rowid, text_id, text, suggestions, project)
+        SELECT t.id, t.text_id, t.text, {SUGGESTIONS_OF.format(text_id='t.id')}, t.project_id
+        FROM annotation_text t""",
+    """CREATE TRIGGER annotation_text_fts_ai AFTER INSERT ON annotation_text BEGIN
+        INSERT INTO annotation_text_fts(rowid, text_id, text, suggestions, project)
+        VALUES (NEW.id, NEW.text_id, NEW.text, NULL, NEW.project_id);
+    END""",
+    """CREATE TRIGGER annotation_text_fts_au AFTER UPDATE OF text_id, text, project_id ON annotation_text BEGIN
+        UPDATE annotation_text_fts
+        SET text_id = NEW.text_id, text = NEW.text, project = NEW.project_id
+        WHERE rowid = NEW.id;
+    END""",
+    """CREATE TRIGGER annotation_text_fts_ad AFTER DELETE ON annotation_text BEGIN
+        DELETE FROM annotation_text_fts WHERE rowid = OLD.id;
+    END""",
+    f"""CREATE TRIGGER annotation_annotation_fts_ai AFTER INSERT ON annotation_annotation BEGIN
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='NEW.text_id')}
+        WHERE rowid = NEW.text_id;
+    END""",
+    f"""CREATE TRIGGER annotation_annotation_fts_au AFTER UPDATE OF suggestions, text_id ON annotation_annotation BEGIN
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='OLD.text_id')}
+        WHERE rowid = OLD.text_id;
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='NEW.text_id')}
+        WHERE rowid = NEW.text_id;
+    END""",
+    f"""CREATE TRIGGER annotation_annotation_fts_ad AFTER DELETE ON annotation_annotation BEGIN
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='OLD.text_id')}
+        WHERE rowid = OLD.text_id;
+    END""",
+]
+
+SQLITE_BACKWARDS = [
+    'DROP TRIGGER IF EXISTS annotation_annotation_fts_ad',
+    'DROP TRIGGER IF EXISTS annotation_annotation_fts_au',
+    'DROP TRIGGER IF EXISTS annotation_annotation_fts_ai',
+    'DROP TRIGGER IF EXISTS annotation_text_fts_ad',
+    'DROP TRIGGER IF EXISTS annotation_text_fts_au',
+    'DROP TRIGGER IF EXISTS annotation_text_fts_ai',
+    'DROP TABLE IF EXISTS annotation_text_fts',
+]
+
+# Trigram GIN indexes serve the ILIKE '%term%' queries in annotation.search
+POSTGRESQL_FORWARDS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX annotation_text_text_trgm ON annotation_text USING gin (text gin_trgm_ops)',
+    'CREATE INDEX annotation_text_text_id_trgm ON annotation_text USING gin (text_id gin_trgm_ops)',
+    'CREATE INDEX annotation_annotation_suggestions_trgm ON annotation_annotation USING gin ((suggestions::text) gin_trgm_ops)',
+]
+
+POSTGRESQL_BACKWARDS = [
+    'DROP INDEX IF EXISTS annotation_annotation_suggestions_trgm',
+    'DROP INDEX IF EXISTS annotation_text_text_id_trgm',
+    'DROP INDEX IF EXISTS annotation_text_text_trgm',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0012_project_label_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARDS, 'postgresql': POSTGRESQL_FORWARDS}),
+            _run({'sqlite': SQLITE_BACKWARDS, 'postgresql': POSTGRESQL_BACKWARDS}),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0013_text_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['text', 'label'], name='annotation__text_id_3ee015_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['text', 'created_at'], name='annotation__text_id_56c635_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0014_annotation_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdjudicationItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annotators', models.PositiveIntegerField()),
+                ('clusters', models.JSONField(default=list)),
+                ('conflicts', models.PositiveIntegerField(default=0)),
+                ('disagreement', models.FloatField(default=0)),
+                ('is_stale', models.BooleanField(default=False)),
+                ('built_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adjudication_items', to='annotation.project')),
+                ('resolved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('text', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='adjudication', to='annotation.text')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'resolved_at', 'disagreement'], name='annotation__project_9c088b_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GoldAnnotation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_index', models.IntegerField()),
+                ('end_index', models.IntegerField()),
+                ('suggestions', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('accepted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('label', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='annotation.label')),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gold_annotations', to='annotation.text')),
+            ],
+            options={
+                'unique_together': {('text', 'start_index', 'end_index', 'label')},
+            },
+        ),
+    ]
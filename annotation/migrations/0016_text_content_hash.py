@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:42
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def backfill_content_hashes(apps, schema_editor):
+    # Same digest as annotation.models.content_hash, frozen here
+    Text = apps.get_model('annotation', 'Text')
+    last_id = 0
+    while True:
+        batch = list(Text.objects.filter(id__gt=last_id).order_by('id').only('id', 'text')[:2000])
+        if not batch:
+            break
+        for text in batch:
+            normalized = unicodedata.normalize('NFC', text.text).strip()
+            text.content_hash = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+        Text.objects.bulk_update(batch, ['content_hash'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0015_adjudication'),
+    ]
+
+    operations = [
+        # Nullable so SQLite adds the column in place instead of rebuilding
+        # annotation_text, which would drop the search triggers from 0013
+        migrations.AddField(
+            model_name='text',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='text',
+            index=models.Index(fields=['project', 'content_hash'], name='annotation__project_4dde46_idx'),
+        ),
+    ]
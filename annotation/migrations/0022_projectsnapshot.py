@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0021_annotationevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('directory', models.CharField(blank=True, max_length=255)),
+                ('texts', models.BigIntegerField(default=0)),
+                ('annotations', models.BigIntegerField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+                ('manifest_sha256', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='annotation.project')),
+            ],
+            options={
+                'unique_together': {('project', 'name')},
+            },
+        ),
+    ]
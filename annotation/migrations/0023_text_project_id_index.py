@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0022_projectsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='text',
+            index=models.Index(fields=['project', 'id'], name='annotation__project_d382fb_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# Annotations without suggestions leave the indexed row untouched, so saving
+# plain spans does not rewrite the text's index entry. The triggers created by
+# 0013_text_search refreshed it on every annotation write; they are replaced
+# here with the same bodies behind WHEN clauses.
+SUGGESTIONS_OF = """(
+    SELECT group_concat(j.value, ' ')
+    FROM annotation_annotation a, json_each(a.suggestions) j
+    WHERE a.text_id = {text_id}
+)"""
+
+INSERT_BODY = f"""BEGIN
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='NEW.text_id')}
+        WHERE rowid = NEW.text_id;
+    END"""
+
+UPDATE_BODY = f"""BEGIN
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='OLD.text_id')}
+        WHERE rowid = OLD.text_id;
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='NEW.text_id')}
+        WHERE rowid = NEW.text_id;
+    END"""
+
+DELETE_BODY = f"""BEGIN
+        UPDATE annotation_text_fts SET suggestions = {SUGGESTIONS_OF.format(text_id='OLD.text_id')}
+        WHERE rowid = OLD.text_id;
+    END"""
+
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS annotation_annotation_fts_ad',
+    'DROP TRIGGER IF EXISTS annotation_annotation_fts_au',
+    'DROP TRIGGER IF EXISTS annotation_annotation_fts_ai',
+]
+
+SQLITE_FORWARDS = DROP_TRIGGERS + [
+    f"""CREATE TRIGGER annotation_annotation_fts_ai AFTER INSERT ON annotation_annotation
+    WHEN json_array_length(NEW.suggestions) > 0 {INSERT_BODY}""",
+    f"""CREATE TRIGGER annotation_annotation_fts_au AFTER UPDATE OF suggestions, text_id ON annotation_annotation
+    WHEN (OLD.suggestions IS NOT NEW.suggestions OR OLD.text_id IS NOT NEW.text_id)
+        AND (json_array_length(OLD.suggestions) > 0 OR json_array_length(NEW.suggestions) > 0) {UPDATE_BODY}""",
+    f"""CREATE TRIGGER annotation_annotation_fts_ad AFTER DELETE ON annotation_annotation
+    WHEN json_array_length(OLD.suggestions) > 0 {DELETE_BODY}""",
+]
+
+SQLITE_BACKWARDS = DROP_TRIGGERS + [
+    f'CREATE TRIGGER annotation_annotation_fts_ai AFTER INSERT ON annotation_annotation {INSERT_BODY}',
+    f'CREATE TRIGGER annotation_annotation_fts_au AFTER UPDATE OF suggestions, text_id ON annotation_annotation {UPDATE_BODY}',
+    f'CREATE TRIGGER annotation_annotation_fts_ad AFTER DELETE ON annotation_annotation {DELETE_BODY}',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0023_text_project_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARDS}),
+            _run({'sqlite': SQLITE_BACKWARDS}),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0024_guard_annotation_search_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectsnapshot',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='projectsnapshot',
+            name='status',
+            # Snapshots taken before this migration were written synchronously
+            field=models.CharField(choices=[('running', 'Running'), ('failed', 'Failed'), ('done', 'Done')], default='done', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='projectsnapshot',
+            name='status',
+            field=models.CharField(choices=[('running', 'Running'), ('failed', 'Failed'), ('done', 'Done')], default='running', max_length=10),
+        ),
+    ]
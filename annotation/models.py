@@ -1,12 +1,27 @@
+import hashlib
+import unicodedata
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+
+def content_hash(text):
+    """BLAKE2b digest of a text's content, used to find duplicate sentences.
+
+    Only Unicode composition and surrounding whitespace are normalized; inner
+    spacing is kept because spacing mistakes are themselves annotated.
+    """
+    normalized = unicodedata.normalize('NFC', text).strip()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
 class Project(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_projects')
     user_project_id = models.PositiveIntegerField(editable=False)
+    label_version = models.PositiveIntegerField(default=1, editable=False)  # Bumped on Label save/delete
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -49,9 +64,26 @@ class Text(models.Model):
     text_id = models.CharField(max_length=255, blank=True)  # Main data id
     text = models.TextField()  # Main text/sentence
     meta = models.JSONField(default=dict)  # For additional data
+    content_hash = models.CharField(max_length=32, null=True, blank=True, editable=False)  # See content_hash()
+    cloned_from = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)  # Source Text id of a cloned project
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'content_hash']),
+            # Next/previous unannotated text, walked in id order (views.next_text)
+            models.Index(fields=['project', 'id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # bulk_create and update() bypass this, so those callers set the hash themselves
+        self.content_hash = content_hash(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Doc {self.id}: {self.text[:50]}..."
 
@@ -68,10 +100,215 @@ class Annotation(models.Model):
 
     class Meta:
         unique_together = ('text', 'user', 'start_index', 'end_index', 'label')
+        # Per-text probes for the project listing filters; (text, user) is
+        # already covered by the unique constraint
+        indexes = [
+            models.Index(fields=['text', 'label']),
+            models.Index(fields=['text', 'created_at']),
+        ]
 
     def __str__(self):
         return f"Annotation by {self.user.username} on {self.text}"
 
+class AnnotationEvent(models.Model):
+    """Append-only record of one change to an annotation, see annotation/history.py.
+
+    ``data`` uses the short keys of the annotation API (s, e, l, u, g, r): the
+    full annotation for a create, the state before a delete, and for an
+    update only the changed keys as [before, after] pairs.
+    """
+    ACTION_CREATED = 'c'
+    ACTION_UPDATED = 'u'
+    ACTION_DELETED = 'd'
+    ACTION_CHOICES = [
+        (ACTION_CREATED, 'Created'),
+        (ACTION_UPDATED, 'Updated'),
+        (ACTION_DELETED, 'Deleted'),
+    ]
+
+    # Indexed through Meta.indexes, which lead with these columns
+    text = models.ForeignKey(Text, on_delete=models.CASCADE, related_name='annotation_events', db_index=False)
+    annotation_id = models.BigIntegerField()  # Not a foreign key: the annotation may be gone
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False)
+    action = models.CharField(max_length=1, choices=ACTION_CHOICES)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['text', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} annotation {self.annotation_id} on {self.text_id}"
+
+class AdjudicationItem(models.Model):
+    """Precomputed comparison of the annotators' spans on one text (see annotation.adjudication)."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='adjudication_items')
+    text = models.OneToOneField(Text, on_delete=models.CASCADE, related_name='adjudication')
+    annotators = models.PositiveIntegerField()
+    clusters = models.JSONField(default=list)  # Overlapping spans grouped, with their variants
+    conflicts = models.PositiveIntegerField(default=0)
+    disagreement = models.FloatField(default=0)  # Share of clusters the annotators disagree on
+    is_stale = models.BooleanField(default=False)  # Annotations changed since the clusters were built
+    built_at = models.DateTimeField(default=timezone.now)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    resolved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'resolved_at', 'disagreement']),
+        ]
+
+    def __str__(self):
+        return f"Adjudication of {self.text}"
+
+class GoldAnnotation(models.Model):
+    text = models.ForeignKey(Text, on_delete=models.CASCADE, related_name='gold_annotations')
+    label = models.ForeignKey(Label, on_delete=models.CASCADE)
+    start_index = models.IntegerField()
+    end_index = models.IntegerField()
+    suggestions = models.JSONField(default=list, blank=True)
+    accepted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('text', 'start_index', 'end_index', 'label')
+
+    def __str__(self):
+        return f"Gold annotation on {self.text}"
+
+class ImportJob(models.Model):
+    """Progress of a chunked text import, so an interrupted upload can be resumed.
+
+    A checkpoint is written in the same transaction as each chunk of texts:
+    the reader's position and the row number the next chunk starts at, plus
+    the encoding and header needed to carry on reading from there. The same
+    file uploaded again (matched by ``file_hash``) resumes from it.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_DONE, 'Done'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='import_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField()
+    file_hash = models.CharField(max_length=64)
+    format = models.CharField(max_length=20, default='csv')  # Name of the reader in annotation.readers
+    encoding = models.CharField(max_length=32, blank=True)
+    fieldnames = models.JSONField(default=list)
+    duplicates = models.CharField(max_length=10)
+    offset = models.BigIntegerField(default=0)  # Raw bytes (rows for columnar files) already imported
+    rows = models.BigIntegerField(default=0)  # Data rows already imported
+    created = models.BigIntegerField(default=0)
+    updated = models.BigIntegerField(default=0)
+    skipped = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'file_hash', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Import of {self.file_name} into {self.project}"
+
+class CloneJob(models.Model):
+    """Copy of a project's texts, and optionally annotations, into a new project.
+
+    Texts are copied in chunks of source ids; ``last_text_id`` is saved in
+    the same transaction as each chunk, so a failed or interrupted job
+    carries on from there when it is run again.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_DONE, 'Done'),
+    ]
+
+    source = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, related_name='clones')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='clone_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    include_annotations = models.BooleanField(default=True)
+    last_text_id = models.BigIntegerField(default=0)  # Highest source Text id copied so far
+    total_texts = models.BigIntegerField(default=0)
+    texts = models.BigIntegerField(default=0)
+    annotations = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Clone of {self.source} into {self.project}"
+
+class ProjectSnapshot(models.Model):
+    """A named, immutable copy of a project's texts and annotations on disk.
+
+    ``directory`` is relative to settings.SNAPSHOT_ROOT and holds gzipped
+    JSON Lines files plus manifest.json with their row counts and SHA-256
+    checksums; see annotation/snapshots.py. The files are written in the
+    background; only snapshots that are done can be downloaded or compared.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_DONE, 'Done'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='snapshots')
+    name = models.CharField(max_length=255)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    directory = models.CharField(max_length=255, blank=True)
+    texts = models.BigIntegerField(default=0)
+    annotations = models.BigIntegerField(default=0)
+    size = models.BigIntegerField(default=0)  # Bytes on disk, manifest included
+    manifest_sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('project', 'name')
+
+    def __str__(self):
+        return f"{self.project} @ {self.name}"
+
+class ProjectTemplate(models.Model):
+    """A reusable setup for new projects: labels, collaborators and field defaults.
+
+    ``labels`` holds one dict per label with the Label fields (name,
+    error_code, color, description, is_static). ``settings`` holds defaults
+    for project fields left empty on creation. Templates without an owner
+    are offered to everyone.
+    """
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='project_templates')
+    labels = models.JSONField(default=list, blank=True)
+    collaborators = models.ManyToManyField(User, blank=True, related_name='+')
+    settings = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
 class ProjectCollaborator(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='collaborators')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='collaborations')
@@ -0,0 +1,147 @@
+import hashlib
+import re
+import unicodedata
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+# Annotation offsets are stored in code points (Python string indexes), while
+# the annotate page works on JavaScript strings, which count UTF-16 units.
+# Both agree except on characters outside the Basic Multilingual Plane (emoji,
+# rare CJK), which take two UTF-16 units. The offset map of a text lists:
+#   astral  code-point offsets of those characters
+#   joins   code-point offsets inside a grapheme cluster, where a span must not
+#           start or end (combining marks, emoji sequences, flags, CRLF)
+# Both are sorted and empty for most texts, so conversions in either direction
+# are a binary search. The map is keyed by a digest of the exact text and so
+# never goes stale.
+OFFSET_MAP_KEY = 'text:offsets:{text_id}:{digest}'
+OFFSET_MAP_TIMEOUT = 60 * 60 * 24
+OFFSET_UNITS = ('codepoint', 'utf16')
+
+_ZWJ = chr(0x200D)
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]|\r\n')
+_LONE_SURROGATE_RE = re.compile('[%s-%s]' % (chr(0xD800), chr(0xDFFF)))
+
+
+def _is_regional_indicator(char):
+    return 0x1F1E6 <= ord(char) <= 0x1F1FF
+
+
+def _extends_cluster(char):
+    """Whether ``char`` attaches to the character before it."""
+    code = ord(char)
+    return (
+        unicodedata.category(char) in ('Mn', 'Mc', 'Me')
+        or char == _ZWJ
+        or 0xFE00 <= code <= 0xFE0F  # Variation selectors
+        or 0x1F3FB <= code <= 0x1F3FF  # Skin tone modifiers
+        or 0xE0020 <= code <= 0xE007F  # Emoji tag sequences
+        or 0xE0100 <= code <= 0xE01EF  # Variation selectors supplement
+    )
+
+
+def build_offset_map(text):
+    """{'astral': [...], 'joins': [...]} for ``text``, as described above.
+
+    Grapheme clusters follow the main rules of UAX #29 (extending marks,
+    zero-width-joiner sequences, regional indicator pairs and CRLF), which
+    covers the texts annotated here without a full segmentation library. Only
+    non-ASCII characters are inspected, so ASCII texts cost one regex scan.
+    """
+    astral = []
+    joins = []
+    regional_run = 0
+    previous_end = None
+    for match in _NON_ASCII_RE.finditer(text):
+        position, char = match.start(), match.group()
+        if char == '\r\n':
+            joins.append(position + 1)
+            continue
+        if ord(char) > 0xFFFF:
+            astral.append(position)
+        if _is_regional_indicator(char):
+            # Flags are pairs of regional indicators
+            regional_run = regional_run + 1 if previous_end == position else 1
+            if regional_run % 2 == 0:
+                joins.append(position)
+        else:
+            regional_run = 0
+            if position and (_extends_cluster(char) or (text[position - 1] == _ZWJ and unicodedata.category(char) == 'So')):
+                joins.append(position)
+        previous_end = position + 1
+    return {'astral': astral, 'joins': joins}
+
+
+def _offset_map_key(text):
+    digest = hashlib.blake2b(text.text.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+    return OFFSET_MAP_KEY.format(text_id=text.id, digest=digest)
+
+
+def get_offset_map(text):
+    """Offset map of a Text, cached under its id and a digest of its content."""
+    key = _offset_map_key(text)
+    offset_map = cache.get(key)
+    if offset_map is None:
+        offset_map = build_offset_map(text.text)
+        cache.set(key, offset_map, OFFSET_MAP_TIMEOUT)
+    return offset_map
+
+
+async def aget_offset_map(text):
+    key = _offset_map_key(text)
+    offset_map = await cache.aget(key)
+    if offset_map is None:
+        offset_map = build_offset_map(text.text)
+        await cache.aset(key, offset_map, OFFSET_MAP_TIMEOUT)
+    return offset_map
+
+
+def to_utf16(offset_map, offset):
+    """UTF-16 offset of a code-point offset."""
+    return offset + bisect_left(offset_map['astral'], offset)
+
+
+def from_utf16(offset_map, offset):
+    """Code-point offset of a UTF-16 offset; one inside a surrogate pair moves back to its start."""
+    astral = offset_map['astral']
+    # The k-th astral character starts at UTF-16 offset astral[k] + k; each
+    # one starting before ``offset`` adds one unit
+    low, high = 0, len(astral)
+    while low < high:
+        middle = (low + high) // 2
+        if astral[middle] + middle < offset:
+            low = middle + 1
+        else:
+            high = middle
+    return offset - low
+
+
+def _inside_cluster(joins, offset):
+    i = bisect_left(joins, offset)
+    return i < len(joins) and joins[i] == offset
+
+
+def snap_to_graphemes(offset_map, start, end):
+    """Widen a code-point span so both ends fall on grapheme cluster boundaries."""
+    joins = offset_map['joins']
+    while _inside_cluster(joins, start):
+        start -= 1
+    while _inside_cluster(joins, end):
+        end += 1
+    return start, end
+
+
+def span_to_codepoints(offset_map, start, end, unit='codepoint'):
+    """A span sent by a client in ``unit``, as code points on grapheme boundaries."""
+    if unit == 'utf16':
+        utf16_end = end
+        start, end = from_utf16(offset_map, start), from_utf16(offset_map, end)
+        if to_utf16(offset_map, end) < utf16_end:
+            end += 1  # An end inside a surrogate pair keeps the whole character
+    return snap_to_graphemes(offset_map, start, end)
+
+
+def replace_lone_surrogates(value):
+    """Replace unpaired surrogates, which cannot be encoded, keeping every offset in place."""
+    return _LONE_SURROGATE_RE.sub(' ', value)
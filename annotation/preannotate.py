@@ -0,0 +1,229 @@
+import multiprocessing
+import os
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils.module_loading import import_string
+
+from .models import AdjudicationItem, Annotation, Label, Text
+
+MACHINE_USERNAME = 'preannotator'
+DEFAULT_PREDICTOR = 'annotation.preannotate.RegexPredictor'
+PREANNOTATE_BATCH_SIZE = 1000
+MACHINE_LABEL_COLOR = '#444040'
+
+Prediction = namedtuple('Prediction', 'start end label suggestions', defaults=((),))
+
+
+class Predictor:
+    """Interface for local models that propose annotations.
+
+    Subclasses implement ``predict`` for one text or ``predict_batch`` when
+    the model is faster on many texts at once. Predictions name the label,
+    which is created in the project if it does not exist yet. Predictors are
+    built once per worker process, so loading a model belongs in __init__.
+    """
+
+    def predict(self, text):
+        raise NotImplementedError
+
+    def predict_batch(self, texts):
+        return [self.predict(text) for text in texts]
+
+
+class RegexPredictor(Predictor):
+    """Mechanical checks written as regular expressions.
+
+    ``rules`` are (label, pattern, suggestion) tuples; the suggestion is a
+    ``match.expand`` template or None. Without rules it runs the rule
+    engine's mechanical rules (``annotation.rules.MECHANICAL_RULES``), so the
+    patterns are defined in one place.
+    """
+
+    def __init__(self, rules=None):
+        self.rule_predictor = None
+        self.rules = []
+        if rules is None:
+            # Imported here because annotation.rules builds on this module
+            from .rules import RulePredictor
+            self.rule_predictor = RulePredictor()
+        else:
+            self.rules = [(label, re.compile(pattern), suggestion) for label, pattern, suggestion in rules]
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        if self.rule_predictor is not None:
+            return self.rule_predictor.predict_batch(texts)
+        return [self._predict(text) for text in texts]
+
+    def _predict(self, text):
+        predictions = []
+        for label, pattern, suggestion in self.rules:
+            for match in pattern.finditer(text):
+                suggestions = (match.expand(suggestion),) if suggestion is not None else ()
+                predictions.append(Prediction(match.start(), match.end(), label, suggestions))
+        return predictions
+
+
+def load_predictor(path=DEFAULT_PREDICTOR, **kwargs):
+    return import_string(path)(**kwargs)
+
+
+def get_machine_user(username=MACHINE_USERNAME):
+    """The account pre-annotations are saved as; it cannot log in."""
+    user, created = User.objects.get_or_create(username=username)
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+    return user
+
+
+# Worker processes build their predictor once and keep it between batches
+_worker_predictor = None
+
+
+def _init_worker(path, kwargs):
+    global _worker_predictor
+    _worker_predictor = load_predictor(path, **kwargs)
+
+
+def _predict_batch(batch):
+    ids, texts = zip(*batch)
+    return list(zip(ids, _worker_predictor.predict_batch(list(texts))))
+
+
+def _text_batches(project, user, batch_size, limit):
+    """Texts of the project the machine user has not annotated, in id order.
+
+    Keyset pagination keeps every query cheap however far the run has got,
+    and texts annotated while the run is going are not read twice.
+    """
+    texts = (
+        Text.objects.filter(project=project)
+        .exclude(Exists(Annotation.objects.filter(text=OuterRef('pk'), user=user)))
+        .order_by('id')
+    )
+    last_id = 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        batch = list(texts.filter(id__gt=last_id).values_list('id', 'text')[:size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1][0]
+        if remaining is not None:
+            remaining -= len(batch)
+
+
+class PredictionWriter:
+    """Saves predictions as the machine user's annotations, one batch per transaction."""
+
+    def __init__(self, project, user):
+        self.project = project
+        self.user = user
+        self.labels = dict(Label.objects.filter(project=project).values_list('name', 'id'))
+        self.labels_created = 0
+        self.texts = 0
+        self.written = 0
+        self.duplicates = 0  # Already saved, or predicted twice
+        self.skipped = 0
+
+    def label_id(self, name):
+        if name not in self.labels:
+            label, created = Label.objects.get_or_create(
+                project=self.project,
+                name=name,
+                defaults={'color': MACHINE_LABEL_COLOR, 'created_by': self.user},
+            )
+            self.labels[name] = label.id
+            self.labels_created += created
+        return self.labels[name]
+
+    def write(self, texts, results):
+        lengths = dict(texts)
+        annotations = []
+        for text_id, predictions in results:
+            length = len(lengths[text_id])
+            for start, end, label, suggestions in predictions:
+                if not 0 <= start < end <= length:
+                    self.skipped += 1
+                    continue
+                annotations.append(Annotation(
+                    text_id=text_id,
+                    user=self.user,
+                    label_id=self.label_id(label),
+                    start_index=start,
+                    end_index=end,
+                    suggestions=list(suggestions),
+                ))
+        # ignore_conflicts drops rows silently (and reports none of them), so
+        # what was written is counted on the (text, user) index around the insert
+        existing = Annotation.objects.filter(text_id__in=lengths, user=self.user)
+        with transaction.atomic():
+            before = existing.count()
+            Annotation.objects.bulk_create(annotations, ignore_conflicts=True)
+            written = existing.count() - before
+            # bulk_create skips the post_save handler that flags adjudication items
+            AdjudicationItem.objects.filter(
+                text_id__in={annotation.text_id for annotation in annotations}, is_stale=False
+            ).update(is_stale=True)
+        self.texts += len(lengths)
+        self.written += written
+        self.duplicates += len(annotations) - written
+        return written
+
+
+def preannotate(project, predictor=DEFAULT_PREDICTOR, predictor_kwargs=None, user=None, workers=None,
+                batch_size=PREANNOTATE_BATCH_SIZE, limit=None, progress=None):
+    """Run a predictor over a project's texts and save its output as annotations.
+
+    Texts are read in batches in this process, predicted in a pool of
+    ``workers`` processes (one per core by default, 0 to predict inline) and
+    written back here with ``bulk_create`` as ``user``, the machine account by
+    default. Texts the machine user already annotated are skipped, so an
+    interrupted run can simply be started again. ``progress`` is called with
+    (texts, annotations) after every batch. Returns the writer with the totals.
+    """
+    user = user or get_machine_user()
+    predictor_kwargs = predictor_kwargs or {}
+    if workers is None:
+        workers = os.cpu_count() or 1
+    writer = PredictionWriter(project, user)
+    batches = _text_batches(project, user, batch_size, limit)
+
+    def save(batch, results):
+        writer.write(batch, results)
+        if progress:
+            progress(writer.texts, writer.written)
+
+    if workers == 0:
+        _init_worker(predictor, predictor_kwargs)
+        for batch in batches:
+            save(batch, _predict_batch(batch))
+        return writer
+
+    # Forked workers must not share the parent's database connections; they
+    # never query, but closing first keeps the sockets out of the children
+    connections.close_all()
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(predictor, predictor_kwargs)) as pool:
+        # A couple of batches per worker in flight keeps every core busy
+        # without reading the whole project into memory
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(_predict_batch, batch)))
+            if len(pending) >= workers * 2:
+                done, future = pending.popleft()
+                save(done, future.result())
+        while pending:
+            done, future = pending.popleft()
+            save(done, future.result())
+    return writer
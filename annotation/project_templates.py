@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models import Q
+
+from .dashboard import invalidate_home_projects
+from .label_cache import bump_label_version
+from .models import Label, ProjectCollaborator, ProjectTemplate
+
+# Bangla error labels every project gets unless another template is chosen
+DEFAULT_LABELS = [
+    {'name': 'SUB_VERB_AGREEMENT_ERROR', 'error_code': '2', 'color': '#EA6B6B'},
+    {'name': 'SADHU_CHALIT_MIX_ERROR', 'error_code': '4', 'color': '#69F869'},
+    {'name': 'PUNCTUATION_ERROR', 'error_code': '8', 'color': '#8383E2'},
+    {'name': 'NON_WORD_ERROR', 'error_code': '16', 'color': '#F1F14A'},
+    {'name': 'UNKNOWN_WORD', 'error_code': '32', 'color': '#F455F4'},
+    {'name': 'INFLECTION_ERROR', 'error_code': '64', 'color': '#00FFFF'},
+    {'name': 'NO_SPACE_ERROR', 'error_code': '128', 'color': '#956F6F'},
+    {'name': 'EXTAR_SPACE_ERROR', 'error_code': '256', 'color': '#41A441'},
+    {'name': 'INAPPROPRIATE_WORD_USAGE_ERROR', 'error_code': '512', 'color': '#505A68'},
+    {'name': 'PREPOSITION_CONJUNCTION_ERROR', 'error_code': '1024', 'color': '#8E8E45'},
+    {'name': 'REPETITION_ERROR', 'error_code': '2048', 'color': '#985298'},
+    {'name': 'QUALITY_SENTENCE_ERROR', 'error_code': '4096', 'color': '#389494'},
+    {'name': 'REAL_WORD_ERROR', 'error_code': '8192', 'color': '#726969'},
+]
+
+LABEL_FIELDS = ('name', 'error_code', 'color', 'description', 'is_static')
+# Project fields a template can fill in when they are left empty
+TEMPLATE_SETTINGS = ('description',)
+
+
+def templates_for(user):
+    """Templates ``user`` may start a project from: their own and the shared ones."""
+    return ProjectTemplate.objects.filter(Q(owner=user) | Q(owner__isnull=True)).order_by('name')
+
+
+def apply_template(project, template=None, user=None):
+    """Set up a new project from ``template``, or with the default labels.
+
+    Labels and collaborators are inserted with one ``bulk_create`` each. That
+    skips the model signals, so the label version and the home page lists are
+    refreshed here. Returns the number of labels created.
+    """
+    user = user or project.owner
+    if template is None:
+        label_rows = [dict(row, is_static=True) for row in DEFAULT_LABELS]
+        collaborator_ids = []
+    else:
+        label_rows = template.labels
+        collaborator_ids = [pk for pk in template.collaborators.values_list('id', flat=True) if pk != project.owner_id]
+    labels = [
+        Label(project=project, created_by=user, **{field: row[field] for field in LABEL_FIELDS if field in row})
+        for row in label_rows
+    ]
+    with transaction.atomic():
+        Label.objects.bulk_create(labels, ignore_conflicts=True)
+        if collaborator_ids:
+            ProjectCollaborator.objects.bulk_create(
+                [ProjectCollaborator(project=project, user_id=pk) for pk in collaborator_ids],
+                ignore_conflicts=True,
+            )
+        changed = [field for field in TEMPLATE_SETTINGS
+                   if template is not None and template.settings.get(field) and not getattr(project, field)]
+        for field in changed:
+            setattr(project, field, template.settings[field])
+        if changed:
+            project.save(update_fields=changed + ['updated_at'])
+        bump_label_version(project.id)
+    if collaborator_ids:
+        invalidate_home_projects(*collaborator_ids)
+    return len(labels)
+
+
+def template_from_project(project, name, owner, include_collaborators=True):
+    """Save a project's labels, collaborators and settings as a new template."""
+    with transaction.atomic():
+        template = ProjectTemplate.objects.create(
+            name=name,
+            owner=owner,
+            labels=list(project.labels.order_by('id').values(*LABEL_FIELDS)),
+            settings={field: getattr(project, field) for field in TEMPLATE_SETTINGS if getattr(project, field)},
+        )
+        if include_collaborators:
+            template.collaborators.set(project.collaborators.values_list('user_id', flat=True))
+    return template
@@ -0,0 +1,323 @@
+import csv
+import importlib.util
+import itertools
+import json
+import os
+import re
+
+from .importers import UploadDecoder
+
+# Columns (or JSON keys) read into Text.text_id and Text.text, first match
+# wins; every other column goes into Text.meta
+TEXT_ID_FIELDS = ('ID', 'id', 'input_text_id', 'text_id')
+TEXT_FIELDS = ('Content', 'content', 'text', 'Text')
+
+# Longest quoted CSV field the raw two-column mode follows over line breaks
+MAX_QUOTED_LINES = 100
+
+READERS = {}
+
+
+def register_reader(cls):
+    """Class decorator adding an import format to the registry under ``cls.name``."""
+    READERS[cls.name] = cls
+    return cls
+
+
+def available_readers():
+    return [cls for cls in READERS.values() if cls.available()]
+
+
+def get_reader(filename, name=None):
+    """The reader class for an explicitly chosen format or the file's extension."""
+    if name:
+        cls = READERS.get(name)
+        if cls is None:
+            raise ValueError(f'Unknown import format: {name}.')
+    else:
+        extension = os.path.splitext(filename)[1].lower()
+        cls = next((cls for cls in READERS.values() if extension in cls.extensions), None)
+        if cls is None:
+            raise ValueError(f'Unsupported file type "{extension}". Supported: '
+                             + ', '.join(ext for cls in available_readers() for ext in cls.extensions))
+    if not cls.available():
+        raise ValueError(f'{cls.label} import needs {cls.requires}, which is not installed.')
+    return cls
+
+
+def _clean(text):
+    # Null bytes are not storable everywhere; carriage returns come from Windows line ends
+    return text.replace('\x00', '').replace('\r', '')
+
+
+class TextReader:
+    """Streams (text_id, text, meta) records out of an uploaded file.
+
+    ``position`` is where the record just yielded ends, in the unit the
+    reader resumes from when it is passed back as ``start`` together with
+    the ``encoding`` and ``fieldnames`` seen on the first run. Rows that
+    cannot be read are skipped and listed in ``errors``.
+    """
+    name = None
+    label = None
+    extensions = ()
+    requires = None
+    # The registry hands classes to templates, which would otherwise call them
+    do_not_call_in_templates = True
+
+    def __init__(self, upload, start=0, encoding=None, fieldnames=None):
+        self.upload = upload
+        self.position = start
+        self.encoding = encoding
+        self.fieldnames = fieldnames
+        self.errors = []
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def open(self):
+        """Read the header (if not resuming) and return the field names."""
+        raise NotImplementedError
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def map_fields(self, fieldnames):
+        self.id_field = next((field for field in TEXT_ID_FIELDS if field in fieldnames), None)
+        self.text_field = next((field for field in TEXT_FIELDS if field in fieldnames), None)
+
+    def record(self, row):
+        text = row.get(self.text_field)
+        if not isinstance(text, str) or not text:
+            return None
+        text_id = row.get(self.id_field) if self.id_field else ''
+        meta = {key: value for key, value in row.items() if key not in (self.id_field, self.text_field) and key is not None}
+        return str(text_id if text_id is not None else '').strip(), _clean(text), meta
+
+
+class LineReader(TextReader):
+    """Base for text formats read line by line through UploadDecoder."""
+
+    def _lines(self):
+        self.decoder = UploadDecoder(self.upload, start=self.position, encoding=self.encoding)
+        return self._track_encoding(self.decoder)
+
+    def _track_encoding(self, decoder):
+        for line in decoder:
+            self.encoding = decoder.encoding
+            yield line
+
+
+@register_reader
+class CSVReader(LineReader):
+    """Comma separated values with a header row.
+
+    A file with exactly an ID and a text column is split on the first (or,
+    with the ID last, the last) comma of each line, so quotes inside the
+    text are kept as written. A text that is a properly quoted CSV field is
+    unquoted, and may then span several lines.
+    """
+    name = 'csv'
+    label = 'CSV'
+    extensions = ('.csv',)
+    FIELD_START = re.compile(r'"(?:[^"]|"")*')
+    QUOTED_FIELD = re.compile(r'"((?:[^"]|"")*)"')
+
+    def open(self):
+        self._line_iter = self._lines()
+        self.rows = csv.DictReader(self._line_iter, fieldnames=self.fieldnames)
+        self.fieldnames = self.rows.fieldnames
+        self.position = self.decoder.offset
+        if self.fieldnames:
+            self.map_fields(self.fieldnames)
+        return self.fieldnames
+
+    def __iter__(self):
+        if self.id_field and self.text_field and len(self.fieldnames) == 2:
+            yield from self._raw_records()
+            return
+        for row in self.rows:
+            self.position = self.decoder.offset
+            record = self.record(row)
+            if record:
+                yield record
+
+    def _raw_records(self):
+        id_first = self.fieldnames.index(self.id_field) == 0
+        # The DictReader has only consumed the header, so the raw lines continue
+        # from here; each comes with the byte offset it ends at
+        lines = ((line, self.decoder.offset) for line in self._line_iter)
+        while True:
+            line, end = next(lines, (None, None))
+            if line is None:
+                return
+            line = line.rstrip('\r\n')
+            parts = line.split(',', 1) if id_first else line.rsplit(',', 1)
+            if len(parts) < 2:
+                self.position = end
+                continue
+            text_id, text = parts if id_first else parts[::-1]
+            if (id_first and text.startswith('"') and not self.QUOTED_FIELD.fullmatch(text)
+                    and self.FIELD_START.fullmatch(text)):
+                # A quoted field left open: it may go on over the next lines
+                text, end, lines = self._continue_quoted(text, end, lines)
+            quoted = self.QUOTED_FIELD.fullmatch(text)
+            if quoted:
+                text = quoted.group(1).replace('""', '"')
+            self.position = end
+            text = _clean(text)
+            if text:
+                yield text_id.strip(), text, {}
+
+    def _continue_quoted(self, text, end, lines):
+        buffered = []
+        for line, line_end in lines:
+            buffered.append((line, line_end))
+            joined = '\n'.join([text] + [part.rstrip('\r\n') for part, _ in buffered])
+            if self.QUOTED_FIELD.fullmatch(joined):
+                return joined, line_end, lines
+            if not self.FIELD_START.fullmatch(joined) or len(buffered) >= MAX_QUOTED_LINES:
+                break
+        # Not a quoted field after all: keep the first line as written and
+        # read the buffered lines again as records of their own
+        return text, end, itertools.chain(buffered, lines)
+
+
+@register_reader
+class TSVReader(LineReader):
+    """Tab separated values with a header row, one record per line.
+
+    Fields are not quoted; tabs, line breaks and backslashes inside a field
+    are written as \\t, \\n, \\r and \\\\.
+    """
+    name = 'tsv'
+    label = 'TSV'
+    extensions = ('.tsv', '.tab')
+    ESCAPE = re.compile(r'\\([tnr\\])')
+    ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\'}
+
+    def open(self):
+        self._line_iter = self._lines()
+        if self.fieldnames is None:
+            header = next(self._line_iter, '').rstrip('\r\n')
+            self.fieldnames = header.split('\t') if header else []
+        self.position = self.decoder.offset
+        if self.fieldnames:
+            self.map_fields(self.fieldnames)
+        return self.fieldnames
+
+    def __iter__(self):
+        for line in self._line_iter:
+            self.position = self.decoder.offset
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            values = [self.ESCAPE.sub(lambda m: self.ESCAPES[m.group(1)], value) for value in line.split('\t')]
+            if len(values) != len(self.fieldnames):
+                self.errors.append(f'Line with {len(values)} fields instead of {len(self.fieldnames)}: {line[:50]}')
+                continue
+            record = self.record(dict(zip(self.fieldnames, values)))
+            if record:
+                yield record
+
+
+@register_reader
+class JSONLReader(LineReader):
+    """One JSON object per line; keys other than the ID and text go into meta."""
+    name = 'jsonl'
+    label = 'JSON Lines'
+    extensions = ('.jsonl', '.ndjson')
+
+    def open(self):
+        self._line_iter = self._lines()
+        # Objects may differ in their keys, so the fields are taken from the first one
+        if self.fieldnames is None:
+            self._first = None
+            for line in self._line_iter:
+                if line.strip():
+                    self._first = (line, self.decoder.offset)
+                    break
+            self.fieldnames = list(self._parse(self._first[0]) or {}) if self._first else []
+        else:
+            self._first = None
+        if self.fieldnames:
+            self.map_fields(self.fieldnames)
+        return self.fieldnames
+
+    def _parse(self, line):
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            self.errors.append(f'Invalid JSON ({e}): {line[:50]}')
+            return None
+        if not isinstance(value, dict):
+            self.errors.append(f'Not a JSON object: {line[:50]}')
+            return None
+        return value
+
+    def __iter__(self):
+        lines = ((line, self.decoder.offset) for line in self._line_iter)
+        if self._first:
+            lines = itertools.chain([self._first], lines)
+        for line, end in lines:
+            self.position = end
+            if not line.strip():
+                continue
+            row = self._parse(line)
+            if row is None:
+                continue
+            if isinstance(row.get(self.text_field), (dict, list)):
+                self.errors.append(f'Text is not a string: {line[:50]}')
+                continue
+            record = self.record(row)
+            if record:
+                yield record
+
+
+@register_reader
+class ParquetReader(TextReader):
+    """Parquet files, read a record batch at a time; needs pyarrow.
+
+    ``position`` counts rows rather than bytes.
+    """
+    name = 'parquet'
+    label = 'Parquet'
+    extensions = ('.parquet',)
+    requires = 'pyarrow'
+    BATCH_SIZE = 10000
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec('pyarrow') is not None
+
+    def open(self):
+        import pyarrow.parquet as pq
+
+        self.upload.seek(0)
+        self.parquet = pq.ParquetFile(self.upload)
+        self.fieldnames = self.fieldnames or self.parquet.schema_arrow.names
+        self.encoding = ''
+        self.map_fields(self.fieldnames)
+        return self.fieldnames
+
+    def __iter__(self):
+        start = self.position
+        row_number = 0
+        for batch in self.parquet.iter_batches(batch_size=self.BATCH_SIZE):
+            if row_number + batch.num_rows <= start:
+                row_number += batch.num_rows
+                continue
+            first = max(start - row_number, 0)
+            for self.position, row in enumerate(batch.to_pylist()[first:], start=row_number + first + 1):
+                text = row.get(self.text_field)
+                if text is not None and not isinstance(text, str):
+                    self.errors.append(f'Text in row {self.position} is not a string')
+                    continue
+                # Dates, decimals and the like are stored in meta as strings
+                row = {key: value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+                       for key, value in row.items()}
+                record = self.record(row)
+                if record:
+                    yield record
+            row_number += batch.num_rows
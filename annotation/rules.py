@@ -0,0 +1,118 @@
+import re
+from collections import namedtuple
+from string import Formatter
+
+import numpy as np
+
+from .models import Label
+from .preannotate import MACHINE_LABEL_COLOR, Prediction, Predictor
+from .tokenization import WORD_CHARS
+
+# Texts of a batch are scanned as one string joined by NUL. The patterns below
+# never match NUL (it is neither a word character nor whitespace, and the
+# lookarounds exclude it), so no match crosses from one text into the next.
+SEPARATOR = '\x00'
+SCAN_BATCH_SIZE = 1000
+# Candidates are saved as their own machine user: pre-annotation skips texts
+# its user already annotated, so sharing the preannotator account would make
+# either command skip every text the other one touched
+RULES_USERNAME = 'error_rules'
+
+# ``suggestion`` is a str.format template over the rule's named groups, or None
+Rule = namedtuple('Rule', 'name label error_code pattern suggestion')
+
+W = WORD_CHARS
+PUNCT = r',;:?!\u0964'
+
+MECHANICAL_RULES = [
+    # Two or more spaces between words
+    Rule('extra_space', 'EXTAR_SPACE_ERROR', 256, r'(?<=[^\s\x00]) {2,}(?=[^\s\x00])', ' '),
+    # Space before a punctuation mark
+    Rule('space_before_punct', 'EXTAR_SPACE_ERROR', 256, rf'(?<=[{W}]) +(?=[{PUNCT}])', None),
+    # Punctuation glued to the next word
+    Rule('no_space', 'NO_SPACE_ERROR', 128, rf'(?<=[{W}])(?P<glued>[{PUNCT}])(?=[{W}])', '{glued} '),
+    # The same word twice in a row
+    Rule('repetition', 'REPETITION_ERROR', 2048, rf'(?<![{W}])(?P<word>[{W}]+)\s+(?P=word)(?![{W}])', '{word}'),
+    # ASCII full stop after Bangla instead of the dari
+    Rule('ascii_stop', 'PUNCTUATION_ERROR', 8, r'(?<=[\u0980-\u09ff])\.(?!\.)', '\u0964'),
+    # Doubled punctuation mark
+    Rule('doubled_punct', 'PUNCTUATION_ERROR', 8, rf'(?P<mark>[{PUNCT}])(?P=mark)+', '{mark}'),
+]
+
+
+class RuleSet:
+    """A set of regex rules compiled into one pattern and run over whole batches.
+
+    Every rule becomes a named alternative of a single regex, so a batch of
+    texts is scanned in one pass; ``match.lastgroup`` tells which rule fired.
+    Where two rules match at the same position the one listed first wins.
+    """
+
+    def __init__(self, rules=MECHANICAL_RULES):
+        self.rules = {rule.name: rule for rule in rules}
+        if len(self.rules) != len(rules):
+            raise ValueError('Rule names must be unique.')
+        self.pattern = re.compile('|'.join(f'(?P<{rule.name}>{rule.pattern})' for rule in rules))
+        # match.expand re-parses its template on every call, so the templates
+        # are split once here into the group names they need
+        self._suggestions = {
+            rule.name: (rule.label, rule.suggestion, [field for _, field, _, _ in Formatter().parse(rule.suggestion or '') if field])
+            for rule in rules
+        }
+
+    @property
+    def labels(self):
+        """Map of label name -> error code of the labels the rules produce."""
+        return {rule.label: rule.error_code for rule in self.rules.values()}
+
+    def scan(self, texts):
+        """Candidate spans for each text, as one list of Predictions per text."""
+        lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        matches = [(m.start(), m.end(), m) for m in self.pattern.finditer(SEPARATOR.join(texts))]
+        results = [[] for _ in texts]
+        if not matches:
+            return results
+        offsets = np.array([(start, end) for start, end, _ in matches], dtype=np.int64)
+        owners = np.searchsorted(starts, offsets[:, 0], side='right') - 1
+        local = offsets - starts[owners][:, None]
+        for (start, end), owner, (_, _, match) in zip(local.tolist(), owners.tolist(), matches):
+            label, template, fields = self._suggestions[match.lastgroup]
+            if template is None:
+                suggestions = ()
+            elif fields:
+                suggestions = (template.format_map({field: match[field] for field in fields}),)
+            else:
+                suggestions = (template,)
+            results[owner].append(Prediction(start, end, label, suggestions))
+        return results
+
+
+class RulePredictor(Predictor):
+    """Pre-annotation predictor for the mechanical error labels."""
+
+    def __init__(self, rules=MECHANICAL_RULES, batch_size=SCAN_BATCH_SIZE):
+        self.rule_set = RuleSet(rules)
+        self.batch_size = batch_size
+
+    def predict(self, text):
+        return self.rule_set.scan([text])[0]
+
+    def predict_batch(self, texts):
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            results.extend(self.rule_set.scan(texts[i:i + self.batch_size]))
+        return results
+
+
+def ensure_rule_labels(project, user, rules=MECHANICAL_RULES):
+    """Create the labels the rules write to, with their error codes, if the project lacks them."""
+    existing = set(Label.objects.filter(project=project).values_list('name', flat=True))
+    missing = {rule.label: rule.error_code for rule in rules if rule.label not in existing}
+    for name, error_code in missing.items():
+        Label.objects.get_or_create(
+            project=project,
+            name=name,
+            defaults={'error_code': error_code, 'color': MACHINE_LABEL_COLOR, 'created_by': user},
+        )
+    return len(missing)
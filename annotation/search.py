@@ -0,0 +1,149 @@
+import re
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Annotation, Text
+
+# Private-use markers around matched terms, swapped for <mark> after escaping
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+SNIPPET_CHARS = 160
+# bm25 ordering scores every match; past this many, results come in id order
+RANKED_RESULTS_LIMIT = 5000
+# annotation_text_fts columns, in the order the snippets are tried
+FTS_SNIPPET_COLUMNS = (1, 2, 0)  # text, suggestions, text_id
+
+SQLITE_MATCH_SQL = """
+    FROM annotation_text_fts
+    WHERE annotation_text_fts MATCH %s
+"""
+
+POSTGRESQL_MATCH_SQL = """
+    FROM annotation_text t
+    WHERE t.project_id = %s AND (
+        t.text ILIKE %s OR t.text_id ILIKE %s OR EXISTS (
+            SELECT 1 FROM annotation_annotation a
+            WHERE a.text_id = t.id AND a.suggestions::text ILIKE %s
+        )
+    )
+"""
+
+
+class SearchHit:
+    def __init__(self, text, snippet):
+        self.text = text
+        self.snippet = snippet
+
+
+class SearchResults:
+    """Lazy search result list for a project that Paginator can count and slice.
+
+    Only the requested page is fetched, so the cost of a query is one index
+    lookup for the count and one for the page regardless of project size.
+    """
+
+    def __init__(self, project, query):
+        self.project = project
+        self.query = query.strip()
+        self.terms = self.query.split()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self._fetch_count() if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults only supports slicing')
+        start, stop = index.start or 0, index.stop
+        if not self.terms or stop is None or stop <= start:
+            return []
+        return self._fetch_page(start, stop - start)
+
+    def _fetch_count(self):
+        if connection.vendor == 'sqlite':
+            sql, params = 'SELECT count(*)' + SQLITE_MATCH_SQL, [self._fts_query()]
+        elif connection.vendor == 'postgresql':
+            sql, params = 'SELECT count(*)' + POSTGRESQL_MATCH_SQL, self._ilike_params()
+        else:
+            return self._fallback_queryset().count()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def _fetch_page(self, offset, limit):
+        snippets = {}
+        if connection.vendor == 'sqlite':
+            snippet_columns = ', '.join(
+                f"snippet(annotation_text_fts, {column}, '{MATCH_START}', '{MATCH_END}', '…', 24)"
+                for column in FTS_SNIPPET_COLUMNS
+            )
+            order = 'rank' if self.count() <= RANKED_RESULTS_LIMIT else 'rowid'
+            sql = f'SELECT rowid, {snippet_columns}' + SQLITE_MATCH_SQL + f'ORDER BY {order} LIMIT %s OFFSET %s'
+            params = [self._fts_query(), limit, offset]
+        elif connection.vendor == 'postgresql':
+            sql = 'SELECT t.id, NULL' + POSTGRESQL_MATCH_SQL + 'ORDER BY t.id LIMIT %s OFFSET %s'
+            params = self._ilike_params() + [limit, offset]
+        else:
+            sql = None
+            ids = list(self._fallback_queryset().order_by('id').values_list('id', flat=True)[offset:offset + limit])
+        if sql is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            ids = [row[0] for row in rows]
+            snippets = {
+                row[0]: next((snippet for snippet in row[1:] if snippet and MATCH_START in snippet), None)
+                for row in rows
+            }
+
+        texts = Text.objects.in_bulk(ids)
+        hits = []
+        for text_id in ids:
+            text = texts.get(text_id)
+            if text is None:
+                continue
+            snippet = snippets.get(text_id) or self._highlight(text.text)
+            hits.append(SearchHit(text, self._render(snippet)))
+        return hits
+
+    def _fts_query(self):
+        # Each word is quoted so FTS5 syntax in user input is taken literally;
+        # the last word is a prefix so results show up while still typing
+        phrases = ['"%s"' % term.replace('"', '""') for term in self.terms]
+        phrases[-1] += '*'
+        return 'project : "%s" AND {text_id text suggestions} : (%s)' % (self.project.id, ' AND '.join(phrases))
+
+    def _ilike_params(self):
+        pattern = '%' + re.sub(r'([\\%_])', r'\\\1', self.query) + '%'
+        return [self.project.id, pattern, pattern, pattern]
+
+    def _fallback_queryset(self):
+        suggestions = Annotation.objects.filter(text=OuterRef('pk'), suggestions__icontains=self.query)
+        return Text.objects.filter(project=self.project).filter(
+            Q(text__icontains=self.query) | Q(text_id__icontains=self.query) | Exists(suggestions)
+        )
+
+    def _highlight(self, content):
+        """Snippet around the first occurrence of the query, for backends without FTS."""
+        position = content.lower().find(self.query.lower())
+        if position == -1:
+            return content[:SNIPPET_CHARS] + ('…' if len(content) > SNIPPET_CHARS else '')
+        start = max(0, position - SNIPPET_CHARS // 2)
+        end = position + len(self.query)
+        return (
+            ('…' if start else '') + content[start:position]
+            + MATCH_START + content[position:end] + MATCH_END
+            + content[end:start + SNIPPET_CHARS] + ('…' if start + SNIPPET_CHARS < len(content) else '')
+        )
+
+    @staticmethod
+    def _render(snippet):
+        return mark_safe(escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dashboard import invalidate_home_projects
+from .label_cache import bump_label_version
+from .models import AdjudicationItem, Annotation, Label, Project, ProjectCollaborator
+
+
+@receiver(post_save, sender=Label)
+@receiver(post_delete, sender=Label)
+def label_changed(sender, instance, **kwargs):
+    bump_label_version(instance.project_id)
+
+
+@receiver(post_save, sender=Annotation)
+@receiver(post_delete, sender=Annotation)
+def annotation_changed(sender, instance, **kwargs):
+    # Cheap flag; the clusters are rebuilt by build_adjudication or on open
+    AdjudicationItem.objects.filter(text_id=instance.text_id, is_stale=False).update(is_stale=True)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    # On delete the collaborator rows are gone already and handled below
+    invalidate_home_projects(instance.owner_id, *instance.collaborators.values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=ProjectCollaborator)
+@receiver(post_delete, sender=ProjectCollaborator)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_home_projects(instance.user_id)
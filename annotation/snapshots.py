@@ -0,0 +1,290 @@
+import contextlib
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import threading
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Annotation, Label, ProjectSnapshot, Text
+
+# Snapshot layout, one directory per snapshot under settings.SNAPSHOT_ROOT:
+#   texts.jsonl.gz        {"id", "text_id", "text", "meta"} in id order
+#   annotations.jsonl.gz  {"t", "s", "e", "label", "user", "g", "r"} in that key order
+#   manifest.json         project, labels, and rows/bytes/sha256 of each file
+# Rows are written with sorted keys and gzip without a timestamp, so the same
+# data always gives the same bytes and the same checksums.
+SNAPSHOT_FORMAT = 1
+TEXTS_FILE = 'texts.jsonl.gz'
+ANNOTATIONS_FILE = 'annotations.jsonl.gz'
+MANIFEST_FILE = 'manifest.json'
+SNAPSHOT_FILES = (MANIFEST_FILE, TEXTS_FILE, ANNOTATIONS_FILE)
+SNAPSHOT_CHUNK_SIZE = 2000
+# Download links are signed rather than checked against the database
+DOWNLOAD_SALT = 'annotation.snapshots.download'
+DOWNLOAD_MAX_AGE = 60 * 60 * 24
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode
+
+
+def snapshot_path(snapshot, filename=''):
+    return settings.SNAPSHOT_ROOT / snapshot.directory / filename
+
+
+def annotation_key(row):
+    return row['t'], row['s'], row['e'], row['label'], row['user']
+
+
+def _text_rows(project, after, limit):
+    texts = (Text.objects.filter(project=project, id__gt=after).order_by('id')
+             .values_list('id', 'text_id', 'text', 'meta')[:limit])
+    return [{'id': text_pk, 'text_id': text_id, 'text': text, 'meta': meta} for text_pk, text_id, text, meta in texts]
+
+
+def _annotation_rows(first, last, project):
+    annotations = (
+        Annotation.objects.filter(text__project=project, text_id__gte=first, text_id__lte=last)
+        .values_list('text_id', 'start_index', 'end_index', 'label__name', 'user__username', 'suggestions',
+                     'is_reannotation')
+    )
+    rows = [
+        {'t': text_pk, 's': start, 'e': end, 'label': label, 'user': user, 'g': suggestions, 'r': reannotation}
+        for text_pk, start, end, label, user, suggestions, reannotation in annotations
+    ]
+    # Sorted here rather than by the database, so the order does not depend
+    # on its collation
+    rows.sort(key=annotation_key)
+    return rows
+
+
+def _chunks(project):
+    """(texts, annotations) rows of the project in keyset chunks of text ids.
+
+    Each chunk's texts and their annotations are read in one short
+    transaction, so they agree with each other. On PostgreSQL the caller
+    holds one REPEATABLE READ transaction over all chunks, which makes the
+    whole snapshot a single point in time without blocking writers; SQLite
+    would hold its lock for the whole export instead, so there each chunk is
+    read on its own and annotators can save in between.
+    """
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            texts = _text_rows(project, last_id, SNAPSHOT_CHUNK_SIZE)
+            if not texts:
+                return
+            annotations = _annotation_rows(texts[0]['id'], texts[-1]['id'], project)
+        yield texts, annotations
+        last_id = texts[-1]['id']
+
+
+def _gzip_writer(raw):
+    return gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0)
+
+
+def _write_files(directory, project):
+    """Write texts.jsonl.gz and annotations.jsonl.gz side by side; returns their row counts."""
+    texts = annotations = 0
+    with open(directory / TEXTS_FILE, 'wb') as texts_raw, open(directory / ANNOTATIONS_FILE, 'wb') as annotations_raw, \
+            _gzip_writer(texts_raw) as texts_out, _gzip_writer(annotations_raw) as annotations_out:
+        for text_rows, annotation_rows in _chunks(project):
+            texts_out.write(''.join(_encode(row) + '\n' for row in text_rows).encode('utf-8'))
+            annotations_out.write(''.join(_encode(row) + '\n' for row in annotation_rows).encode('utf-8'))
+            texts += len(text_rows)
+            annotations += len(annotation_rows)
+    return texts, annotations
+
+
+def _file_info(path, rows=None):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    info = {'bytes': path.stat().st_size, 'sha256': digest.hexdigest()}
+    if rows is not None:
+        info['rows'] = rows
+    return info
+
+
+def start_snapshot(project, name, user=None):
+    """Create the snapshot's row; its files are written by ``run_snapshot``, usually in the background."""
+    snapshot = ProjectSnapshot.objects.create(project=project, name=name, created_by=user)
+    snapshot.directory = f'{project.id}/{snapshot.id}-{slugify(name) or "snapshot"}'
+    snapshot.save(update_fields=['directory'])
+    return snapshot
+
+
+def run_snapshot(snapshot):
+    """Write a snapshot's files to a ``.partial`` directory that is renamed once complete.
+
+    A failure is recorded on the snapshot, the partial files are removed and
+    the exception re-raised.
+    """
+    project = snapshot.project
+    final = snapshot_path(snapshot)
+    partial = final.with_name(final.name + '.partial')
+    try:
+        partial.mkdir(parents=True)
+        with transaction.atomic() if connection.vendor == 'postgresql' else contextlib.nullcontext():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            labels = {
+                label_name: {'color': color, 'error_code': error_code}
+                for label_name, color, error_code in Label.objects.filter(project=project).values_list('name', 'color', 'error_code')
+            }
+            texts, annotations = _write_files(partial, project)
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'name': snapshot.name,
+            'project': {'id': project.id, 'name': project.name, 'owner': project.owner.username},
+            'created_at': snapshot.created_at.isoformat(),
+            'labels': labels,
+            'files': {
+                TEXTS_FILE: _file_info(partial / TEXTS_FILE, texts),
+                ANNOTATIONS_FILE: _file_info(partial / ANNOTATIONS_FILE, annotations),
+            },
+        }
+        (partial / MANIFEST_FILE).write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding='utf-8')
+        os.replace(partial, final)
+    except BaseException as e:
+        shutil.rmtree(partial, ignore_errors=True)
+        snapshot.status = ProjectSnapshot.STATUS_FAILED
+        snapshot.error = str(e)
+        snapshot.save(update_fields=['status', 'error'])
+        raise
+    manifest_info = _file_info(final / MANIFEST_FILE)
+    snapshot.texts = texts
+    snapshot.annotations = annotations
+    snapshot.size = manifest_info['bytes'] + sum(info['bytes'] for info in manifest['files'].values())
+    snapshot.manifest_sha256 = manifest_info['sha256']
+    snapshot.status = ProjectSnapshot.STATUS_DONE
+    snapshot.save(update_fields=['texts', 'annotations', 'size', 'manifest_sha256', 'status'])
+    return snapshot
+
+
+def create_snapshot(project, name, user=None):
+    """Take a snapshot in this thread; see ``run_snapshot``."""
+    return run_snapshot(start_snapshot(project, name, user))
+
+
+def _run_in_thread(snapshot_id):
+    try:
+        run_snapshot(ProjectSnapshot.objects.select_related('project__owner').get(pk=snapshot_id))
+    except Exception:
+        pass  # Recorded on the snapshot
+    finally:
+        connections.close_all()
+
+
+def run_snapshot_in_background(snapshot):
+    """Write the snapshot on a daemon thread of this process, after the current transaction commits."""
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=_run_in_thread, args=(snapshot.pk,), name=f'snapshot-{snapshot.pk}', daemon=True
+        ).start()
+    )
+
+
+def read_manifest(snapshot):
+    return json.loads(snapshot_path(snapshot, MANIFEST_FILE).read_text(encoding='utf-8'))
+
+
+def verify_snapshot(snapshot):
+    """Problems found checking the files against the manifest; empty when intact."""
+    path = snapshot_path(snapshot, MANIFEST_FILE)
+    if not path.exists():
+        return [f'{MANIFEST_FILE} is missing']
+    problems = []
+    if _file_info(path)['sha256'] != snapshot.manifest_sha256:
+        problems.append(f'{MANIFEST_FILE} does not match its recorded checksum')
+    for filename, expected in read_manifest(snapshot)['files'].items():
+        path = snapshot_path(snapshot, filename)
+        if not path.exists():
+            problems.append(f'{filename} is missing')
+        elif _file_info(path)['sha256'] != expected['sha256']:
+            problems.append(f'{filename} does not match its checksum')
+    return problems
+
+
+def delete_snapshot(snapshot):
+    shutil.rmtree(snapshot_path(snapshot), ignore_errors=True)
+    snapshot.delete()
+
+
+def download_token(snapshot, filename):
+    return signing.dumps([snapshot.directory, filename], salt=DOWNLOAD_SALT, compress=True)
+
+
+def resolve_download(token):
+    """Path of the snapshot file a download token stands for; BadSignature if invalid or expired."""
+    directory, filename = signing.loads(token, salt=DOWNLOAD_SALT, max_age=DOWNLOAD_MAX_AGE)
+    if filename not in SNAPSHOT_FILES:
+        raise signing.BadSignature('Not a snapshot file')
+    return settings.SNAPSHOT_ROOT / directory / filename
+
+
+def _read_jsonl(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _merge(old_rows, new_rows, key):
+    """Walk two key-sorted row streams together, yielding (op, old, new) for every difference."""
+    old_row, new_row = next(old_rows, None), next(new_rows, None)
+    while old_row is not None or new_row is not None:
+        if new_row is None or (old_row is not None and key(old_row) < key(new_row)):
+            yield '-', old_row, None
+            old_row = next(old_rows, None)
+        elif old_row is None or key(new_row) < key(old_row):
+            yield '+', None, new_row
+            new_row = next(new_rows, None)
+        else:
+            if old_row != new_row:
+                yield '~', old_row, new_row
+            old_row, new_row = next(old_rows, None), next(new_rows, None)
+
+
+def diff_snapshots(old, new):
+    """Differences from snapshot ``old`` to ``new`` of the same project.
+
+    Yields {'kind': 'text'|'annotation', 'op': '+'|'-'|'~', 'old', 'new'}.
+    Both snapshots are read once, side by side, so memory use does not grow
+    with their size.
+    """
+    for kind, filename, key in (('text', TEXTS_FILE, lambda row: row['id']),
+                                ('annotation', ANNOTATIONS_FILE, annotation_key)):
+        rows = _merge(_read_jsonl(snapshot_path(old, filename)), _read_jsonl(snapshot_path(new, filename)), key)
+        for op, old_row, new_row in rows:
+            yield {'kind': kind, 'op': op, 'old': old_row, 'new': new_row}
+
+
+def diff_summary(changes):
+    summary = {}
+    for change in changes:
+        counts = summary.setdefault(change['kind'], {'+': 0, '-': 0, '~': 0})
+        counts[change['op']] += 1
+    return summary
+
+
+def encode_change(change):
+    return _encode(change) + '\n'
+
+
+def encode_changes(changes, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """JSON Lines of ``changes`` joined into blocks of ``chunk_size`` lines, for streaming."""
+    changes = iter(changes)
+    while block := ''.join(encode_change(change) for change in itertools.islice(changes, chunk_size)):
+        yield block
+
+
+def snapshot_timestamp():
+    return timezone.now().strftime('%Y-%m-%d %H:%M')
@@ -0,0 +1,130 @@
+import json
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from .label_cache import get_label_table
+from .models import Annotation, GoldAnnotation, Text
+from .tokenization import tokenize
+
+TOKEN_EXPORT_FORMATS = ('conll', 'spacy')
+TOKEN_EXPORT_CHUNK_SIZE = 1000
+OUTSIDE_TAG = 'O'
+
+
+def align_span(token_starts, token_ends, start, end):
+    """Token range [first, last) a character span touches, by binary search over sorted offsets.
+
+    Tokens are sorted and disjoint, so the span covers the run from the first
+    token ending after ``start`` to the last one starting before ``end``;
+    partly covered tokens count. The range is empty when the span only
+    covers whitespace.
+    """
+    return bisect_right(token_ends, start), bisect_left(token_starts, end)
+
+
+def bio_tags(token_count, token_spans):
+    """BIO tags for ``token_count`` tokens from (first, last, label) token spans.
+
+    Spans are applied by start, longest first; a span overlapping tokens
+    already tagged is left out. Returns the tags and the number left out.
+    """
+    tags = [OUTSIDE_TAG] * token_count
+    overlapping = 0
+    for first, last, label in sorted(token_spans, key=lambda span: (span[0], -span[1])):
+        if any(tag != OUTSIDE_TAG for tag in tags[first:last]):
+            overlapping += 1
+            continue
+        tags[first] = f'B-{label}'
+        for i in range(first + 1, last):
+            tags[i] = f'I-{label}'
+    return tags, overlapping
+
+
+class TokenExporter:
+    """Streams a project's annotations as token-tagged data.
+
+    ``format`` is 'conll' (one "token<TAB>BIO tag" line per token, texts
+    separated by blank lines and headed by a "# id = ..." comment) or
+    'spacy' (one JSON object per text with its tokens and character and
+    token spans, token_end inclusive). Each text is tokenized once and its
+    annotations aligned to tokens by binary search. Annotations come from
+    one ``annotator`` (a username), the adjudicated gold layer, or by
+    default everyone. The counters describe what was exported so far.
+    """
+
+    def __init__(self, project, format='conll', annotator=None, gold=False, chunk_size=TOKEN_EXPORT_CHUNK_SIZE):
+        if format not in TOKEN_EXPORT_FORMATS:
+            raise ValueError(f'Unknown token export format: {format}.')
+        self.project = project
+        self.format = format
+        self.annotator = annotator
+        self.gold = gold
+        self.chunk_size = chunk_size
+        self.label_names = {label_id: label['name'] for label_id, label in get_label_table(project).items()}
+        self.texts = 0
+        self.tokens = 0
+        self.spans = 0
+        self.empty = 0  # Spans covering whitespace only
+        self.overlapping = 0  # Left out of BIO tags
+
+    def _annotations(self, text_ids):
+        # A fixed order, so the same data always exports the same bytes
+        if self.gold:
+            rows = GoldAnnotation.objects.filter(text_id__in=text_ids).order_by('text_id', 'start_index', 'end_index', 'id')
+        else:
+            rows = Annotation.objects.filter(text_id__in=text_ids).order_by('text_id', 'start_index', 'end_index', 'user_id', 'id')
+            if self.annotator:
+                rows = rows.filter(user__username=self.annotator)
+        by_text = defaultdict(list)
+        for text_id, start, end, label_id in rows.values_list('text_id', 'start_index', 'end_index', 'label_id'):
+            by_text[text_id].append((start, end, self.label_names.get(label_id, str(label_id))))
+        return by_text
+
+    def _chunks(self):
+        texts = Text.objects.filter(project=self.project).order_by('id').values_list('id', 'text_id', 'text')
+        last_id = 0
+        while True:
+            chunk = list(texts.filter(id__gt=last_id)[:self.chunk_size])
+            if not chunk:
+                return
+            yield chunk, self._annotations([row[0] for row in chunk])
+            last_id = chunk[-1][0]
+
+    def __iter__(self):
+        render = self._conll if self.format == 'conll' else self._spacy
+        for chunk, annotations in self._chunks():
+            parts = []
+            for text_pk, text_id, content in chunk:
+                tokens = tokenize(content)
+                starts = [token[0] for token in tokens]
+                ends = [token[1] for token in tokens]
+                spans = []
+                for start, end, label in annotations.get(text_pk, ()):
+                    first, last = align_span(starts, ends, start, end)
+                    if first >= last:
+                        self.empty += 1
+                        continue
+                    spans.append((start, end, first, last, label))
+                self.texts += 1
+                self.tokens += len(tokens)
+                self.spans += len(spans)
+                parts.append(render(text_pk, text_id, content, tokens, spans))
+            yield ''.join(parts)
+
+    def _conll(self, text_pk, text_id, content, tokens, spans):
+        tags, overlapping = bio_tags(len(tokens), [(first, last, label) for _, _, first, last, label in spans])
+        self.overlapping += overlapping
+        lines = [f'# id = {text_id or text_pk}']
+        lines.extend(f'{token[2]}\t{tag}' for token, tag in zip(tokens, tags))
+        return '\n'.join(lines) + '\n\n'
+
+    def _spacy(self, text_pk, text_id, content, tokens, spans):
+        return json.dumps({
+            'id': text_id or str(text_pk),
+            'text': content,
+            'tokens': [{'text': token, 'start': start, 'end': end, 'id': i} for i, (start, end, token) in enumerate(tokens)],
+            'spans': [
+                {'start': start, 'end': end, 'token_start': first, 'token_end': last - 1, 'label': label}
+                for start, end, first, last, label in sorted(spans)
+            ],
+        }, ensure_ascii=False, separators=(',', ':')) + '\n'
@@ -0,0 +1,23 @@
+import re
+
+import numpy as np
+
+# \w alone does not match combining marks, so Bangla vowel signs, hasanta,
+# nukta and the ZWNJ/ZWJ used in conjuncts are added to keep words whole
+WORD_CHARS = r'\w\u0300-\u036f\u0981-\u0983\u09bc\u09be-\u09cd\u09d7\u09e2-\u09e3\u200c-\u200d'
+TOKEN_RE = re.compile(rf'[{WORD_CHARS}]+|[^\s{WORD_CHARS}]')
+
+
+def tokenize(text):
+    """Words and single punctuation marks (incl. the dari ।) of a text, as (start, end, token) tuples."""
+    return [(m.start(), m.end(), m.group()) for m in TOKEN_RE.finditer(text)]
+
+
+def token_offsets(text):
+    """Start and end character offsets of the tokens of a text, as two int arrays."""
+    offsets = [m.span() for m in TOKEN_RE.finditer(text)]
+    if not offsets:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    bounds = np.array(offsets, dtype=np.int64)
+    return bounds[:, 0], bounds[:, 1]
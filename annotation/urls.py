@@ -4,7 +4,18 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('project/create/', views.project_create, name='project_create'),
+    path('templates/', views.project_templates, name='project_templates'),
+    path('templates/<int:template_id>/delete/', views.project_template_delete, name='project_template_delete'),
     path('project/<int:user_id>/<int:user_project_id>/detail/', views.project_detail, name='project_detail'),
+    path('project/<int:user_id>/<int:user_project_id>/search/', views.project_search, name='project_search'),
+    path('project/<int:user_id>/<int:user_project_id>/agreement/', views.project_agreement, name='project_agreement'),
+    path('project/<int:user_id>/<int:user_project_id>/adjudication/', views.adjudication_queue, name='adjudication_queue'),
+    path('project/<int:user_id>/<int:user_project_id>/adjudication/<int:text_id>/', views.adjudicate_text, name='adjudicate_text'),
+    path('project/<int:user_id>/<int:user_project_id>/snapshots/', views.project_snapshots, name='project_snapshots'),
+    path('project/<int:user_id>/<int:user_project_id>/snapshots/<int:old_id>/diff/<int:new_id>/', views.snapshot_diff, name='snapshot_diff'),
+    path('snapshots/<str:token>/', views.snapshot_download, name='snapshot_download'),
+    path('project/<int:user_id>/<int:user_project_id>/clone/', views.project_clone, name='project_clone'),
+    path('project/<int:user_id>/<int:user_project_id>/save_template/', views.project_save_template, name='project_save_template'),
     path('project/<int:user_id>/<int:user_project_id>/delete/', views.project_delete, name='project_delete'),
     path('project/<int:user_id>/<int:user_project_id>/import/', views.texts_import, name='texts_import'),
     path('project/<int:user_id>/<int:user_project_id>/labels/', views.project_labels, name='project_labels'),
@@ -16,6 +27,10 @@ urlpatterns = [
     path('project/<int:user_id>/<int:user_project_id>/remove_collaborator/<int:collaborator_user_id>/', views.remove_collaborator, name='remove_collaborator'),
     path('project/<int:user_id>/<int:user_project_id>/export/', views.export_annotations, name='export_annotations'),
     path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/annotate/', views.text_annotate, name='text_annotate'),
+    path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/annotations/', views.text_annotations, name='text_annotations'),
+    path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/next/', views.next_text, name='next_text'),
+    path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/history/', views.annotation_history, name='annotation_history'),
+    path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/events/', views.text_events, name='text_events'),
     path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/add_annotation/', views.add_annotation, name='add_annotation'),
     path('project/<int:user_id>/<int:user_project_id>/text/<int:text_id>/update_annotation/<int:annotation_id>/', views.update_annotation, name='update_annotation'),
     path('annotation/<int:annotation_id>/delete/', views.delete_annotation, name='delete_annotation'),
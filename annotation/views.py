@@ -1,69 +1,97 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib.auth.models import User
 from django.db import transaction
-from .models import Project, Label, Text, Annotation, ProjectCollaborator
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from .models import (
+    Project, Label, Text, Annotation, ProjectCollaborator, ProjectSnapshot, ProjectTemplate, AdjudicationItem, CloneJob,
+    ImportJob,
+)
 from .forms import ProjectForm, LabelForm
+from .adjudication import accept_agreed, accept_variants, build_adjudication, conflict_queue, variant_key
+from .agreement import get_agreement_report
+from .cloning import run_clone_job_in_background, start_clone
+from .events import broker
+from .history import acreate_annotation, adelete_annotation, aupdate_annotation, text_history, text_state_at
+from .importers import (
+    DUPLICATE_MODES, DUPLICATE_SKIP, TextWriter, UploadDecoder, file_fingerprint, find_resumable_job, job_checkpoint,
+)
+from .project_templates import apply_template, template_from_project, templates_for
+from .readers import READERS, TEXT_FIELDS, available_readers, get_reader
+from .dashboard import get_home_projects
+from .label_cache import aget_label_table, compact_label_table, get_label_table
+from .offsets import OFFSET_UNITS, aget_offset_map, get_offset_map, replace_lone_surrogates, span_to_codepoints
+from .search import SearchResults
+from .token_export import TOKEN_EXPORT_FORMATS, TokenExporter
+from .snapshots import (
+    SNAPSHOT_FILES, delete_snapshot, diff_snapshots, download_token, encode_changes, resolve_download, run_snapshot_in_background,
+    snapshot_timestamp, start_snapshot,
+)
+from django.core import signing
 from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+import asyncio
+import contextlib
 import csv
-import io
+import itertools
 import json
 
+SSE_KEEPALIVE_SECONDS = 15
+
 def home(request):
     if request.user.is_authenticated:
-        projects = Project.objects.filter(owner=request.user) | Project.objects.filter(collaborators__user=request.user)
-        projects = projects.distinct()
-        return render(request, 'home.html', {'projects': projects})
+        return render(request, 'home.html', {'projects': get_home_projects(request.user)})
     return render(request, 'home.html')
 
 @login_required
 def project_create(request):
     if request.method == 'POST':
-        form = ProjectForm(request.POST)
+        form = ProjectForm(request.POST, user=request.user)
         if form.is_valid():
             project = form.save(commit=False)
             project.owner = request.user
-            project.save()
-            # Create default labels for Bangla errors
-            default_labels = [
-                {'name': 'SUB_VERB_AGREEMENT_ERROR', 'error_code': 2, 'color': "#EA6B6B"},
-                {'name': 'SADHU_CHALIT_MIX_ERROR', 'error_code': 4, 'color': "#69F869"},
-                {'name': 'PUNCTUATION_ERROR', 'error_code': 8, 'color': "#8383E2"},
-                {'name': 'NON_WORD_ERROR', 'error_code': 16, 'color': "#F1F14A"},
-                {'name': 'UNKNOWN_WORD', 'error_code': 32, 'color': "#F455F4"},
-                {'name': 'INFLECTION_ERROR', 'error_code': 64, 'color': '#00FFFF'},
-                {'name': 'NO_SPACE_ERROR', 'error_code': 128, 'color': "#956F6F"},
-                {'name': 'EXTAR_SPACE_ERROR', 'error_code': 256, 'color': "#41A441"},
-                {'name': 'INAPPROPRIATE_WORD_USAGE_ERROR', 'error_code': 512, 'color': "#505A68"},
-                {'name': 'PREPOSITION_CONJUNCTION_ERROR', 'error_code': 1024, 'color': "#8E8E45"},
-                {'name': 'REPETITION_ERROR', 'error_code': 2048, 'color': "#985298"},
-                {'name': 'QUALITY_SENTENCE_ERROR', 'error_code': 4096, 'color': "#389494"},
-                {'name': 'REAL_WORD_ERROR', 'error_code': 8192, 'color': "#726969"},
-            ]
-            labels_created = 0
-            for label_data in default_labels:
-                try:
-                    Label.objects.create(
-                        name=label_data['name'],
-                        error_code=label_data['error_code'],
-                        color=label_data['color'],
-                        project=project,
-                        created_by=request.user,
-                        is_static=True
-                    )
-                    labels_created += 1
-                except Exception as e:
-                    messages.warning(request, f'Failed to create label "{label_data["name"]}": {str(e)}')
+            with transaction.atomic():
+                project.save()
+                labels_created = apply_template(project, form.cleaned_data['template'], request.user)
             if labels_created > 0:
-                messages.info(request, f'Created {labels_created} default labels for the project.')
+                messages.info(request, f'Created {labels_created} labels for the project.')
             messages.success(request, 'Project created successfully!')
             return redirect('project_detail', user_id=request.user.id, user_project_id=project.user_project_id)
     else:
-        form = ProjectForm()
+        form = ProjectForm(user=request.user)
     return render(request, 'project_create.html', {'form': form})
 
+@login_required
+def project_save_template(request, user_id, user_project_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user:
+        messages.error(request, 'Only the owner can save the project as a template.')
+        return redirect('project_detail', user_id=user_id, user_project_id=user_project_id)
+    if request.method == 'POST':
+        name = request.POST.get('name', '').strip() or project.name
+        template = template_from_project(project, name, request.user)
+        messages.success(request, f'Saved template "{template.name}" with {len(template.labels)} labels.')
+        return redirect('project_templates')
+    return redirect('project_detail', user_id=user_id, user_project_id=user_project_id)
+
+@login_required
+def project_templates(request):
+    templates = templates_for(request.user).prefetch_related('collaborators')
+    return render(request, 'project_templates.html', {'templates': templates})
+
+@login_required
+def project_template_delete(request, template_id):
+    template = get_object_or_404(ProjectTemplate, pk=template_id, owner=request.user)
+    if request.method == 'POST':
+        template.delete()
+        messages.success(request, f'Template "{template.name}" deleted.')
+    return redirect('project_templates')
+
 @login_required
 def project_detail(request, user_id, user_project_id):
     project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
@@ -72,17 +100,26 @@ def project_detail(request, user_id, user_project_id):
         return redirect('home')
 
     labels = project.labels.all()
+    members = User.objects.filter(Q(pk=project.owner_id) | Q(collaborations__project=project)).distinct().order_by('username')
+
+    texts_queryset, filters = _filter_project_texts(project, request.GET)
+    texts_queryset = texts_queryset.order_by('id').prefetch_related(
+        Prefetch('annotations', queryset=Annotation.objects.order_by('start_index'))
+    )
 
-    # Get all texts with annotation status for current user
-    texts_queryset = project.texts.all()
+    # Pagination - 20 texts per page; only the current page is loaded
+    page_number = request.GET.get('page', 1)
+    paginator = Paginator(texts_queryset, 20)
+    page_obj = paginator.get_page(page_number)
 
-    # Add annotation status to each text
+    # Add annotation status to each text on the page
     texts_with_status = []
-    for text in texts_queryset:
+    label_table = get_label_table(project)
+    for text in page_obj:
         # Show ALL annotations for this text, not just current user's annotations
-        annotations = text.annotations.all().order_by('start_index')
-        has_annotations = annotations.exists()
-        annotation_count = annotations.count() if has_annotations else 0
+        annotations = text.annotations.all()
+        annotation_count = len(annotations)
+        has_annotations = annotation_count > 0
 
         # Create JSON data for template filter
         annotations_data = []
@@ -90,16 +127,17 @@ def project_detail(request, user_id, user_project_id):
             try:
                 # Calculate annotated text from the text content
                 annotated_text = text.text[ann.start_index:ann.end_index]
+                label = label_table[ann.label_id]
                 annotations_data.append({
                     'id': ann.id,
                     'start_index': ann.start_index,
                     'end_index': ann.end_index,
-                    'label': ann.label.name,
-                    'label_color': ann.label.color,
+                    'label': label['name'],
+                    'label_color': label['color'],
                     'annotated_text': annotated_text,
                     'suggestions': ann.suggestions or []
                 })
-            except (IndexError, TypeError, AttributeError):
+            except (IndexError, TypeError, AttributeError, KeyError):
                 continue
         try:
             annotations_json = json.dumps(annotations_data, ensure_ascii=False)
@@ -111,12 +149,11 @@ def project_detail(request, user_id, user_project_id):
             'annotation_count': annotation_count,
             'annotations_json': annotations_json
         })
+    page_obj.object_list = texts_with_status
 
-    # Pagination - 20 texts per page
-
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(texts_with_status, 20)
-    page_obj = paginator.get_page(page_number)
+    # Keep the active filters on pagination links
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
 
     # Check if user can manage this project (owner or collaborator)
     can_manage_project = (project.owner == request.user or
@@ -126,9 +163,52 @@ def project_detail(request, user_id, user_project_id):
         'project': project,
         'labels': labels,
         'page_obj': page_obj,
-        'can_manage_project': can_manage_project
+        'members': members,
+        'filters': filters,
+        'filter_query': filter_params.urlencode(),
+        'can_manage_project': can_manage_project,
+        'clone_job': project.clone_jobs.exclude(status=CloneJob.STATUS_DONE).select_related('source').first(),
     })
 
+def _parse_filter_date(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+def _filter_project_texts(project, params):
+    """Apply the project listing filters from the query string.
+
+    Label, error code, annotator, date range and re-annotation criteria all
+    apply to the same annotation; status chooses between texts that have such
+    an annotation and texts that have none.
+    """
+    filters = {key: params.get(key, '').strip() for key in
+               ('label', 'error_code', 'user', 'status', 'date_from', 'date_to', 'reannotation')}
+    annotations = Annotation.objects.filter(text=OuterRef('pk'))
+    if filters['label'].isdigit():
+        annotations = annotations.filter(label_id=int(filters['label']))
+    if filters['error_code']:
+        annotations = annotations.filter(label__error_code=filters['error_code'])
+    if filters['user'].isdigit():
+        annotations = annotations.filter(user_id=int(filters['user']))
+    date_from = _parse_filter_date(filters['date_from'])
+    if date_from:
+        annotations = annotations.filter(created_at__date__gte=date_from)
+    date_to = _parse_filter_date(filters['date_to'])
+    if date_to:
+        annotations = annotations.filter(created_at__date__lte=date_to)
+    if filters['reannotation'] in ('yes', 'no'):
+        annotations = annotations.filter(is_reannotation=filters['reannotation'] == 'yes')
+
+    texts = project.texts.all()
+    annotation_filtered = any(filters[key] for key in filters if key != 'status')
+    if filters['status'] == 'unannotated':
+        texts = texts.filter(~Exists(annotations))
+    elif filters['status'] == 'annotated' or annotation_filtered:
+        texts = texts.filter(Exists(annotations))
+    return texts, filters
+
 @login_required
 def project_delete(request, user_id, user_project_id):
     project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
@@ -141,6 +221,154 @@ def project_delete(request, user_id, user_project_id):
         return redirect('home')
     return render(request, 'project_delete.html', {'project': project})
 
+@login_required
+def project_clone(request, user_id, user_project_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user:
+        messages.error(request, 'Only the owner can clone the project.')
+        return redirect('project_detail', user_id=user_id, user_project_id=user_project_id)
+    if request.method == 'POST':
+        name = request.POST.get('name', '').strip() or f'{project.name} (copy)'
+        with transaction.atomic():
+            job = start_clone(
+                project,
+                request.user,
+                name,
+                include_annotations=request.POST.get('annotations') == 'on',
+                include_collaborators=request.POST.get('collaborators') == 'on',
+            )
+            run_clone_job_in_background(job)
+        messages.success(request, f'Cloning {job.total_texts} texts into "{name}"; they appear here as they are copied.')
+        return redirect('project_detail', user_id=request.user.id, user_project_id=job.project.user_project_id)
+    return render(request, 'project_clone.html', {
+        'project': project,
+        'text_count': project.texts.count(),
+        'annotation_count': Annotation.objects.filter(text__project=project).count(),
+    })
+
+@login_required
+def project_search(request, user_id, user_project_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        messages.error(request, 'You do not have access to this project.')
+        return redirect('home')
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(project, query), 20)
+    page_obj = paginator.get_page(request.GET.get('page', 1))
+    return render(request, 'project_search.html', {
+        'project': project,
+        'query': query,
+        'page_obj': page_obj
+    })
+
+@login_required
+def project_agreement(request, user_id, user_project_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        messages.error(request, 'You do not have access to this project.')
+        return redirect('home')
+    report = get_agreement_report(project, refresh=request.GET.get('refresh') == '1' and project.owner == request.user)
+    return render(request, 'project_agreement.html', {
+        'project': project,
+        'report': report
+    })
+
+@login_required
+def adjudication_queue(request, user_id, user_project_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user:
+        messages.error(request, 'Only the owner can adjudicate annotations.')
+        return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'rebuild':
+            built = build_adjudication(project, stale_only=True)
+            messages.success(request, f'Compared annotations on {built} text{"s" if built != 1 else ""}.')
+        elif action == 'accept_selected':
+            items = project.adjudication_items.filter(id__in=request.POST.getlist('items'))
+            accepted = accept_agreed(items, request.user)
+            messages.success(request, f'Accepted {accepted} agreed spans into the gold layer.')
+        elif action == 'accept_unanimous':
+            items = project.adjudication_items.filter(resolved_at__isnull=True, conflicts=0)
+            accepted = accept_agreed(items, request.user)
+            messages.success(request, f'Accepted {accepted} spans from texts without conflicts.')
+        return redirect('adjudication_queue', user_id=project.owner.id, user_project_id=project.user_project_id)
+
+    paginator = Paginator(conflict_queue(project).select_related('text'), 50)
+    page_obj = paginator.get_page(request.GET.get('page', 1))
+    items = project.adjudication_items.all()
+    return render(request, 'adjudication_queue.html', {
+        'project': project,
+        'page_obj': page_obj,
+        'stale_count': items.filter(is_stale=True).count(),
+        'unanimous_count': items.filter(resolved_at__isnull=True, conflicts=0).count(),
+        'resolved_count': items.filter(resolved_at__isnull=False).count()
+    })
+
+@login_required
+def adjudicate_text(request, user_id, user_project_id, text_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user:
+        messages.error(request, 'Only the owner can adjudicate annotations.')
+        return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
+    text = get_object_or_404(Text, id=text_id, project=project)
+
+    item = AdjudicationItem.objects.filter(text=text).first()
+    if item is None or item.is_stale:
+        # Only texts whose annotations changed since the last build are compared here
+        build_adjudication(project, text_ids=[text.id])
+        item = AdjudicationItem.objects.filter(text=text).first()
+    if item is None:
+        messages.info(request, 'This text needs annotations from at least two people to adjudicate.')
+        return redirect('adjudication_queue', user_id=project.owner.id, user_project_id=project.user_project_id)
+
+    if request.method == 'POST':
+        accepted = accept_variants(item, request.POST.getlist('accept'), request.user)
+        messages.success(request, f'Saved {accepted} gold span{"s" if accepted != 1 else ""} for {text.text_id or text.id}.')
+        next_item = conflict_queue(project).exclude(pk=item.pk).first()
+        if next_item:
+            return redirect('adjudicate_text', user_id=project.owner.id, user_project_id=project.user_project_id, text_id=next_item.text_id)
+        return redirect('adjudication_queue', user_id=project.owner.id, user_project_id=project.user_project_id)
+
+    label_table = get_label_table(project)
+    user_ids = {user for cluster in item.clusters for variant in cluster['v'] for user in variant['u']}
+    usernames = dict(User.objects.filter(id__in=user_ids).values_list('id', 'username'))
+    gold_keys = {
+        f'{start}:{end}:{label_id}'
+        for start, end, label_id in text.gold_annotations.values_list('start_index', 'end_index', 'label_id')
+    }
+    clusters = []
+    for cluster in item.clusters:
+        variants = []
+        for variant in cluster['v']:
+            label = label_table.get(variant['l'], {'name': 'Unknown', 'color': '#999999'})
+            key = variant_key(variant)
+            variants.append({
+                'key': key,
+                'span_text': text.text[variant['s']:variant['e']],
+                'label': label['name'],
+                'label_color': label['color'],
+                'users': [usernames.get(user, str(user)) for user in variant['u']],
+                'suggestions': variant['g'],
+                'checked': key in gold_keys if item.resolved_at else cluster['agreed'],
+            })
+        clusters.append({
+            'agreed': cluster['agreed'],
+            'before': text.text[max(0, cluster['s'] - 30):cluster['s']],
+            'span_text': text.text[cluster['s']:cluster['e']],
+            'after': text.text[cluster['e']:cluster['e'] + 30],
+            'variants': variants,
+        })
+    next_item = conflict_queue(project).exclude(pk=item.pk).first()
+    return render(request, 'adjudicate_text.html', {
+        'project': project,
+        'text': text,
+        'item': item,
+        'clusters': clusters,
+        'next_item': next_item
+    })
+
 @login_required
 def project_labels(request, user_id, user_project_id):
     project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
@@ -228,23 +456,45 @@ def texts_import(request, user_id, user_project_id):
 
     if request.method == 'POST':
         import_type = request.POST.get('import_type', 'single')
+        # Plain text imports commit chunk by chunk unless all-or-nothing is asked for
+        atomic = import_type == 'dual' or request.POST.get('atomic') == 'on'
 
         try:
-            with transaction.atomic():
+            with transaction.atomic() if atomic else contextlib.nullcontext():
                 if import_type == 'dual':
                     # Dual file import
                     return _handle_dual_file_import(request, project)
                 else:
                     # Single file import (existing functionality)
-                    return _handle_single_file_import(request, project)
+                    return _handle_single_file_import(request, project, atomic=atomic)
 
         except Exception as e:
             messages.error(request, f'Import failed: {str(e)}. All changes have been rolled back.')
-            return render(request, 'texts_import.html', {'project': project})
+            return render(request, 'texts_import.html', _import_context(project))
 
-    return render(request, 'texts_import.html', {'project': project})
+    return render(request, 'texts_import.html', _import_context(project))
 
-def _handle_single_file_import(request, project):
+def _import_context(project):
+    unfinished = project.import_jobs.exclude(status=ImportJob.STATUS_DONE).order_by('-created_at')
+    formats = available_readers()
+    return {
+        'project': project,
+        'unfinished_imports': unfinished,
+        'import_formats': formats,
+        'import_extensions': ','.join(ext for reader in formats for ext in reader.extensions),
+    }
+
+def _duplicate_mode(request):
+    duplicates = request.POST.get('duplicates', DUPLICATE_SKIP)
+    return duplicates if duplicates in DUPLICATE_MODES else DUPLICATE_SKIP
+
+def _report_duplicates(request, writer):
+    if writer.skipped:
+        messages.info(request, f'Skipped {writer.skipped} texts already in the project.')
+    if writer.updated:
+        messages.info(request, f'Updated {writer.updated} existing texts.')
+
+def _handle_single_file_import(request, project, atomic=True):
     """Handle single file import (existing functionality)"""
     if not request.FILES.get('csv_file'):
         messages.error(request, 'No CSV file provided.')
@@ -252,29 +502,34 @@ def _handle_single_file_import(request, project):
 
     csv_file = request.FILES['csv_file']
 
-    # Try different encodings to handle various file formats
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'windows-1252', 'iso-8859-1', 'cp1252']
-    decoded_file = None
-    for encoding in encodings_to_try:
-        try:
-            csv_file.seek(0)  # Reset file pointer
-            decoded_file = csv_file.read().decode(encoding)
-            break
-        except UnicodeDecodeError:
-            continue
+    # An interrupted chunked import of the same file carries on after its last committed chunk
+    job = None
+    if not atomic:
+        file_hash = file_fingerprint(csv_file)
+        job = find_resumable_job(project, file_hash)
 
-    if decoded_file is None:
-        messages.error(request, 'Could not decode the CSV file. Please ensure it is properly encoded.')
-        return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
-    
-    io_string = io.StringIO(decoded_file)
-    reader = csv.DictReader(io_string)
-    
-    if not reader.fieldnames:
-        messages.error(request, 'CSV file is empty or missing headers.')
+    if job:
+        text_reader = READERS[job.format](csv_file, start=job.offset, encoding=job.encoding, fieldnames=job.fieldnames)
+        messages.info(request, f'Resuming the import of {job.file_name} after row {job.rows}.')
+    else:
+        try:
+            reader_class = get_reader(csv_file.name, request.POST.get('format') or None)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('texts_import', user_id=project.owner.id, user_project_id=project.user_project_id)
+        # Decoded lazily in one pass; the encoding is sniffed from the start of the file
+        text_reader = reader_class(csv_file)
+
+    fieldnames = text_reader.open()
+    if not fieldnames:
+        messages.error(request, 'The file is empty or missing headers.')
         return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
 
-    has_annotations = any(key in reader.fieldnames for key in ['start_index', 'error_label', 'suggestions'])
+    # Annotated rows are only read from CSV
+    has_annotations = text_reader.name == 'csv' and any(
+        key in fieldnames for key in ['start_index', 'error_label', 'suggestions']
+    )
+    reader = getattr(text_reader, 'rows', None)
     imported_texts = 0
     imported_annotations = 0
 
@@ -282,166 +537,138 @@ def _handle_single_file_import(request, project):
         # Import annotated data
         text_cache = {}  # Cache to avoid duplicate text creation
 
-        for row in reader:
-            try:
-                # Get or create text
-                input_text_id = row.get('input_text_id', row.get('ID', row.get('id', '')))
-                content = row.get('content', row.get('Content', row.get('text', '')))
+        # Rows create texts and annotations one by one, so this part stays all or nothing
+        with transaction.atomic():
+            for row in reader:
+                try:
+                    # Get or create text
+                    input_text_id = row.get('input_text_id', row.get('ID', row.get('id', '')))
+                    content = row.get('content', row.get('Content', row.get('text', '')))
 
-                if not content.strip():
-                    continue
+                    if not content.strip():
+                        continue
 
-                # Ensure text is properly encoded and normalized
-                if isinstance(content, str):
-                    content = content.strip().replace('\x00', '').replace('\r', '')
-
-                # Use input_text_id as key for caching
-                text_key = input_text_id or content[:50]  # Fallback key
-
-                if text_key not in text_cache:
-                    text_obj, created = Text.objects.get_or_create(
-                        project=project,
-                        text_id=input_text_id if input_text_id else None,
-                        defaults={'text': content}
-                    )
-                    if not created:
-                        # Update existing text if content is different
-                        if text_obj.text != content:
-                            text_obj.text = content
-                            text_obj.save()
-                    text_cache[text_key] = text_obj
-                    imported_texts += 1
-
-                text_obj = text_cache[text_key]
-
-                # Create annotation if annotation data exists
-                start_index_str = row.get('start_index', '')
-                error_label = row.get('error_label', '')
-                suggestions = row.get('suggestions', '')
-
-                if start_index_str and error_label:
-                    try:
-                        start_index = int(start_index_str)
-
-                        # Get or create label
-                        label, created = Label.objects.get_or_create(
-                            project=project,
-                            error_label=error_label,
-                            defaults={
-                                'color': "#444040",
-                                'created_by': request.user
-                            }
-                        )
+                    # Ensure text is properly encoded and normalized
+                    if isinstance(content, str):
+                        content = content.strip().replace('\x00', '').replace('\r', '')
 
-                        # Calculate end_index from annotated text if available
-                        annotated_text = row.get('selected_sub_text', '')
-                        if annotated_text:
-                            end_index = start_index + len(annotated_text)
-                        else:
-                            # Estimate end_index based on context
-                            end_index = start_index + 1
-
-                        # Ensure end_index is within text bounds
-                        if end_index > len(text_obj.text):
-                            end_index = len(text_obj.text)
-
-                        # Create annotation
-                        Annotation.objects.get_or_create(
-                            text=text_obj,
-                            user=request.user,
-                            start_index=start_index,
-                            end_index=end_index,
-                            label=label,
-                            defaults={'suggestions': [s.strip() for s in suggestions.split(',') if s.strip()]}
-                        )
-                        imported_annotations += 1
+                    # Use input_text_id as key for caching
+                    text_key = input_text_id or content[:50]  # Fallback key
 
-                    except (ValueError, TypeError) as e:
-                        messages.warning(request, f'Error importing annotation for row: {str(e)}')
-                        continue
+                    if text_key not in text_cache:
+                        text_obj, created = Text.objects.get_or_create(
+                            project=project,
+                            text_id=input_text_id if input_text_id else None,
+                            defaults={'text': content}
+                        )
+                        if not created:
+                            # Update existing text if content is different
+                            if text_obj.text != content:
+                                text_obj.text = content
+                                text_obj.save()
+                        text_cache[text_key] = text_obj
+                        imported_texts += 1
+
+                    text_obj = text_cache[text_key]
+
+                    # Create annotation if annotation data exists
+                    start_index_str = row.get('start_index', '')
+                    error_label = row.get('error_label', '')
+                    suggestions = row.get('suggestions', '')
+
+                    if start_index_str and error_label:
+                        try:
+                            start_index = int(start_index_str)
+
+                            # Get or create label
+                            label, created = Label.objects.get_or_create(
+                                project=project,
+                                error_label=error_label,
+                                defaults={
+                                    'color': "#444040",
+                                    'created_by': request.user
+                                }
+                            )
+
+                            # Calculate end_index from annotated text if available
+                            annotated_text = row.get('selected_sub_text', '')
+                            if annotated_text:
+                                end_index = start_index + len(annotated_text)
+                            else:
+                                # Estimate end_index based on context
+                                end_index = start_index + 1
+
+                            # Ensure end_index is within text bounds
+                            if end_index > len(text_obj.text):
+                                end_index = len(text_obj.text)
+
+                            # Create annotation
+                            Annotation.objects.get_or_create(
+                                text=text_obj,
+                                user=request.user,
+                                start_index=start_index,
+                                end_index=end_index,
+                                label=label,
+                                defaults={'suggestions': [s.strip() for s in suggestions.split(',') if s.strip()]}
+                            )
+                            imported_annotations += 1
+
+                        except (ValueError, TypeError) as e:
+                            messages.warning(request, f'Error importing annotation for row: {str(e)}')
+                            continue
 
-            except Exception as e:
-                messages.warning(request, f'Error importing row: {str(e)}')
-                continue
+                except Exception as e:
+                    messages.warning(request, f'Error importing row: {str(e)}')
+                    continue
 
         messages.success(request, f'Successfully imported {imported_texts} texts and {imported_annotations} annotations!')
 
     else:
         # Plain text import (existing functionality)
-        # Check if we can use optimized raw import for 2-column CSVs to preserve quotes
-        fieldnames = reader.fieldnames if reader.fieldnames else []
-        is_simple_csv = False
-        
-        # Identify ID and Content columns
-        id_col_name = next((col for col in fieldnames if col.lower() in ['id', 'input_text_id']), None)
-        text_col_name = next((col for col in fieldnames if col.lower() in ['text', 'content']), None)
-        
-        if id_col_name and text_col_name and len(fieldnames) == 2:
-            is_simple_csv = True
-            is_id_first = fieldnames.index(id_col_name) == 0
-            
-            # Reset file pointer to read raw lines
-            io_string.seek(0)
-            # Skip header
-            next(io_string, None)
-            
-            for line in io_string:
-                line = line.rstrip('\r\n')
-                if not line: continue
-                
-                try:
-                    # split only on the separator to preserve quotes in content
-                    if is_id_first:
-                        parts = line.split(',', 1)
-                        if len(parts) < 2: continue
-                        text_id = parts[0].strip()
-                        text = parts[1]
-                    else:
-                        parts = line.rsplit(',', 1)
-                        if len(parts) < 2: continue
-                        text = parts[0]
-                        text_id = parts[1].strip()
-                    
-                    # Remove null bytes for DB safety, but avoid other normalization
-                    if isinstance(text, str):
-                        text = text.replace('\x00', '')
-
-                    Text.objects.create(
-                        project=project,
-                        text_id=text_id,
-                        text=text,
-                    )
-                    imported_texts += 1
-                except Exception as e:
-                    # Log error but continue
-                    print(f"Error importing row: {e}")
-                    continue
-        else:
-            # Fallback to standard CSV reader for complex files
-            for row in reader:
-                try:
-                    text_id = row.get('ID', row.get('id', ''))
-                    text = row.get('Content', row.get('text', ''))
-    
-                    # Helper to clean text without stripping intentional whitespace
-                    if not text:
-                        continue
-    
-                    # Minimal cleanup: remove null bytes and carriage returns
-                    if isinstance(text, str):
-                        text = text.replace('\x00', '').replace('\r', '')
-    
-                    Text.objects.create(
-                        project=project,
-                        text_id=text_id,
-                        text=text,
-                    )
-                    imported_texts += 1
-                except Exception as e:
-                    messages.warning(request, f'Error importing row: {str(e)}')
-                    continue
+        if not text_reader.text_field:
+            messages.error(request, f'The file needs a text column ({", ".join(TEXT_FIELDS)}).')
+            return redirect('texts_import', user_id=project.owner.id, user_project_id=project.user_project_id)
+        if not atomic and not job:
+            job = ImportJob.objects.create(
+                project=project,
+                created_by=request.user,
+                file_name=csv_file.name,
+                file_size=csv_file.size,
+                file_hash=file_hash,
+                format=text_reader.name,
+                encoding=text_reader.encoding,
+                fieldnames=fieldnames,
+                duplicates=_duplicate_mode(request),
+                offset=text_reader.position,  # just past the header
+            )
+        # Every format feeds the same writer: chunks checked against the
+        # project's content hashes and saved with bulk_create
+        writer = TextWriter(project, duplicates=job.duplicates if job else _duplicate_mode(request))
+        if job:
+            # Each chunk commits together with the position to resume from
+            writer.checkpoint = job_checkpoint(job, text_reader, writer)
 
-        messages.success(request, f'Successfully imported {imported_texts} texts!')
+        try:
+            for text_id, text, meta in text_reader:
+                writer.add(text_id, text, meta)
+            writer.flush()
+        except Exception as e:
+            if not job:
+                raise
+            job.status = ImportJob.STATUS_FAILED
+            job.error = str(e)
+            job.save(update_fields=['status', 'error', 'updated_at'])
+            messages.error(request, f'Import stopped after row {job.rows}: {e}. {job.created} texts were saved; '
+                                    f'upload the same file again to continue from there.')
+            return redirect('texts_import', user_id=project.owner.id, user_project_id=project.user_project_id)
+
+        if job:
+            job.status = ImportJob.STATUS_DONE
+            job.save(update_fields=['status', 'updated_at'])
+        if text_reader.errors:
+            messages.warning(request, f'Skipped {len(text_reader.errors)} unreadable rows, e.g. {text_reader.errors[0]}')
+        messages.success(request, f'Successfully imported {writer.created} texts!')
+        _report_duplicates(request, writer)
 
     return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
 
@@ -462,8 +689,10 @@ def _handle_dual_file_import(request, project):
     imported_annotations = 0
 
     # Step 1: Import texts from first CSV
-    text_mapping = _import_texts_from_csv(text_csv_file, project)
-    imported_texts = len(text_mapping)
+    text_writer = _import_texts_from_csv(request, text_csv_file, project, _duplicate_mode(request))
+    text_mapping = text_writer.texts
+    imported_texts = text_writer.created
+    _report_duplicates(request, text_writer)
 
     # Step 2: Import annotations from second CSV if provided
     if annotation_csv_file:
@@ -481,100 +710,37 @@ def _handle_dual_file_import(request, project):
 
     return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
 
-def _import_texts_from_csv(csv_file, project):
-    """Import texts from CSV file and return mapping of text_id to Text object"""
-    # Try different encodings to handle various file formats
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'windows-1252', 'iso-8859-1', 'cp1252']
-    decoded_file = None
-    for encoding in encodings_to_try:
-        try:
-            csv_file.seek(0)  # Reset file pointer
-            decoded_file = csv_file.read().decode(encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-
-    if decoded_file is None:
-        raise Exception('Could not decode the text CSV file. Please ensure it is properly encoded.')
-
-    io_string = io.StringIO(decoded_file)
-    reader = csv.DictReader(io_string)
-    cnt=0
+def _import_texts_from_csv(request, csv_file, project, duplicates=DUPLICATE_SKIP):
+    """Import texts from the text file and return the writer, whose texts map text_id to Text object"""
+    # Any registered format works for the texts; the extension picks the reader
+    reader = get_reader(csv_file.name)(csv_file)
+    fieldnames = reader.open()
 
     # Validate required columns
-    sample_row = next(reader, None)
-    if sample_row is None:
+    if not fieldnames:
         raise Exception('Text CSV file is empty.')
-
-    # Check for required columns
-    has_id_column = any(col in sample_row for col in ['ID', 'id'])
-    has_text_column = any(col in sample_row for col in ['Text', 'text', 'Content', 'content'])
-
-    if not has_id_column:
+    if not reader.id_field:
         raise Exception('Text CSV must contain an ID column (ID or id).')
-    if not has_text_column:
+    if not reader.text_field:
         raise Exception('Text CSV must contain a text content column (Text, text, or Content).')
 
-    # Reset reader to beginning
-    io_string.seek(0)
-    reader = csv.DictReader(io_string)
+    # Rows whose ID exists update that text; new rows are checked for duplicate content
+    writer = TextWriter(project, duplicates=duplicates, match_text_id=True, keep_texts=True)
 
-    text_mapping = {}  # Maps text_id to Text object
+    for text_id, text_content, meta in reader:
+        text_content = text_content.strip()
+        if text_content:
+            writer.add(text_id, text_content, meta)
 
-    for row in reader:
-        try:
-            # Extract ID and text content
-            text_id = row.get('ID', row.get('id', ''))
-            text_content = row.get('content', row.get('text', row.get('Text', '')))
+    if reader.errors:
+        messages.warning(request, f'Skipped {len(reader.errors)} unreadable text rows, e.g. {reader.errors[0]}')
 
-            if not text_content.strip():
-                continue
-
-            # Ensure text is properly encoded and normalized
-            if isinstance(text_content, str):
-                text_content = text_content.strip().replace('\x00', '').replace('\r', '')
-
-            # Create or update text
-            text_obj, created = Text.objects.get_or_create(
-                project=project,
-                text_id=text_id if text_id else None,
-                defaults={'text': text_content}
-            )
-
-            if not created:
-                # Update existing text if content is different
-                if text_obj.text != text_content:
-                    text_obj.text = text_content
-                    text_obj.save()
-
-            text_mapping[text_id] = text_obj
-
-        except Exception as e:
-            # Use print for testing, messages.warning in production
-            print(f'Error importing text row: {str(e)}')
-            continue
-
-    return text_mapping
+    writer.flush()
+    return writer
 
 def _import_annotations_from_csv(request, csv_file, project, text_mapping, user):
     """Import annotations from CSV file and return import statistics"""
-    # Try different encodings to handle various file formats
-    encodings_to_try = ['utf-8', 'utf-8-sig', 'windows-1252', 'iso-8859-1', 'cp1252']
-    decoded_file = None
-
-    for encoding in encodings_to_try:
-        try:
-            csv_file.seek(0)  # Reset file pointer
-            decoded_file = csv_file.read().decode(encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-
-    if decoded_file is None:
-        raise Exception('Could not decode the annotation CSV file. Please ensure it is properly encoded.')
-
-    io_string = io.StringIO(decoded_file)
-    reader = csv.DictReader(io_string)
+    reader = csv.DictReader(UploadDecoder(csv_file))
 
     # Validate required columns
     sample_row = next(reader, None)
@@ -588,12 +754,12 @@ def _import_annotations_from_csv(request, csv_file, project, text_mapping, user)
     if missing_columns:
         raise Exception(f'Annotation CSV is missing required columns: {", ".join(missing_columns)}')
 
-    # Reset reader to beginning
-    io_string.seek(0)
-    reader = csv.DictReader(io_string)
+    # Put the sample row back in front instead of decoding the file again
+    reader = itertools.chain([sample_row], reader)
 
     imported_annotations = 0
     duplicate_annotations = 0
+    errors = []
 
     # Track annotations to detect duplicates (same text, start_index, end_index)
     annotation_cache = {}  # Key: (text_id, start_index, end_index)
@@ -669,10 +835,11 @@ def _import_annotations_from_csv(request, csv_file, project, text_mapping, user)
             imported_annotations += 1
 
         except Exception as e:
-            # Use print for testing, messages.warning in production
-            print(f'Error importing annotation row: {str(e)}')
+            errors.append(str(e))
             continue
 
+    if errors:
+        messages.warning(request, f'Skipped {len(errors)} annotation rows that could not be saved, e.g. {errors[0]}')
     return {'imported': imported_annotations, 'duplicates': duplicate_annotations}
 
 @login_required
@@ -683,93 +850,143 @@ def text_annotate(request, user_id, user_project_id, text_id):
         messages.error(request, 'You do not have access to this text.')
         return redirect('project_detail', user_id=project.owner.id, user_project_id=project.user_project_id)
 
-    # Clean and normalize text if it contains problematic characters or hyphens
-    original_text = text.text
-    try:
-        # Test if the text can be properly handled
-        text.text.encode('utf-8').decode('utf-8')
-    except (UnicodeDecodeError, UnicodeEncodeError):
-        # Clean the text by removing problematic characters
-        cleaned_text = ''
-        for char in text.text:
-            try:
-                char.encode('utf-8').decode('utf-8')
-                cleaned_text += char
-            except (UnicodeDecodeError, UnicodeEncodeError):
-                # Replace problematic character with a space or skip it
-                cleaned_text += ' '
-
-        text.text = cleaned_text.strip()
-
-    # Save if text was modified
-    if text.text != original_text:
-        text.save()
+    # Unpaired surrogates cannot be encoded; they are replaced one for one so
+    # existing annotation offsets still point at the same characters
+    cleaned_text = replace_lone_surrogates(text.text)
+    if cleaned_text != text.text:
+        text.text = cleaned_text
+        text.save(update_fields=['text'])
         messages.info(request, 'Text has been normalized for better annotation handling.')
 
     labels = project.labels.all()
-    # Show ALL annotations for this text, not just current user's annotations
-    annotations = text.annotations.all().order_by('start_index').select_related('label')
-
-    # Clean and validate annotations
-    valid_annotations = []
-    for ann in annotations:
-        try:
-            # Check if annotation positions are valid
-            if (ann.start_index >= 0 and
-                ann.end_index > ann.start_index and
-                ann.end_index <= len(text.text)):
-                ann.annotated_text = text.text[ann.start_index:ann.end_index]
-                ann.label_color = ann.label.color
-                valid_annotations.append(ann)
-            else:
-                # Remove invalid annotation
-                ann.delete()
-        except (IndexError, TypeError):
-            # Remove problematic annotation
-            ann.delete()
-            continue
-
-    # Create custom JSON structure for JavaScript
-    annotations_data = []
-    for ann in valid_annotations:
-        try:
-            annotations_data.append({
-                'id': ann.id,
-                'start_index': ann.start_index,
-                'end_index': ann.end_index,
-                'label': ann.label.name,
-                'label_color': ann.label.color,
-                'annotated_text': ann.annotated_text,
-                'suggestions': ann.suggestions or [],
-                'user_id': ann.user.id,
-                'username': ann.user.username
-            })
-        except (IndexError, TypeError, AttributeError):
-            # Skip problematic annotations
-            continue
-
-    # Safely serialize to JSON with error handling
-    try:
-        annotations_json = json.dumps(annotations_data, ensure_ascii=False)
-    except (TypeError, ValueError, UnicodeEncodeError):
-        # If JSON serialization fails, create a basic structure
-        annotations_json = json.dumps([])
-        messages.warning(request, 'Some annotation data could not be loaded due to encoding issues.')
 
+    # Annotations are fetched by the page from text_annotations after the text
+    # has rendered; any that do not fit the text are left unrendered, not deleted
     return render(request, 'text_annotate.html', {
         'project': project,
         'text': text,
         'labels': labels,
-        'annotations': valid_annotations,
-        'annotations_json': annotations_json
+        'has_annotations': text.annotations.exists(),
+        'offset_map': get_offset_map(text),
     })
 
+async def _ahas_project_access(project, user):
+    """Async counterpart of the owner/collaborator check used by the sync views"""
+    if project.owner_id == user.id:
+        return True
+    return await ProjectCollaborator.objects.filter(project=project, user=user).aexists()
+
+def _compact_annotation(ann_id, start_index, end_index, label_id, user_id, suggestions):
+    """Short-keyed annotation row shared by text_annotations, save responses and live events"""
+    item = {'i': ann_id, 's': start_index, 'e': end_index, 'l': label_id, 'u': user_id}
+    if suggestions:
+        item['g'] = suggestions
+    return item
+
+def _annotation_event(event_type, ann, username, label_table):
+    """Delta for one saved annotation, carrying just the table entries it refers to"""
+    return {
+        'type': event_type,
+        'a': _compact_annotation(ann.id, ann.start_index, ann.end_index, ann.label_id, ann.user_id, ann.suggestions),
+        'labels': compact_label_table(label_table, [ann.label_id]),
+        'users': {ann.user_id: username},
+    }
+
+@login_required
+async def text_annotations(request, user_id, user_project_id, text_id):
+    """Compact annotation list for the annotate page.
+
+    Labels and users are sent once as lookup tables and each annotation refers
+    to them by id with short keys: i=id, s=start_index, e=end_index, l=label id,
+    u=user id, g=suggestions (omitted when empty). The client slices the
+    annotated text out of the page's own copy of the text.
+    """
+    project = await aget_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    text = await aget_object_or_404(Text, id=text_id, project=project)
+    user = await request.auser()
+    if not await _ahas_project_access(project, user):
+        return JsonResponse({'error': 'No access'}, status=403)
+
+    labels = compact_label_table(await aget_label_table(project))
+
+    users = {}
+    annotations_data = []
+    annotations = (Annotation.objects.filter(text=text).order_by('start_index')
+                   .values_list('id', 'start_index', 'end_index', 'label_id', 'user_id', 'user__username', 'suggestions'))
+    async for ann_id, start_index, end_index, label_id, ann_user_id, username, suggestions in annotations:
+        users[ann_user_id] = username
+        annotations_data.append(_compact_annotation(ann_id, start_index, end_index, label_id, ann_user_id, suggestions))
+
+    return JsonResponse({'labels': labels, 'users': users, 'a': annotations_data},
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+@login_required
+async def next_text(request, user_id, user_project_id, text_id):
+    """The closest text after this one (?direction=previous: before it) that the user has not annotated.
+
+    Returns {'id', 'url'}, with id null at either end of the project. The
+    project's texts are walked in id order through the (project, id) index
+    and annotated ones skipped by probing the (text, user) unique index, so
+    the lookup is one query however large the project.
+    """
+    project = await aget_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    user = await request.auser()
+    if not await _ahas_project_access(project, user):
+        return JsonResponse({'error': 'No access'}, status=403)
+
+    texts = Text.objects.filter(project=project).filter(
+        ~Exists(Annotation.objects.filter(text=OuterRef('pk'), user=user))
+    )
+    if request.GET.get('direction') == 'previous':
+        texts = texts.filter(id__lt=text_id).order_by('-id')
+    else:
+        texts = texts.filter(id__gt=text_id).order_by('id')
+    neighbour_id = await texts.values_list('id', flat=True).afirst()
+    if neighbour_id is None:
+        return JsonResponse({'id': None, 'url': None})
+    url = reverse('text_annotate', kwargs={
+        'user_id': project.owner_id, 'user_project_id': project.user_project_id, 'text_id': neighbour_id,
+    })
+    return JsonResponse({'id': neighbour_id, 'url': url})
+
+@login_required
+async def text_events(request, user_id, user_project_id, text_id):
+    """Server-sent event stream of annotation deltas for one text (ASGI only)"""
+    project = await aget_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    text = await aget_object_or_404(Text, id=text_id, project=project)
+    user = await request.auser()
+    if not await _ahas_project_access(project, user):
+        return JsonResponse({'error': 'No access'}, status=403)
+    if not hasattr(request, 'scope'):
+        # WSGI would buffer the endless stream; 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+
+    async def stream():
+        queue = broker.subscribe(text.id)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: annotation\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            broker.unsubscribe(text.id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
-def add_annotation(request, user_id, user_project_id, text_id):
+async def add_annotation(request, user_id, user_project_id, text_id):
     if request.method == 'POST':
-        project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
-        text = get_object_or_404(Text, id=text_id, project=project)
-        if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        project = await aget_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+        text = await aget_object_or_404(Text, id=text_id, project=project)
+        user = await request.auser()
+        if not await _ahas_project_access(project, user):
             return JsonResponse({'error': 'No access'}, status=403)
 
         try:
@@ -781,71 +998,207 @@ def add_annotation(request, user_id, user_project_id, text_id):
         except (ValueError, TypeError):
             return JsonResponse({'error': 'Invalid parameters'}, status=400)
 
+        # The annotate page sends UTF-16 offsets; they are stored as code points
+        # on grapheme boundaries
+        offset_unit = request.POST.get('offset_unit', 'codepoint')
+        if offset_unit not in OFFSET_UNITS:
+            return JsonResponse({'error': 'Invalid parameters'}, status=400)
+        offset_map = await aget_offset_map(text)
+        start_index, end_index = span_to_codepoints(offset_map, start_index, end_index, offset_unit)
+
         # Parse suggestions: JSON array from frontend
         suggestions = json.loads(suggestions_str) if suggestions_str else []
 
-        label = get_object_or_404(Label, id=label_id, project=project)
+        label_table = await aget_label_table(project)
+        if label_id not in label_table:
+            raise Http404('No Label matches the given query.')
 
         # Validate indices
         if start_index < 0 or end_index <= start_index or end_index > len(text.text):
             return JsonResponse({'error': 'Invalid text range'}, status=400)
 
         # Check if there's already an annotation for this exact range by this user
-        existing_annotation = Annotation.objects.filter(
+        existing_annotation = await Annotation.objects.filter(
             text=text,
-            user=request.user,
+            user=user,
             start_index=start_index,
             end_index=end_index
-        ).first()
+        ).afirst()
 
         if existing_annotation:
             # Update existing annotation (re-annotation case)
-            existing_annotation.label = label
-            existing_annotation.suggestions = suggestions
-            existing_annotation.is_reannotation = is_reannotation
-            existing_annotation.save()
-            return JsonResponse({'success': True, 'id': existing_annotation.id, 'updated': True})
+            await aupdate_annotation(
+                existing_annotation,
+                user,
+                label_id=label_id,
+                suggestions=suggestions,
+                is_reannotation=is_reannotation,
+            )
+            event = _annotation_event('updated', existing_annotation, user.username, label_table)
+            broker.publish(text.id, event)
+            return JsonResponse({'success': True, 'id': existing_annotation.id, 'updated': True, 'event': event},
+                                json_dumps_params={'ensure_ascii': False})
         else:
             # Create new annotation
             try:
-                annotation = Annotation.objects.create(
+                annotation = await acreate_annotation(
+                    user,
                     text=text,
-                    user=request.user,
                     start_index=start_index,
                     end_index=end_index,
-                    label=label,
+                    label_id=label_id,
                     suggestions=suggestions,
                     is_reannotation=is_reannotation
                 )
-                return JsonResponse({'success': True, 'id': annotation.id, 'created': True})
+                event = _annotation_event('created', annotation, user.username, label_table)
+                broker.publish(text.id, event)
+                return JsonResponse({'success': True, 'id': annotation.id, 'created': True, 'event': event},
+                                    json_dumps_params={'ensure_ascii': False})
             except Exception as e:
                 print(f"Error creating annotation: {e}")
                 return JsonResponse({'error': f'Failed to create annotation: {str(e)}'}, status=500)
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 @login_required
-def update_annotation(request, user_id, user_project_id, text_id, annotation_id):
+async def update_annotation(request, user_id, user_project_id, text_id, annotation_id):
     if request.method == 'POST':
-        project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
-        text = get_object_or_404(Text, id=text_id, project=project)
-        annotation = get_object_or_404(Annotation, id=annotation_id, text=text, user=request.user)
-        if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        project = await aget_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+        text = await aget_object_or_404(Text, id=text_id, project=project)
+        user = await request.auser()
+        annotation = await aget_object_or_404(Annotation, id=annotation_id, text=text, user=user)
+        if not await _ahas_project_access(project, user):
             return JsonResponse({'error': 'No access'}, status=403)
 
         suggestions_str = request.POST.get('suggestions', '')
         suggestions = json.loads(suggestions_str) if suggestions_str else []
-        annotation.suggestions = suggestions
-        annotation.save()
+        await aupdate_annotation(annotation, user, suggestions=suggestions)
 
-        return JsonResponse({'success': True})
+        event = _annotation_event('updated', annotation, user.username, await aget_label_table(project))
+        broker.publish(text.id, event)
+        return JsonResponse({'success': True, 'event': event}, json_dumps_params={'ensure_ascii': False})
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 @login_required
-def delete_annotation(request, annotation_id):
-    annotation = get_object_or_404(Annotation, id=annotation_id, user=request.user)
-    annotation.delete()
+async def delete_annotation(request, annotation_id):
+    user = await request.auser()
+    annotation = await aget_object_or_404(Annotation, id=annotation_id, user=user)
+    text_id = annotation.text_id
+    await adelete_annotation(annotation, user)
+    broker.publish(text_id, {'type': 'deleted', 'a': {'i': annotation_id}})
     return JsonResponse({'success': True})
 
+@login_required
+def annotation_history(request, user_id, user_project_id, text_id):
+    """Edit trail of a text's annotations, or with ?at=<ISO time> the annotations as they were then.
+
+    Annotations use the short keys of text_annotations; events carry the
+    logged delta under 'd' (see AnnotationEvent).
+    """
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    text = get_object_or_404(Text, id=text_id, project=project)
+    if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        return JsonResponse({'error': 'No access'}, status=403)
+    labels = compact_label_table(get_label_table(project))
+    at = request.GET.get('at')
+    if at:
+        when = parse_datetime(at)
+        if when is None:
+            return JsonResponse({'error': 'Invalid time'}, status=400)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        state = text_state_at(text.id, when)
+        annotations = [
+            _compact_annotation(ann_id, item['s'], item['e'], item['l'], item['u'], item['g'])
+            for ann_id, item in sorted(state.items(), key=lambda entry: (entry[1]['s'], entry[0]))
+        ]
+        return JsonResponse({'at': when.isoformat(), 'labels': labels, 'a': annotations},
+                            json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+    events = [
+        {'t': event.created_at.isoformat(), 'by': event.user.username if event.user else None,
+         'action': event.action, 'i': event.annotation_id, 'd': event.data}
+        for event in text_history(text.id)
+    ]
+    return JsonResponse({'labels': labels, 'events': events},
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+async def _aiterate(chunks):
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+def _streaming_content(request, chunks):
+    """Body for a StreamingHttpResponse that streams under both WSGI and ASGI.
+
+    The ASGI handler reads a sync iterator to the end before sending
+    anything, so there each chunk is produced on the sync thread through
+    sync_to_async instead.
+    """
+    return _aiterate(chunks) if hasattr(request, 'scope') else chunks
+
+def _snapshot_links(snapshot):
+    return {
+        filename: reverse('snapshot_download', kwargs={'token': download_token(snapshot, filename)})
+        for filename in SNAPSHOT_FILES
+    }
+
+@login_required
+def project_snapshots(request, user_id, user_project_id):
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        messages.error(request, 'You do not have access to this project.')
+        return redirect('home')
+    if request.method == 'POST':
+        if project.owner != request.user:
+            messages.error(request, 'Only the owner can manage snapshots.')
+        elif request.POST.get('delete'):
+            snapshot = get_object_or_404(ProjectSnapshot, id=request.POST['delete'], project=project)
+            delete_snapshot(snapshot)
+            messages.success(request, f'Snapshot "{snapshot.name}" deleted.')
+        else:
+            name = request.POST.get('name', '').strip() or snapshot_timestamp()
+            if project.snapshots.filter(name=name).exists():
+                messages.error(request, f'A snapshot named "{name}" already exists.')
+            else:
+                with transaction.atomic():
+                    snapshot = start_snapshot(project, name, request.user)
+                    run_snapshot_in_background(snapshot)
+                messages.success(request, f'Snapshot "{snapshot.name}" is being written; reload to see when it is ready.')
+        return redirect('project_snapshots', user_id=user_id, user_project_id=user_project_id)
+    snapshots = list(project.snapshots.select_related('created_by').order_by('-created_at'))
+    for snapshot in snapshots:
+        if snapshot.status == ProjectSnapshot.STATUS_DONE:
+            snapshot.links = _snapshot_links(snapshot)
+    return render(request, 'project_snapshots.html', {'project': project, 'snapshots': snapshots})
+
+def snapshot_download(request, token):
+    """Serve a snapshot file from disk; the signed token is the only check, so no query runs."""
+    try:
+        path = resolve_download(token)
+    except signing.BadSignature:
+        raise Http404('Invalid or expired download link.')
+    if not path.is_file():
+        raise Http404('Snapshot file not found.')
+    response = FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{path.parent.name}-{path.name}')
+    # Snapshots never change once written
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@login_required
+def snapshot_diff(request, user_id, user_project_id, old_id, new_id):
+    """Differences between two snapshots as JSON Lines, streamed as the files are merged"""
+    project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
+    if project.owner != request.user and not ProjectCollaborator.objects.filter(project=project, user=request.user).exists():
+        return JsonResponse({'error': 'No access'}, status=403)
+    old = get_object_or_404(ProjectSnapshot, id=old_id, project=project, status=ProjectSnapshot.STATUS_DONE)
+    new = get_object_or_404(ProjectSnapshot, id=new_id, project=project, status=ProjectSnapshot.STATUS_DONE)
+    response = StreamingHttpResponse(
+        _streaming_content(request, encode_changes(diff_snapshots(old, new))),
+        content_type='application/x-ndjson; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{old.id}-{new.id}.diff.jsonl"'
+    return response
+
 @login_required
 def project_collaborators(request, user_id, user_project_id):
     project = get_object_or_404(Project, owner_id=user_id, user_project_id=user_project_id)
@@ -895,7 +1248,20 @@ def export_annotations(request, user_id, user_project_id):
         return redirect('home')
 
     format_type = request.GET.get('format', 'csv')
-    annotations = Annotation.objects.filter(text__project=project).select_related('text', 'label', 'user').order_by('text__id', 'start_index')
+    if format_type in TOKEN_EXPORT_FORMATS:
+        # Token-tagged data is streamed a chunk of texts at a time
+        exporter = TokenExporter(project, format_type, annotator=request.GET.get('annotator') or None,
+                                 gold=request.GET.get('gold') == '1')
+        content_type, extension = {
+            'conll': ('text/plain; charset=utf-8', 'conll'),
+            'spacy': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+        }[format_type]
+        response = StreamingHttpResponse(_streaming_content(request, exporter), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{project.name}_annotations.{extension}"'
+        return response
+
+    label_table = get_label_table(project)
+    annotations = Annotation.objects.filter(text__project=project).select_related('text').order_by('text__id', 'start_index')
 
     if format_type == 'json':
         data = []
@@ -912,7 +1278,7 @@ def export_annotations(request, user_id, user_project_id):
                 'content': ann.text.text,
                 'selected_sub_text': selected_sub_text,
                 'start_index': ann.start_index,
-                'error_label': ann.label.name,
+                'error_label': label_table[ann.label_id]['name'],
                 'suggestions': ann.suggestions or []
             })
         response = JsonResponse(data, safe=False, json_dumps_params={'ensure_ascii': False})
@@ -936,7 +1302,7 @@ def export_annotations(request, user_id, user_project_id):
                 ann.text.text,
                 selected_sub_text,
                 ann.start_index,
-                ann.label.name,
+                label_table[ann.label_id]['name'],
                 json.dumps(ann.suggestions or [], ensure_ascii=False)
             ])
         return response
\ No newline at end of file
@@ -0,0 +1,774 @@
+// Global variables
+let selectedLabelId = null;
+let selectedLabelColor = null;
+let selectedLabelName = null;
+let currentAnnotations = [];
+let tempSelection = null;
+let isEditMode = false;
+let csrfToken, textContainer, originalText, offsetMap;
+let labelTable = {}, userTable = {};
+
+// Global variables and functions
+let renderAnnotations, updateAnnotationsList, updateAnnotationActions, updateAnnotationStatus, applyAnnotationEvent;
+
+// Global functions for HTML onclick attributes
+function deleteAnnotation(annId) {
+    if (!confirm('Are you sure you want to delete this annotation?')) return;
+
+    // Get the base delete URL and replace the placeholder with actual ID
+    const urlsElement = document.getElementById('urls');
+    const baseDeleteUrl = urlsElement ? urlsElement.dataset.deleteUrl : '/annotation/0/delete/';
+    const deleteUrl = baseDeleteUrl.replace('/0/', `/${annId}/`);
+
+    fetch(deleteUrl, {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        }
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                applyAnnotationEvent({ type: 'deleted', a: { i: annId } });
+            } else {
+                alert('Error deleting annotation');
+            }
+        });
+}
+
+function editAnnotation(annId) {
+    const item = document.querySelector(`.annotation-item[data-ann-id="${annId}"]`);
+    if (!item || item.querySelector('.edit-suggestions-form')) return;
+
+    // Get current suggestions
+    const suggestionBlock = item.querySelector('.alert-info');
+    let currentSuggestions = [];
+
+    if (suggestionBlock) {
+        // Extract text nodes from the block, ignoring strong tag and br
+        const content = suggestionBlock.innerHTML;
+        // Split by br tags, clean up
+        const parts = content.split('<br>');
+        currentSuggestions = parts
+            .map(p => p.replace(/<[^>]*>/g, '').replace(/"/g, '').trim())
+            .filter(p => p && !p.startsWith('Suggestions:'));
+    }
+
+    // Create edit form
+    const formDiv = document.createElement('div');
+    formDiv.className = 'edit-suggestions-form mt-2 p-2 bg-light border rounded';
+    formDiv.innerHTML = `
+        <label class="form-label small fw-bold mb-1">Edit Suggestions (one per line):</label>
+        <textarea class="form-control mb-2 suggestion-edit-input form-control-sm" rows="2" style="font-size: 0.9rem;">${currentSuggestions.join('\n')}</textarea>
+        <div class="d-flex justify-content-end gap-2">
+            <button type="button" class="btn btn-sm btn-secondary cancel-edit-btn py-0 px-2">Cancel</button>
+            <button type="button" class="btn btn-sm btn-primary save-edit-btn py-0 px-2">Save</button>
+        </div>
+    `;
+
+    // Hide original display if it exists
+    if (suggestionBlock) suggestionBlock.style.display = 'none';
+
+    // Append form before the action buttons
+    const actionButtonsDiv = item.querySelector('.ms-3'); // Div containing edit/delete buttons
+    // Insert form as the last child of the flex-grow-1 div (text/content area)
+    const contentArea = item.querySelector('.flex-grow-1');
+    contentArea.appendChild(formDiv);
+
+    // Add event listeners
+    formDiv.querySelector('.cancel-edit-btn').addEventListener('click', () => {
+        formDiv.remove();
+        if (suggestionBlock) suggestionBlock.style.display = 'block';
+    });
+
+    formDiv.querySelector('.save-edit-btn').addEventListener('click', () => {
+        const newText = formDiv.querySelector('textarea').value;
+        const newSuggestions = newText.split('\n').map(s => s.trim()).filter(s => s);
+        updateAnnotationSuggestion(annId, newSuggestions);
+    });
+}
+
+function updateAnnotationSuggestion(annId, suggestions) {
+    // Ensure csrfToken is available
+    const token = document.querySelector('[name=csrfmiddlewaretoken]').value;
+
+    fetch(document.getElementById('urls').dataset.updateUrl.replace(/\/0\/$/, `/${annId}/`), {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-CSRFToken': token
+        },
+        body: new URLSearchParams({
+            'suggestions': JSON.stringify(suggestions)
+        })
+    })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (data.success) {
+                applyAnnotationEvent(data.event);
+            } else {
+                alert('Error updating suggestions: ' + (data.error || 'Unknown error'));
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Error updating suggestion. Please try again.');
+        });
+}
+
+function toClientAnnotation(ann) {
+    return {
+        id: ann.id,
+        start_index: ann.start_index,
+        end_index: ann.end_index,
+        u16_start: ann.u16_start,
+        u16_end: ann.u16_end,
+        label: ann.label,
+        label_color: ann.label_color,
+        annotated_text: ann.annotated_text,
+        suggestion: ann.suggestions ? ann.suggestions.join('\n') : '',
+        suggestions: ann.suggestions || [],
+        user_id: ann.user_id || null,
+        username: ann.username || 'Unknown'
+    };
+}
+
+// Expand a compact row from text_annotations or an event (see the view docstring for the keys)
+function expandCompactAnnotation(item) {
+    const label = labelTable[item.l] || ['', '#444040'];
+    const u16Start = toUtf16(item.s), u16End = toUtf16(item.e);
+    return {
+        id: item.i,
+        start_index: item.s,
+        end_index: item.e,
+        u16_start: u16Start,
+        u16_end: u16End,
+        label: label[0],
+        label_color: label[1],
+        annotated_text: originalText.substring(u16Start, u16End),
+        suggestions: item.g || [],
+        user_id: item.u,
+        username: userTable[item.u]
+    };
+}
+
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/\r/g, '&#13;');  // The HTML parser would turn CR into LF and shift offsets
+}
+
+// Stored offsets count code points, JavaScript strings count UTF-16 units.
+// offsetMap (see annotation/offsets.py) lists the code-point offsets of
+// characters taking two units ("astral") and of offsets inside a grapheme
+// cluster ("joins"), so conversions are binary searches.
+function lowerBound(sorted, value, key = v => v) {
+    let low = 0, high = sorted.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (key(sorted[middle], middle) < value) low = middle + 1; else high = middle;
+    }
+    return low;
+}
+
+function toUtf16(offset) {
+    return offset + lowerBound(offsetMap.astral, offset);
+}
+
+function fromUtf16(offset) {
+    // The k-th astral character starts at UTF-16 offset astral[k] + k
+    return offset - lowerBound(offsetMap.astral, offset, (cp, k) => cp + k);
+}
+
+function insideCluster(offset) {
+    const i = lowerBound(offsetMap.joins, offset);
+    return offsetMap.joins[i] === offset;
+}
+
+// Same widening as snap_to_graphemes on the server, in UTF-16 units
+function snapToGraphemes(u16Start, u16End) {
+    let start = fromUtf16(u16Start), end = fromUtf16(u16End);
+    if (toUtf16(end) < u16End) end += 1;  // An end inside a surrogate pair keeps the whole character
+    while (insideCluster(start)) start -= 1;
+    while (insideCluster(end)) end += 1;
+    return { startPos: toUtf16(start), endPos: toUtf16(end) };
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+    textContainer = document.getElementById('text-container');
+    originalText = JSON.parse(document.getElementById('doc-text').textContent);
+    offsetMap = JSON.parse(document.getElementById('doc-offsets').textContent);
+    textContainer.textContent = originalText;  // Keeps any CR the HTML parser dropped
+
+    // Step 1: Label Selection
+    document.querySelectorAll('.label-btn').forEach(btn => {
+        btn.addEventListener('click', function () {
+            console.log('Label clicked:', this.dataset.labelName);
+
+            // Remove previous selection
+            document.querySelectorAll('.label-btn').forEach(b => b.classList.remove('selected-label'));
+
+            // Add selection to clicked button
+            this.classList.add('selected-label');
+            console.log('Added selected-label class');
+
+            // Update selected label variables
+            selectedLabelId = this.dataset.labelId;
+            selectedLabelColor = this.dataset.color;
+            selectedLabelName = this.dataset.labelName;
+            console.log('Selected label:', selectedLabelName, selectedLabelColor);
+
+            // Visual feedback on text container
+            textContainer.style.borderColor = selectedLabelColor;
+            textContainer.style.boxShadow = `0 0 0 3px ${selectedLabelColor}40`;
+            console.log('Updated text container styling');
+
+            // Enable text selection
+            updateAnnotationActions();
+        });
+    });
+
+    // Step 2: Text Selection
+    let selectionTimeout;
+    let isReannotateMode = false;
+
+    textContainer.addEventListener('mouseup', function (e) {
+        // Allow text selection without label in re-annotate mode
+        if (!selectedLabelId && !isReannotateMode) {
+            alert('Please select a label first!');
+            return;
+        }
+
+        clearTimeout(selectionTimeout);
+        selectionTimeout = setTimeout(() => {
+            handleTextSelection();
+        }, 10);
+    });
+
+    // Debug: Log current state
+    console.log('Current state - selectedLabelId:', selectedLabelId, 'isReannotateMode:', isReannotateMode);
+
+    function handleTextSelection() {
+        const selection = window.getSelection();
+        if (selection.rangeCount === 0 || selection.isCollapsed) return;
+
+        const range = selection.getRangeAt(0);
+        const positions = getSelectionOffsets(range);
+        if (!positions) return;
+
+        const selectedText = originalText.substring(positions.startPos, positions.endPos);
+
+        // Clear previous temp selection
+        clearTempSelection();
+
+        // Store selection data
+        tempSelection = {
+            text: selectedText,
+            startPos: positions.startPos,
+            endPos: positions.endPos,
+            range: range
+        };
+
+        // Show annotation form
+        showAnnotationForm(selectedText);
+
+        // Clear text selection
+        selection.removeAllRanges();
+    }
+
+    // UTF-16 offsets of a selection in originalText, trimmed of surrounding
+    // whitespace and widened to whole grapheme clusters; null if it is blank.
+    // The container renders originalText exactly, apart from the annotation
+    // tooltips, so an offset is the length of the text nodes before it.
+    function getSelectionOffsets(range) {
+        const start = textOffsetAt(range.startContainer, range.startOffset);
+        const end = textOffsetAt(range.endContainer, range.endOffset);
+        let startPos = Math.min(start, end), endPos = Math.max(start, end);
+        while (startPos < endPos && /\s/.test(originalText[startPos])) startPos++;
+        while (endPos > startPos && /\s/.test(originalText[endPos - 1])) endPos--;
+        if (startPos === endPos) return null;
+        return snapToGraphemes(startPos, endPos);
+    }
+
+    function textOffsetAt(container, offset) {
+        const walker = document.createTreeWalker(textContainer, NodeFilter.SHOW_TEXT, {
+            acceptNode: node => node.parentElement.closest('.annotation-info, .annotation-remove-btn')
+                ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT
+        });
+        const point = document.createRange();
+        point.setStart(container, offset);
+        let position = 0;
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            if (node === container) return position + offset;
+            if (point.comparePoint(node, 0) > 0) break;  // First text node after the point
+            position += node.length;
+        }
+        return position;
+    }
+
+    function highlightTempSelection(range, color) {
+        try {
+            // Try the standard surroundContents method first
+            const span = document.createElement('span');
+            span.className = 'temp-selection';
+            span.style.backgroundColor = `${color}30`;
+            span.style.borderColor = color;
+            span.style.borderRadius = '3px';
+            span.style.padding = '2px';
+
+            // Extract the contents and surround them
+            const contents = range.extractContents();
+            span.appendChild(contents);
+            range.insertNode(span);
+
+            // Select the span for potential removal
+            tempSelection.span = span;
+        } catch (e) {
+            // Fallback method if surroundContents fails
+            console.warn('surroundContents failed, using fallback method:', e);
+
+            const span = document.createElement('span');
+            span.className = 'temp-selection';
+            span.style.backgroundColor = `${color}30`;
+            span.style.borderColor = color;
+            span.style.borderRadius = '3px';
+            span.style.padding = '2px';
+
+            // Use the clean selected text instead of range.toString()
+            const selectedText = tempSelection.text;
+
+            // Replace the range content with the span
+            const textNode = document.createTextNode(selectedText);
+            span.appendChild(textNode);
+            range.deleteContents();
+            range.insertNode(span);
+
+            tempSelection.span = span;
+        }
+    }
+
+    function clearTempSelection() {
+        // If we have a stored span reference, remove it directly
+        if (tempSelection && tempSelection.span) {
+            const span = tempSelection.span;
+            if (span.parentNode) {
+                const parent = span.parentNode;
+                while (span.firstChild) {
+                    parent.insertBefore(span.firstChild, span);
+                }
+                parent.removeChild(span);
+            }
+        } else {
+            // Fallback: remove all temp selection spans
+            const tempSpans = textContainer.querySelectorAll('.temp-selection');
+            tempSpans.forEach(span => {
+                const parent = span.parentNode;
+                if (parent) {
+                    while (span.firstChild) {
+                        parent.insertBefore(span.firstChild, span);
+                    }
+                    parent.removeChild(span);
+                }
+            });
+        }
+        tempSelection = null;
+        hideAnnotationForm();
+    }
+
+    function showAnnotationForm(selectedText) {
+        const form = document.getElementById('temp-selection-form');
+        const textSpan = document.getElementById('temp-selected-text');
+        textSpan.textContent = selectedText;
+        form.style.display = 'block';
+
+        // Clear previous suggestions and focus on input
+        clearSuggestionInputs();
+        document.getElementById('new-suggestion-input').focus();
+    }
+
+    function hideAnnotationForm() {
+        const form = document.getElementById('temp-selection-form');
+        form.style.display = 'none';
+        clearSuggestionInputs();
+    }
+
+    function clearSuggestionInputs() {
+        const container = document.getElementById('suggestions-container');
+        container.innerHTML = '';
+        document.getElementById('new-suggestion-input').value = '';
+    }
+
+    function addSuggestion(suggestionText = '') {
+        const container = document.getElementById('suggestions-container');
+        const suggestionItem = document.createElement('div');
+        suggestionItem.className = 'suggestion-item';
+
+        const input = document.createElement('input');
+        input.type = 'text';
+        input.value = suggestionText;
+        input.placeholder = 'Enter suggestion...';
+
+        const removeBtn = document.createElement('button');
+        removeBtn.type = 'button';
+        removeBtn.innerHTML = '<i class="fas fa-times"></i>';
+        removeBtn.title = 'Remove suggestion';
+        removeBtn.addEventListener('click', function () {
+            container.removeChild(suggestionItem);
+        });
+
+        suggestionItem.appendChild(input);
+        suggestionItem.appendChild(removeBtn);
+        container.appendChild(suggestionItem);
+
+        // Focus on the new input if it was just added
+        if (!suggestionText) {
+            input.focus();
+        }
+    }
+
+    function getAllSuggestions() {
+        const inputs = document.querySelectorAll('#suggestions-container input');
+        const suggestions = [];
+        inputs.forEach(input => {
+            const value = input.value.trim();
+            if (value) {
+                suggestions.push(value);
+            }
+        });
+        return suggestions;
+    }
+
+    // Add suggestion button
+    document.getElementById('add-suggestion-btn').addEventListener('click', function () {
+        const input = document.getElementById('new-suggestion-input');
+        const suggestionText = input.value.trim();
+        if (suggestionText) {
+            addSuggestion(suggestionText);
+            input.value = '';
+            input.focus();
+        }
+    });
+
+    // Allow Enter key to add suggestions
+    document.getElementById('new-suggestion-input').addEventListener('keypress', function (e) {
+        if (e.key === 'Enter') {
+            e.preventDefault();
+            document.getElementById('add-suggestion-btn').click();
+        }
+    });
+
+    // Confirm annotation
+    document.getElementById('confirm-annotation-btn').addEventListener('click', function () {
+        if (!tempSelection) return;
+
+        // In re-annotate mode, allow annotation even without pre-selected label
+        if (!selectedLabelId && !isReannotateMode) {
+            alert('Please select a label first!');
+            return;
+        }
+
+        // If no label selected but in re-annotate mode, show label selection
+        if (!selectedLabelId && isReannotateMode) {
+            alert('Please select a label from Step 1 before confirming the annotation.');
+            // Scroll to label selection area
+            document.querySelector('.card-header.bg-info').scrollIntoView({ behavior: 'smooth' });
+            return;
+        }
+
+        const suggestions = getAllSuggestions();
+
+        // Create annotation
+        createAnnotation(
+            tempSelection.startPos,
+            tempSelection.endPos,
+            tempSelection.text,
+            suggestions
+        );
+    });
+
+    // Cancel annotation
+    document.getElementById('cancel-annotation-btn').addEventListener('click', clearTempSelection);
+
+    // Create annotation
+    function createAnnotation(startPos, endPos, selectedText, suggestions = []) {
+        fetch(document.getElementById('urls').dataset.addUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-CSRFToken': csrfToken
+            },
+            body: new URLSearchParams({
+                'start_index': startPos,
+                'end_index': endPos,
+                'offset_unit': 'utf16',
+                'label_id': selectedLabelId,
+                'suggestions': JSON.stringify(suggestions),
+                'is_reannotation': isReannotateMode ? 'true' : 'false'
+            })
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    clearTempSelection();
+                    applyAnnotationEvent(data.event);
+                } else {
+                    alert('Error adding annotation: ' + (data.error || 'Unknown error'));
+                }
+            })
+            .catch(error => {
+                alert('Error: ' + error.message);
+            });
+    }
+
+    // Page parameter is handled in the template for the Back to Project button
+
+
+
+    // Removed saveAnnotationEdit and cancelAnnotationEdit functions
+    // Edit functionality now uses prompt for suggestions only
+
+
+    // Utility functions
+    function adjustColor(color, amount) {
+        // Simple color adjustment function
+        const usePound = color[0] === '#';
+        const col = usePound ? color.slice(1) : color;
+
+        const num = parseInt(col, 16);
+        let r = (num >> 16) + amount;
+        let g = (num >> 8 & 0x00FF) + amount;
+        let b = (num & 0x0000FF) + amount;
+
+        r = r > 255 ? 255 : r < 0 ? 0 : r;
+        g = g > 255 ? 255 : g < 0 ? 0 : g;
+        b = b > 255 ? 255 : b < 0 ? 0 : b;
+
+        return (usePound ? '#' : '') + (r << 16 | g << 8 | b).toString(16);
+    }
+
+    // Assign functions to global scope for onclick handlers
+    renderAnnotations = renderAnnotationsLocal;
+    updateAnnotationsList = updateAnnotationsListLocal;
+    updateAnnotationActions = updateAnnotationActionsLocal;
+    updateAnnotationStatus = updateAnnotationStatusLocal;
+    applyAnnotationEvent = applyAnnotationEventLocal;
+
+    // Live updates from collaborators on this text (server-sent events, ASGI only)
+    const eventsUrl = document.getElementById('urls').dataset.eventsUrl;
+    if (window.EventSource && eventsUrl) {
+        const eventSource = new EventSource(eventsUrl);
+        eventSource.addEventListener('annotation', (e) => {
+            applyAnnotationEvent(JSON.parse(e.data));
+        });
+    }
+
+    // The text is already on screen; fetch the annotations and render their spans
+    fetch(document.getElementById('urls').dataset.annotationsUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            labelTable = data.labels || {};
+            userTable = data.users || {};
+            currentAnnotations = (data.a || []).map(item => toClientAnnotation(expandCompactAnnotation(item)));
+            renderAnnotations();
+            updateAnnotationsList();
+            updateAnnotationActions();
+            updateAnnotationStatus();
+        })
+        .catch(error => {
+            console.error('Error loading annotations:', error);
+            document.getElementById('annotations-container').innerHTML =
+                '<div class="alert alert-warning mb-0">Annotations could not be loaded. Please reload the page.</div>';
+        });
+
+    // Previous/next text the user has not annotated yet; the next page is
+    // prefetched so moving on does not wait for the server
+    const nextUrl = document.getElementById('urls').dataset.nextUrl;
+    [['prev-text-btn', 'previous'], ['next-text-btn', 'next']].forEach(([buttonId, direction]) => {
+        fetch(`${nextUrl}?direction=${direction}`, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.url) return;
+                const button = document.getElementById(buttonId);
+                button.href = data.url + window.location.search;
+                button.classList.remove('disabled');
+                if (direction === 'next') {
+                    const link = document.createElement('link');
+                    link.rel = 'prefetch';
+                    link.href = button.href;
+                    document.head.appendChild(link);
+                }
+            })
+            .catch(error => console.error('Error finding the adjacent text:', error));
+    });
+
+    document.addEventListener('keydown', (e) => {
+        if (e.ctrlKey || e.metaKey || e.altKey || e.target.closest('input, textarea, select, [contenteditable]')) return;
+        const button = document.getElementById({ n: 'next-text-btn', p: 'prev-text-btn' }[e.key.toLowerCase()] || '');
+        if (button && button.href) {
+            window.location.href = button.href;
+        }
+    });
+
+    // Mirrors the render_with_annotations template filter so deltas can be patched in place
+    const SPACE_CHARS_RE = /[ \t\n\r\x0b\x0c\u00A0\u2000-\u200A\u202F\u205F\u3000]+$/;
+
+    function renderAnnotationsLocal() {
+        const sorted = [...currentAnnotations].sort((a, b) => a.u16_start - b.u16_start);
+        let html = '';
+        let lastEnd = 0;
+        sorted.forEach(ann => {
+            if (ann.u16_start < 0 || ann.u16_end > originalText.length || ann.u16_start >= ann.u16_end) return;
+            if (ann.u16_start < lastEnd) return;  // overlapping spans are not nested
+            if (ann.u16_start > lastEnd) {
+                html += escapeHtml(originalText.substring(lastEnd, ann.u16_start));
+            }
+            const annotatedText = originalText.substring(ann.u16_start, ann.u16_end);
+            const trimmed = annotatedText.replace(SPACE_CHARS_RE, '');
+            const trailing = annotatedText.substring(trimmed.length);
+            if (trimmed) {
+                const suggestionsHtml = ann.suggestions.length
+                    ? '<br><strong>Suggestions:</strong><br>' + ann.suggestions.map(s => `• ${escapeHtml(s)}`).join('<br>')
+                    : '';
+                html += `<span class="annotation-span" style="border-bottom-color: ${ann.label_color}; background-color: ${ann.label_color};" ` +
+                    `data-ann-id="${ann.id}">${escapeHtml(trimmed)}` +
+                    `<div class="annotation-info"><strong>${escapeHtml(ann.label)}</strong>${suggestionsHtml}</div></span>`;
+            }
+            html += escapeHtml(trailing);
+            lastEnd = ann.u16_end;
+        });
+        if (lastEnd < originalText.length) {
+            html += escapeHtml(originalText.substring(lastEnd));
+        }
+        textContainer.innerHTML = html;
+    }
+
+    // Events carry a compact row plus the label/user table entries it refers to
+    function applyAnnotationEventLocal(event) {
+        if (!event || !event.a) return;
+        Object.assign(labelTable, event.labels || {});
+        Object.assign(userTable, event.users || {});
+        const index = currentAnnotations.findIndex(a => a.id == event.a.i);
+        if (event.type === 'deleted') {
+            if (index === -1) return;
+            currentAnnotations.splice(index, 1);
+        } else if (index === -1) {
+            currentAnnotations.push(toClientAnnotation(expandCompactAnnotation(event.a)));
+        } else {
+            currentAnnotations[index] = toClientAnnotation(expandCompactAnnotation(event.a));
+        }
+        currentAnnotations.sort((a, b) => a.start_index - b.start_index);
+        renderAnnotationsLocal();
+        updateAnnotationsListLocal();
+        updateAnnotationStatusLocal();
+    }
+
+    function updateAnnotationsListLocal() {
+        const container = document.getElementById('annotations-container');
+
+        if (currentAnnotations.length === 0) {
+            container.innerHTML = `
+                <div class="text-center py-5">
+                    <i class="fas fa-sticky-note fa-3x text-muted mb-3"></i>
+                    <h5 class="text-muted">No Annotations Yet</h5>
+                    <p class="text-muted">Select a label and highlight text above to create annotations.</p>
+                </div>
+            `;
+            document.getElementById('annotation-count').textContent = 0;
+            return;
+        }
+
+        let html = '';
+        currentAnnotations.forEach(ann => {
+            html += `
+                <div class="annotation-item" data-ann-id="${ann.id}">
+                    <div class="d-flex justify-content-between align-items-start">
+                        <div class="flex-grow-1">
+                            <div class="mb-2">
+                                <span class="badge px-3 py-2" style="background-color: ${ann.label_color}; color: white; font-size: 14px;">
+                                    <i class="fas fa-tag"></i> ${ann.label}
+                                </span>
+                            </div>
+                            <div class="mb-2">
+                                <strong class="text-dark" style="font-size: 16px;">"${ann.annotated_text}"</strong>
+                            </div>
+                            <div class="mb-2">
+                                <small class="text-muted">
+                                    <i class="fas fa-map-marker-alt"></i> Position: ${ann.start_index}-${ann.end_index}
+                                </small>
+                            </div>
+                            ${ann.suggestion ? `
+                                <div class="alert alert-info py-2 px-3 mb-0">
+                                    <strong><i class="fas fa-lightbulb"></i> Suggestions:</strong><br>
+                                    ${ann.suggestion.split('\n').map(s => s.trim()).filter(s => s).map(s => `"${s}"`).join('<br>')}
+                                </div>
+                            ` : ''}
+                        </div>
+                        <div class="ms-3">
+                            <button onclick="editAnnotation(${ann.id})" class="btn btn-outline-primary btn-sm me-2" title="Edit annotation">
+                                <i class="fas fa-edit"></i>
+                            </button>
+                            <button onclick="deleteAnnotation(${ann.id})" class="btn btn-outline-danger btn-sm" title="Delete annotation">
+                                <i class="fas fa-trash"></i>
+                            </button>
+                        </div>
+                    </div>
+                </div>
+            `;
+        });
+
+        container.innerHTML = html;
+
+        // Update count
+        document.getElementById('annotation-count').textContent = currentAnnotations.length;
+    }
+
+    function updateAnnotationActionsLocal() {
+        // Check if elements exist before trying to access them
+        const actions = document.getElementById('annotation-actions');
+        const annotateBtn = document.getElementById('annotate-btn');
+
+        if (!actions || !annotateBtn) {
+            // Elements don't exist, skip this function
+            return;
+        }
+
+        if (selectedLabelId && currentAnnotations.length === 0) {
+            actions.style.display = 'block';
+            annotateBtn.textContent = 'Annotate Text';
+            annotateBtn.className = 'btn btn-annotate me-3';
+        } else if (currentAnnotations.length > 0) {
+            actions.style.display = 'block';
+            annotateBtn.textContent = 'Re-Annotate Text';
+            annotateBtn.className = 'btn btn-reannotate me-3';
+        } else {
+            actions.style.display = 'none';
+        }
+    }
+
+    function updateAnnotationStatusLocal() {
+        const status = document.getElementById('annotation-status');
+        if (currentAnnotations.length > 0) {
+            status.textContent = 'Annotated';
+            status.className = 'badge bg-success ms-2';
+        } else {
+            status.textContent = 'Not Annotated';
+            status.className = 'badge bg-warning text-dark ms-2';
+        }
+    }
+
+    // Handle clicks outside to clear selections
+    document.addEventListener('click', function (e) {
+        if (!textContainer.contains(e.target) && !e.target.closest('#temp-selection-form')) {
+            clearTempSelection();
+        }
+    });
+});